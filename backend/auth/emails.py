@@ -0,0 +1,48 @@
+from typing import Tuple
+from templates import Template
+
+# Письма регистрации и сброса пароля отличаются только текстами вокруг кода
+CODE_EMAIL_HTML = Template("""
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <div style="background: #9b87f5; padding: 20px; text-align: center;">
+            <h1 style="color: white; margin: 0;">EventHub</h1>
+        </div>
+        <div style="padding: 30px; background: #f9f9f9;">
+            <h2 style="color: #333;">{{ heading }}</h2>
+            <p style="color: #666; font-size: 16px;">{{ prompt }}</p>
+            <div style="background: white; padding: 20px; text-align: center; border-radius: 8px; margin: 20px 0;">
+                <h1 style="color: #9b87f5; font-size: 48px; margin: 0; letter-spacing: 8px;">{{ code }}</h1>
+            </div>
+            <p style="color: #666;">Код действителен 10 минут.</p>
+            <p style="color: #999; font-size: 14px;">{{ disclaimer }}</p>
+        </div>
+    </body>
+    </html>
+""")
+
+CODE_EMAIL_TEXT = Template("""
+EventHub — {{ heading }}
+
+{{ prompt }} {{ code }}
+Код действителен 10 минут.
+
+{{ disclaimer }}
+""", escape=False, compact=False)
+
+def code_email(heading: str, prompt: str, code: str, disclaimer: str) -> Tuple[str, str]:
+    """HTML и текстовая версия письма с кодом"""
+    values = {'heading': heading, 'prompt': prompt, 'code': code, 'disclaimer': disclaimer}
+    return CODE_EMAIL_HTML.render(**values), CODE_EMAIL_TEXT.render(**values).strip() + '\n'
+
+def registration_email(code: str) -> Tuple[str, str]:
+    return code_email(
+        'Подтверждение регистрации', 'Ваш код подтверждения:', code,
+        'Если вы не регистрировались на EventHub, проигнорируйте это письмо.'
+    )
+
+def password_reset_email(code: str) -> Tuple[str, str]:
+    return code_email(
+        'Восстановление пароля', 'Ваш код для сброса пароля:', code,
+        'Если вы не запрашивали сброс пароля, проигнорируйте это письмо.'
+    )
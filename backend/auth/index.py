@@ -1,54 +1,278 @@
-import json
-import os
-import random
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import secrets
 from datetime import datetime, timedelta
 from typing import Dict, Any
-import psycopg2
-from psycopg2.extras import RealDictCursor
-import hashlib
+from db import PoolTimeout, dict_cursor, get_db_connection, release_db_connection
+from metrics import instrumented, span, tag
+from outbox import enqueue_email
+from emails import password_reset_email, registration_email
+from reports import report_period, sales_report
+from sessions import SessionStoreError, TokenError, authenticate, issue_token, revocations, signing_configured
+from passwords import HasherBusy, hash_password, verify_password
+from runtime import Field, Router, Schema, ValidationError, error, parse_body, preflight, respond
+import throttle
 
-def get_db_connection():
-    """Получить подключение к БД"""
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+PREFLIGHT = preflight('GET, POST, OPTIONS', 'Content-Type, Authorization, X-Authorization')
 
-def hash_password(password: str) -> str:
-    """Хешировать пароль"""
-    return hashlib.sha256(password.encode()).hexdigest()
+EMAIL = Field(str, max_length=255)
+CODE = Field(str, max_length=4)
+PASSWORD = Field(str, max_length=1024)
+
+# роли пользователей (V0021): staff проверяет билеты на входе, partner импортирует заказы
+ROLES = frozenset(('basic', 'staff', 'partner', 'admin'))
+
+router = Router()
 
 def generate_code() -> str:
     """Генерировать 4-значный код"""
-    return str(random.randint(1000, 9999))
+    return str(1000 + secrets.randbelow(9000))
+
+def too_many_requests(retry_after: int) -> Dict[str, Any]:
+    """Ответ 429 с временем до следующей попытки"""
+    return error(429, 'Слишком много попыток, повторите позже', {'Retry-After': str(retry_after)}, retry_after=retry_after)
+
+@router.route('register', Schema(email=EMAIL, phone=Field(str, max_length=50), full_name=Field(str, max_length=255), password=PASSWORD))
+def register(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Создать пользователя и отправить код подтверждения"""
+    email = body['email']
+    code = generate_code()
+    expires_at = datetime.now() + timedelta(minutes=10)
+
+    with span('email.render'):
+        email_html, email_text = registration_email(code)
+
+    password_hash = hash_password(body['password'])
+    cur.execute(
+        """WITH new_user AS (
+            INSERT INTO t_p613096_greeting_project_36.users
+            (email, phone, full_name, password_hash, is_verified)
+            VALUES (%s, %s, %s, %s, FALSE)
+            ON CONFLICT (email) DO NOTHING
+            RETURNING email
+        ), new_code AS (
+            INSERT INTO t_p613096_greeting_project_36.verification_codes
+            (email, code, code_type, expires_at)
+            SELECT email, %s, 'registration', %s FROM new_user
+        ), new_email AS (
+            INSERT INTO t_p613096_greeting_project_36.email_outbox
+            (to_email, subject, body, body_text)
+            SELECT email, %s, %s, %s FROM new_user
+        )
+        SELECT email FROM new_user""",
+        (email, body['phone'], body['full_name'], password_hash, code, expires_at,
+         'Код подтверждения EventHub', email_html, email_text)
+    )
+    if not cur.fetchone():
+        return error(400, 'Email уже зарегистрирован')
+
+    conn.commit()
+
+    return respond(200, {
+        'success': True,
+        'message': 'Код отправлен на email',
+        'email_queued': True
+    })
+
+@router.route('verify', Schema(email=EMAIL, code=CODE))
+def verify(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Подтвердить email кодом из письма"""
+    email = body['email']
+
+    cur.execute(
+        """SELECT id, expires_at FROM t_p613096_greeting_project_36.verification_codes
+        WHERE email = %s AND code = %s AND code_type = 'registration' AND used = FALSE
+        ORDER BY created_at DESC LIMIT 1""",
+        (email, body['code'])
+    )
+    verification = cur.fetchone()
+
+    if not verification:
+        return error(400, 'Неверный код')
+
+    if datetime.now() > verification['expires_at']:
+        return error(400, 'Код истек')
+
+    cur.execute(
+        "UPDATE t_p613096_greeting_project_36.verification_codes SET used = TRUE WHERE id = %s",
+        (verification['id'],)
+    )
+    cur.execute(
+        "UPDATE t_p613096_greeting_project_36.users SET is_verified = TRUE WHERE email = %s",
+        (email,)
+    )
+    conn.commit()
+
+    return respond(200, {'success': True, 'message': 'Email подтвержден'})
+
+@router.route('login', Schema(email=EMAIL, password=PASSWORD))
+def login(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Проверить пароль и выдать токен сессии"""
+    # без ключей подписи токен не выдать: не проверять пароль и не перехешировать его зря
+    if not signing_configured():
+        return error(500, 'Не заданы ключи подписи сессий SESSION_SIGNING_KEYS')
+
+    password = body['password']
+
+    cur.execute(
+        """SELECT id, email, phone, full_name, is_verified, role, password_hash
+        FROM t_p613096_greeting_project_36.users
+        WHERE email = %s""",
+        (body['email'],)
+    )
+    user = cur.fetchone()
+    valid, needs_rehash = verify_password(password, user['password_hash'] if user else None)
+
+    if not valid:
+        return error(401, 'Неверный email или пароль')
+
+    if not user['is_verified']:
+        return error(403, 'Email не подтвержден')
+
+    if needs_rehash:
+        cur.execute(
+            """UPDATE t_p613096_greeting_project_36.users SET password_hash = %s
+            WHERE id = %s AND password_hash = %s""",
+            (hash_password(password), user['id'], user['password_hash'])
+        )
+        conn.commit()
+
+    token, expires_at = issue_token(user)
+    return respond(200, {
+        'success': True,
+        'token': token,
+        'expires_at': expires_at,
+        'user': {
+            'id': user['id'],
+            'email': user['email'],
+            'phone': user['phone'],
+            'full_name': user['full_name'],
+            'role': user['role']
+        }
+    })
+
+@router.route('reset_password_request', Schema(email=EMAIL))
+def reset_password_request(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Отправить код для сброса пароля"""
+    email = body['email']
+
+    cur.execute(
+        "SELECT id FROM t_p613096_greeting_project_36.users WHERE email = %s",
+        (email,)
+    )
+    if not cur.fetchone():
+        return error(404, 'Email не найден')
+
+    code = generate_code()
+    expires_at = datetime.now() + timedelta(minutes=10)
+
+    cur.execute(
+        """INSERT INTO t_p613096_greeting_project_36.verification_codes
+        (email, code, code_type, expires_at) VALUES (%s, %s, %s, %s)""",
+        (email, code, 'password_reset', expires_at)
+    )
+
+    with span('email.render'):
+        email_html, email_text = password_reset_email(code)
+
+    enqueue_email(cur, email, 'Восстановление пароля EventHub', email_html, email_text)
+    conn.commit()
+
+    return respond(200, {
+        'success': True,
+        'message': 'Код отправлен на email',
+        'email_queued': True
+    })
+
+@router.route('reset_password', Schema(email=EMAIL, code=CODE, new_password=PASSWORD))
+def reset_password(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Установить новый пароль по коду из письма"""
+    email = body['email']
+
+    cur.execute(
+        """SELECT id, expires_at FROM t_p613096_greeting_project_36.verification_codes
+        WHERE email = %s AND code = %s AND code_type = 'password_reset' AND used = FALSE
+        ORDER BY created_at DESC LIMIT 1""",
+        (email, body['code'])
+    )
+    verification = cur.fetchone()
+
+    if not verification:
+        return error(400, 'Неверный код')
+
+    if datetime.now() > verification['expires_at']:
+        return error(400, 'Код истек')
+
+    password_hash = hash_password(body['new_password'])
+    cur.execute(
+        "UPDATE t_p613096_greeting_project_36.verification_codes SET used = TRUE WHERE id = %s",
+        (verification['id'],)
+    )
+    cur.execute(
+        "UPDATE t_p613096_greeting_project_36.users SET password_hash = %s WHERE email = %s",
+        (password_hash, email)
+    )
+    conn.commit()
+
+    return respond(200, {'success': True, 'message': 'Пароль изменен'})
 
-def send_email(to_email: str, subject: str, body: str) -> bool:
-    """Отправить email"""
+@router.route('logout')
+def logout(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Отозвать текущий токен сессии"""
     try:
-        smtp_host = os.environ.get('SMTP_HOST')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        smtp_user = os.environ.get('SMTP_USER')
-        smtp_password = os.environ.get('SMTP_PASSWORD')
-        
-        if not all([smtp_host, smtp_user, smtp_password]):
-            return False
-        
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html', 'utf-8'))
-        
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=5) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
-        
-        return True
-    except Exception as e:
-        print(f'Email error: {e}')
-        return False
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+
+    revocations.revoke(cur, session['jti'], session['exp'])
+    conn.commit()
+
+    return respond(200, {'success': True})
+
+@router.route('sales_report', Schema(since=Field(str, required=False), until=Field(str, required=False)))
+def sales(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Отчет о продажах из почасовых итогов, только для администратора"""
+    try:
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+
+    if session['role'] != 'admin':
+        return error(403, 'Доступ только для администратора')
+
+    try:
+        since, until = report_period(body['since'], body['until'])
+    except ValueError:
+        return error(400, 'Неверный период отчета')
+
+    report = sales_report(cur, since, until)
+    conn.rollback()
+    return respond(200, {'success': True, 'report': report})
 
+@router.route('set_role', Schema(email=EMAIL, role=Field(str, max_length=50)))
+def set_role(conn: Any, cur: Any, body: Dict[str, Any], event: Dict[str, Any]) -> Dict[str, Any]:
+    """Назначить пользователю роль, только для администратора; действует со следующего входа"""
+    try:
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+
+    if session['role'] != 'admin':
+        return error(403, 'Доступ только для администратора')
+
+    if body['role'] not in ROLES:
+        return error(400, 'Неизвестная роль')
+
+    cur.execute(
+        "UPDATE t_p613096_greeting_project_36.users SET role = %s WHERE email = %s RETURNING id",
+        (body['role'], body['email'])
+    )
+    if not cur.fetchone():
+        conn.rollback()
+        return error(404, 'Пользователь не найден')
+    conn.commit()
+
+    return respond(200, {'success': True, 'email': body['email'], 'role': body['role']})
+
+@instrumented('auth')
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Обрабатывает запросы авторизации, регистрации и восстановления пароля
@@ -57,322 +281,53 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Returns: HTTP ответ с результатом операции
     """
     method = event.get('httpMethod', 'GET')
-    
+
     if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
+        return PREFLIGHT()
+
     if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    body = json.loads(event.get('body', '{}'))
-    action = body.get('action')
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
-    
+        return error(405, 'Method not allowed')
+
     try:
-        if action == 'register':
-            email = body.get('email')
-            phone = body.get('phone')
-            full_name = body.get('full_name')
-            password = body.get('password')
-            
-            if not all([email, phone, full_name, password]):
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Заполните все поля'}),
-                    'isBase64Encoded': False
-                }
-            
-            cur.execute(
-                "SELECT id FROM t_p613096_greeting_project_36.users WHERE email = %s",
-                (email,)
-            )
-            if cur.fetchone():
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Email уже зарегистрирован'}),
-                    'isBase64Encoded': False
-                }
-            
-            code = generate_code()
-            expires_at = datetime.now() + timedelta(minutes=10)
-            
-            cur.execute(
-                """INSERT INTO t_p613096_greeting_project_36.verification_codes 
-                (email, code, code_type, expires_at) VALUES (%s, %s, %s, %s)""",
-                (email, code, 'registration', expires_at)
-            )
-            conn.commit()
-            
-            email_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: #9b87f5; padding: 20px; text-align: center;">
-                    <h1 style="color: white; margin: 0;">EventHub</h1>
-                </div>
-                <div style="padding: 30px; background: #f9f9f9;">
-                    <h2 style="color: #333;">Подтверждение регистрации</h2>
-                    <p style="color: #666; font-size: 16px;">Ваш код подтверждения:</p>
-                    <div style="background: white; padding: 20px; text-align: center; border-radius: 8px; margin: 20px 0;">
-                        <h1 style="color: #9b87f5; font-size: 48px; margin: 0; letter-spacing: 8px;">{code}</h1>
-                    </div>
-                    <p style="color: #666;">Код действителен 10 минут.</p>
-                    <p style="color: #999; font-size: 14px;">Если вы не регистрировались на EventHub, проигнорируйте это письмо.</p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            email_sent = send_email(email, 'Код подтверждения EventHub', email_body)
-            
-            password_hash = hash_password(password)
-            cur.execute(
-                """INSERT INTO t_p613096_greeting_project_36.users 
-                (email, phone, full_name, password_hash, is_verified) 
-                VALUES (%s, %s, %s, %s, FALSE)""",
-                (email, phone, full_name, password_hash)
-            )
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': True,
-                    'message': 'Код отправлен на email' if email_sent else 'Регистрация создана, но email не отправлен',
-                    'email_sent': email_sent
-                }),
-                'isBase64Encoded': False
-            }
-        
-        elif action == 'verify':
-            email = body.get('email')
-            code = body.get('code')
-            
-            cur.execute(
-                """SELECT id, expires_at FROM t_p613096_greeting_project_36.verification_codes 
-                WHERE email = %s AND code = %s AND code_type = 'registration' AND used = FALSE 
-                ORDER BY created_at DESC LIMIT 1""",
-                (email, code)
-            )
-            verification = cur.fetchone()
-            
-            if not verification:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Неверный код'}),
-                    'isBase64Encoded': False
-                }
-            
-            if datetime.now() > verification['expires_at']:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Код истек'}),
-                    'isBase64Encoded': False
-                }
-            
-            cur.execute(
-                "UPDATE t_p613096_greeting_project_36.verification_codes SET used = TRUE WHERE id = %s",
-                (verification['id'],)
-            )
-            cur.execute(
-                "UPDATE t_p613096_greeting_project_36.users SET is_verified = TRUE WHERE email = %s",
-                (email,)
-            )
-            conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'message': 'Email подтвержден'}),
-                'isBase64Encoded': False
-            }
-        
-        elif action == 'login':
-            email = body.get('email')
-            password = body.get('password')
-            
-            password_hash = hash_password(password)
-            cur.execute(
-                """SELECT id, email, phone, full_name, is_verified, role 
-                FROM t_p613096_greeting_project_36.users 
-                WHERE email = %s AND password_hash = %s""",
-                (email, password_hash)
-            )
-            user = cur.fetchone()
-            
-            if not user:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Неверный email или пароль'}),
-                    'isBase64Encoded': False
-                }
-            
-            if not user['is_verified']:
-                return {
-                    'statusCode': 403,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Email не подтвержден'}),
-                    'isBase64Encoded': False
-                }
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': True,
-                    'user': {
-                        'id': user['id'],
-                        'email': user['email'],
-                        'phone': user['phone'],
-                        'full_name': user['full_name'],
-                        'role': user['role']
-                    }
-                }),
-                'isBase64Encoded': False
-            }
-        
-        elif action == 'reset_password_request':
-            email = body.get('email')
-            
-            cur.execute(
-                "SELECT id FROM t_p613096_greeting_project_36.users WHERE email = %s",
-                (email,)
-            )
-            if not cur.fetchone():
-                return {
-                    'statusCode': 404,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Email не найден'}),
-                    'isBase64Encoded': False
-                }
-            
-            code = generate_code()
-            expires_at = datetime.now() + timedelta(minutes=10)
-            
-            cur.execute(
-                """INSERT INTO t_p613096_greeting_project_36.verification_codes 
-                (email, code, code_type, expires_at) VALUES (%s, %s, %s, %s)""",
-                (email, code, 'password_reset', expires_at)
-            )
-            conn.commit()
-            
-            email_body = f"""
-            <html>
-            <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-                <div style="background: #9b87f5; padding: 20px; text-align: center;">
-                    <h1 style="color: white; margin: 0;">EventHub</h1>
-                </div>
-                <div style="padding: 30px; background: #f9f9f9;">
-                    <h2 style="color: #333;">Восстановление пароля</h2>
-                    <p style="color: #666; font-size: 16px;">Ваш код для сброса пароля:</p>
-                    <div style="background: white; padding: 20px; text-align: center; border-radius: 8px; margin: 20px 0;">
-                        <h1 style="color: #9b87f5; font-size: 48px; margin: 0; letter-spacing: 8px;">{code}</h1>
-                    </div>
-                    <p style="color: #666;">Код действителен 10 минут.</p>
-                    <p style="color: #999; font-size: 14px;">Если вы не запрашивали сброс пароля, проигнорируйте это письмо.</p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            email_sent = send_email(email, 'Восстановление пароля EventHub', email_body)
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': True,
-                    'message': 'Код отправлен на email' if email_sent else 'Запрос создан, но email не отправлен',
-                    'email_sent': email_sent
-                }),
-                'isBase64Encoded': False
-            }
-        
-        elif action == 'reset_password':
-            email = body.get('email')
-            code = body.get('code')
-            new_password = body.get('new_password')
-            
-            cur.execute(
-                """SELECT id, expires_at FROM t_p613096_greeting_project_36.verification_codes 
-                WHERE email = %s AND code = %s AND code_type = 'password_reset' AND used = FALSE 
-                ORDER BY created_at DESC LIMIT 1""",
-                (email, code)
-            )
-            verification = cur.fetchone()
-            
-            if not verification:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Неверный код'}),
-                    'isBase64Encoded': False
-                }
-            
-            if datetime.now() > verification['expires_at']:
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'error': 'Код истек'}),
-                    'isBase64Encoded': False
-                }
-            
-            password_hash = hash_password(new_password)
-            cur.execute(
-                "UPDATE t_p613096_greeting_project_36.verification_codes SET used = TRUE WHERE id = %s",
-                (verification['id'],)
-            )
-            cur.execute(
-                "UPDATE t_p613096_greeting_project_36.users SET password_hash = %s WHERE email = %s",
-                (password_hash, email)
-            )
+        raw_body = parse_body(event)
+        action = raw_body.get('action')
+        route = router.resolve(action) if isinstance(action, str) else None
+        # в метку попадает только зарегистрированное имя действия: значение от клиента
+        # не должно порождать новые серии метрик
+        tag(action=action if route else 'unknown')
+        if route is None:
+            return error(400, 'Неизвестное действие')
+        action_handler, schema = route
+        body = schema.validate(raw_body)
+    except ValidationError as e:
+        return error(e.status, str(e))
+
+    checks = throttle.checks_for(action, body.get('email'), throttle.source_ip(event))
+    retry_after = throttle.local_retry_after(checks)
+    if retry_after:
+        return too_many_requests(retry_after)
+
+    try:
+        conn = get_db_connection()
+    except PoolTimeout as e:
+        return error(503, str(e), {'Retry-After': '1'})
+    cur = dict_cursor(conn)
+
+    try:
+        if checks:
+            retry_after = throttle.shared_retry_after(cur, checks)
             conn.commit()
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': True, 'message': 'Пароль изменен'}),
-                'isBase64Encoded': False
-            }
-        
-        else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Неизвестное действие'}),
-                'isBase64Encoded': False
-            }
-    
+            if retry_after:
+                return too_many_requests(retry_after)
+
+        return action_handler(conn, cur, body, event)
+
+    except (HasherBusy, SessionStoreError) as e:
+        conn.rollback()
+        return error(503, str(e), {'Retry-After': '1'})
     except Exception as e:
         conn.rollback()
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': str(e)}),
-            'isBase64Encoded': False
-        }
+        return error(500, str(e))
     finally:
         cur.close()
-        conn.close()
\ No newline at end of file
+        release_db_connection(conn)
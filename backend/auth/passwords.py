@@ -0,0 +1,118 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+from typing import Callable, Dict, Optional, Tuple, TypeVar
+
+SCRYPT_N = int(os.environ.get('PASSWORD_SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.environ.get('PASSWORD_SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('PASSWORD_SCRYPT_P', '1'))
+HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', str(HASH_WORKERS * 8)))
+HASH_WAIT_SECONDS = float(os.environ.get('PASSWORD_HASH_WAIT_SECONDS', '5'))
+
+LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+T = TypeVar('T')
+
+class HasherBusy(Exception):
+    """Очередь проверки паролей переполнена"""
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip('=')
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + '=' * (-len(data) % 4))
+
+class ScryptHasher:
+    """scrypt с параметрами стоимости в самом хеше: $scrypt$n=...,r=...,p=...$соль$хеш"""
+
+    name = 'scrypt'
+
+    def __init__(self, n: int, r: int, p: int):
+        self.n, self.r, self.p = n, r, p
+
+    def _derive(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r + 1024 * 1024, dklen=32)
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_bytes(16)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f'$scrypt$n={self.n},r={self.r},p={self.p}${_b64encode(salt)}${_b64encode(key)}'
+
+    def verify(self, password: str, encoded: str) -> bool:
+        _, _, params, salt, key = encoded.split('$')
+        cost = dict(item.split('=') for item in params.split(','))
+        derived = self._derive(password, _b64decode(salt), int(cost['n']), int(cost['r']), int(cost['p']))
+        return hmac.compare_digest(derived, _b64decode(key))
+
+    def needs_rehash(self, encoded: str) -> bool:
+        return not encoded.startswith(f'$scrypt$n={self.n},r={self.r},p={self.p}$')
+
+class LegacySha256Hasher:
+    """Несоленый sha256 из первых версий; только проверка, при входе заменяется на scrypt"""
+
+    name = 'sha256'
+
+    def verify(self, password: str, encoded: str) -> bool:
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+
+current = ScryptHasher(SCRYPT_N, SCRYPT_R, SCRYPT_P)
+_legacy = LegacySha256Hasher()
+
+HASHERS: Dict[str, object] = {current.name: current, _legacy.name: _legacy}
+
+def _identify(encoded: str):
+    if LEGACY_SHA256.match(encoded):
+        return _legacy
+    algorithm = encoded.split('$')[1] if encoded.startswith('$') else ''
+    hasher = HASHERS.get(algorithm)
+    if hasher is None:
+        raise ValueError(f'Неизвестный алгоритм хеша пароля: {algorithm}')
+    return hasher
+
+# Проверка пароля нагружает CPU: ограниченный пул не дает одновременным входам занять все
+# ядра, а лимит очереди отклоняет лишние запросы вместо бесконечного ожидания.
+_pool = None
+_pool_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_QUEUE_LIMIT)
+
+def _executor():
+    """Пул потоков создается при первой проверке пароля: холодный старт без concurrent.futures"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix='password-hash')
+    return _pool
+
+def _run(fn: Callable[..., T], *args: object) -> T:
+    if not _slots.acquire(timeout=HASH_WAIT_SECONDS):
+        raise HasherBusy('Сервер перегружен, повторите попытку')
+    try:
+        return _executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(password: str) -> str:
+    """Хешировать пароль текущим алгоритмом в пуле проверки паролей"""
+    return _run(current.hash, password)
+
+_dummy_hash: Optional[str] = None
+
+def verify_password(password: str, encoded: Optional[str]) -> Tuple[bool, bool]:
+    """Проверить пароль в пуле; второй элемент — нужно ли перехешировать текущими параметрами"""
+    global _dummy_hash
+    if encoded is None:
+        # пользователя нет: тратим столько же времени, чтобы по задержке нельзя было перебирать email
+        _dummy_hash = _dummy_hash or current.hash(secrets.token_hex(8))
+        _run(current.verify, password, _dummy_hash)
+        return False, False
+    hasher = _identify(encoded)
+    ok = _run(hasher.verify, password, encoded)
+    needs_rehash = hasher is not current or current.needs_rehash(encoded)
+    return ok, ok and needs_rehash
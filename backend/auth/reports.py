@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_REPORT_HOURS = 24 * 7
+
+def report_period(since: Optional[str], until: Optional[str]) -> Tuple[datetime, datetime]:
+    """Границы периода отчета, округленные до часа; по умолчанию последняя неделя"""
+    now = datetime.now()
+    start = datetime.fromisoformat(since) if since else now - timedelta(hours=DEFAULT_REPORT_HOURS)
+    end = datetime.fromisoformat(until) if until else now + timedelta(hours=1)
+    return start.replace(minute=0, second=0, microsecond=0), end.replace(minute=0, second=0, microsecond=0)
+
+def sales_report(cur: Any, since: datetime, until: datetime) -> Dict[str, Any]:
+    """Продажи за период из почасовых итогов: по типам билетов и по часам"""
+    cur.execute(
+        """SELECT event_title, ticket_type,
+               SUM(orders)::INTEGER AS orders, SUM(tickets)::INTEGER AS tickets, SUM(revenue)::BIGINT AS revenue
+        FROM t_p613096_greeting_project_36.sales_hourly
+        WHERE hour >= %s AND hour < %s
+        GROUP BY event_title, ticket_type
+        ORDER BY revenue DESC""",
+        (since, until)
+    )
+    by_ticket_type = [dict(row) for row in cur.fetchall()]
+    cur.execute(
+        """SELECT hour, SUM(tickets)::INTEGER AS tickets, SUM(revenue)::BIGINT AS revenue
+        FROM t_p613096_greeting_project_36.sales_hourly
+        WHERE hour >= %s AND hour < %s
+        GROUP BY hour
+        ORDER BY hour""",
+        (since, until)
+    )
+    by_hour = [{'hour': row['hour'].isoformat(), 'tickets': row['tickets'], 'revenue': row['revenue']} for row in cur.fetchall()]
+    cur.execute("SELECT refreshed_at FROM t_p613096_greeting_project_36.sales_watermark WHERE id = 1")
+    watermark = cur.fetchone()
+
+    events: Dict[str, Dict[str, Any]] = {}
+    for row in by_ticket_type:
+        event = events.setdefault(row['event_title'], {'event_title': row['event_title'], 'tickets': 0, 'revenue': 0})
+        event['tickets'] += row['tickets']
+        event['revenue'] += row['revenue']
+    return {
+        'since': since.isoformat(),
+        'until': until.isoformat(),
+        'refreshed_at': watermark['refreshed_at'].isoformat() if watermark and watermark['refreshed_at'] else None,
+        'events': sorted(events.values(), key=lambda e: -e['revenue']),
+        'ticket_types': by_ticket_type,
+        'hours': by_hour,
+    }
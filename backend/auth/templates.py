@@ -0,0 +1,42 @@
+import re
+from typing import Any, Iterable, List, Tuple
+
+def _escape(value: str) -> str:
+    """То же, что html.escape(value, quote=True), без импорта html.entities при холодном старте"""
+    return (value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            .replace('"', '&quot;').replace('\'', '&#x27;'))
+
+_SLOT = re.compile(r'\{\{(\{)?\s*(\w+)\s*\}?\}\}')
+
+class Template:
+    """Шаблон, один раз разобранный на статические куски и слоты"""
+
+    def __init__(self, source: str, escape: bool = True, compact: bool = True):
+        if compact:
+            # отступы исходника не нужны в письме и только увеличивают его размер
+            source = '\n'.join(line.strip() for line in source.strip().splitlines() if line.strip())
+        parts: List[str] = []
+        slots: List[Tuple[int, str, bool]] = []
+        position = 0
+        # {{ name }} экранируется для HTML, {{{ name }}} вставляется как есть (уже отрендеренные блоки)
+        for match in _SLOT.finditer(source):
+            parts.append(source[position:match.start()])
+            slots.append((len(parts), match.group(2), escape and not match.group(1)))
+            parts.append('')
+            position = match.end()
+        parts.append(source[position:])
+        self._parts = parts
+        self._slots = tuple(slots)
+        self.names = frozenset(name for _, name, _ in slots)
+
+    def render(self, **values: Any) -> str:
+        parts = self._parts[:]
+        for index, name, escape in self._slots:
+            value = values[name]
+            # числа экранировать незачем
+            parts[index] = _escape(value) if escape and value.__class__ is str else str(value)
+        return ''.join(parts)
+
+    def render_each(self, rows: Iterable[dict]) -> str:
+        """Отрендерить шаблон для каждой строки и склеить за один проход"""
+        return ''.join([self.render(**row) for row in rows])
@@ -0,0 +1,121 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+def _rule(name: str, default: str) -> Tuple[float, float]:
+    """Лимит вида "5/600": емкость ведра и скорость пополнения в токенах в секунду"""
+    capacity, _, seconds = os.environ.get(name, default).partition('/')
+    return float(capacity), float(capacity) / float(seconds)
+
+# Действия, отправляющие код на почту или проверяющие его, и лимиты по email и по IP
+RULES: Dict[str, Dict[str, Tuple[float, float]]] = {
+    'register': {
+        'email': _rule('THROTTLE_SEND_CODE_PER_EMAIL', '3/600'),
+        'ip': _rule('THROTTLE_SEND_CODE_PER_IP', '20/600'),
+    },
+    'reset_password_request': {
+        'email': _rule('THROTTLE_SEND_CODE_PER_EMAIL', '3/600'),
+        'ip': _rule('THROTTLE_SEND_CODE_PER_IP', '20/600'),
+    },
+    'verify': {
+        'email': _rule('THROTTLE_CHECK_CODE_PER_EMAIL', '5/600'),
+        'ip': _rule('THROTTLE_CHECK_CODE_PER_IP', '50/600'),
+    },
+    'reset_password': {
+        'email': _rule('THROTTLE_CHECK_CODE_PER_EMAIL', '5/600'),
+        'ip': _rule('THROTTLE_CHECK_CODE_PER_IP', '50/600'),
+    },
+}
+
+Check = Tuple[str, float, float]
+
+def source_ip(event: Dict[str, Any]) -> Optional[str]:
+    """IP клиента из контекста запроса шлюза или X-Forwarded-For"""
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    if identity.get('sourceIp'):
+        return identity['sourceIp']
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'x-forwarded-for' and value:
+            return str(value).split(',')[0].strip()
+    return None
+
+def checks_for(action: Optional[str], email: Optional[str], ip: Optional[str]) -> List[Check]:
+    """Ведра, из которых действие должно взять по токену: (ключ, емкость, скорость)"""
+    rules = RULES.get(action or '')
+    if not rules:
+        return []
+    checks = []
+    if ip:
+        checks.append((f'{action}:ip:{ip}', *rules['ip']))
+    if email:
+        checks.append((f'{action}:email:{str(email).strip().lower()}', *rules['email']))
+    return checks
+
+class LocalBuckets:
+    """Ведра в памяти процесса: быстрый отказ без обращения к БД, пока общее ведро заведомо пусто"""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._buckets: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _tokens(self, key: str, capacity: float, rate: float, now: float) -> List[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [capacity, now]
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def retry_after(self, key: str, capacity: float, rate: float) -> float:
+        """Через сколько секунд в ведре появится токен; 0, если он есть уже сейчас"""
+        with self._lock:
+            tokens = self._tokens(key, capacity, rate, time.monotonic())[0]
+        return 0.0 if tokens >= 1 else (1 - tokens) / rate
+
+    def sync(self, key: str, tokens: float) -> None:
+        """Принять остаток из общего хранилища"""
+        with self._lock:
+            if key in self._buckets:
+                self._buckets[key] = [tokens, time.monotonic()]
+
+local = LocalBuckets()
+
+def local_retry_after(checks: List[Check]) -> Optional[int]:
+    """Отказ по ведрам процесса, без обращения к БД"""
+    wait = max((local.retry_after(*check) for check in checks), default=0.0)
+    return math.ceil(wait) if wait > 0 else None
+
+def shared_retry_after(cur: Any, checks: List[Check]) -> Optional[int]:
+    """Взять по токену из общих ведер в PostgreSQL одним запросом; строка ведра блокируется на время пересчета"""
+    if not checks:
+        return None
+    cur.execute(
+        """INSERT INTO t_p613096_greeting_project_36.rate_limit_buckets AS b (key, tokens, rate, updated_at)
+        SELECT key, capacity - 1, rate, NOW()
+        FROM unnest(%s::text[], %s::float8[], %s::float8[]) AS r(key, capacity, rate)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST(EXCLUDED.tokens + 1, b.tokens + EXTRACT(EPOCH FROM EXCLUDED.updated_at - b.updated_at) * EXCLUDED.rate) - 1,
+            rate = EXCLUDED.rate,
+            updated_at = EXCLUDED.updated_at
+        WHERE LEAST(EXCLUDED.tokens + 1, b.tokens + EXTRACT(EPOCH FROM EXCLUDED.updated_at - b.updated_at) * EXCLUDED.rate) >= 1
+        RETURNING key, tokens""",
+        ([c[0] for c in checks], [c[1] for c in checks], [c[2] for c in checks])
+    )
+    taken = {row['key']: row['tokens'] for row in cur.fetchall()}
+    wait = 0.0
+    for key, capacity, rate in checks:
+        if key in taken:
+            local.sync(key, taken[key])
+        else:
+            # общее ведро пусто: следующие запросы отклонятся в процессе, пока оно не пополнится
+            local.sync(key, 0.0)
+            wait = max(wait, 1 / rate)
+    return math.ceil(wait) if wait > 0 else None
@@ -0,0 +1,213 @@
+import hmac
+import json
+import os
+from email.mime.image import MIMEImage
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from typing import Dict, Any, List, Optional, Tuple
+from db import PoolTimeout, dict_cursor, get_db_connection, release_db_connection
+from metrics import dumps, instrumented, span
+import qr_images
+from smtp_transport import get_transport, smtp_configured
+
+BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', '50'))
+MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '6'))
+LEASE_SECONDS = int(os.environ.get('OUTBOX_LEASE_SECONDS', '120'))
+BACKOFF_BASE_SECONDS = int(os.environ.get('OUTBOX_BACKOFF_BASE_SECONDS', '30'))
+MAX_BATCHES_LIMIT = int(os.environ.get('OUTBOX_MAX_BATCHES_LIMIT', '50'))
+MAINTENANCE_TOKEN = os.environ.get('MAINTENANCE_TOKEN', '')
+
+def build_message(to_email: str, subject: str, body: str, body_text: Optional[str] = None,
+                  images: Optional[List[Tuple[str, bytes]]] = None) -> MIMEMultipart:
+    """Собрать письмо из строки outbox: text/plain и HTML как альтернативы, QR-картинки — inline по Content-ID"""
+    alternative = MIMEMultipart('alternative')
+    # по RFC 2046 предпочтительная версия идет последней
+    if body_text:
+        alternative.attach(MIMEText(body_text, 'plain', 'utf-8'))
+    alternative.attach(MIMEText(body, 'html', 'utf-8'))
+
+    msg = alternative
+    if images:
+        msg = MIMEMultipart('related')
+        msg.attach(alternative)
+        for number, (digest, png) in enumerate(images, 1):
+            image = MIMEImage(png, 'png')
+            image['Content-ID'] = f'<{digest}@eventhub>'
+            image.add_header('Content-Disposition', 'inline', filename=f'ticket-{number}.png')
+            msg.attach(image)
+
+    msg['From'] = os.environ.get('SMTP_FROM') or os.environ.get('SMTP_USER', '')
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    return msg
+
+def message_images(row: Dict[str, Any], images: Dict[str, bytes]) -> List[Tuple[str, bytes]]:
+    """Картинки письма в порядке его кодов"""
+    digests = (qr_images.digest(code) for code in row.get('qr_codes') or [])
+    return [(digest, images[digest]) for digest in digests if digest in images]
+
+def claim_batch(conn: Any, limit: int) -> List[Dict[str, Any]]:
+    """Забрать пачку писем: аренда через next_attempt_at, параллельные дренеры не пересекаются"""
+    with dict_cursor(conn) as cur:
+        cur.execute(
+            """UPDATE t_p613096_greeting_project_36.email_outbox
+            SET attempts = attempts + 1, next_attempt_at = NOW() + make_interval(secs => %s)
+            WHERE id IN (
+                SELECT id FROM t_p613096_greeting_project_36.email_outbox
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY next_attempt_at, id LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, to_email, subject, body, body_text, qr_codes, attempts""",
+            (LEASE_SECONDS, limit)
+        )
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+def mark_sent(conn: Any, ids: List[int]) -> None:
+    """Отметить письма как отправленные"""
+    if not ids:
+        return
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE t_p613096_greeting_project_36.email_outbox
+            SET status = 'sent', sent_at = NOW(), last_error = NULL WHERE id = ANY(%s)""",
+            (ids,)
+        )
+    conn.commit()
+
+def mark_failed(conn: Any, row: Dict[str, Any], error: str) -> None:
+    """Запланировать повтор с экспоненциальной задержкой или сдаться"""
+    give_up = row['attempts'] >= MAX_ATTEMPTS
+    delay = BACKOFF_BASE_SECONDS * (2 ** (row['attempts'] - 1))
+    with conn.cursor() as cur:
+        cur.execute(
+            """UPDATE t_p613096_greeting_project_36.email_outbox
+            SET status = %s, last_error = %s, next_attempt_at = NOW() + make_interval(secs => %s)
+            WHERE id = %s""",
+            ('failed' if give_up else 'pending', error[:1000], delay, row['id'])
+        )
+    conn.commit()
+
+def drain(max_batches: int = 10) -> Dict[str, int]:
+    """Отправить накопившиеся письма пачками"""
+    stats = {'claimed': 0, 'sent': 0, 'failed': 0}
+    transport = get_transport()
+    conn = get_db_connection()
+    try:
+        for _ in range(max_batches):
+            rows = claim_batch(conn, BATCH_SIZE)
+            if not rows:
+                break
+            stats['claimed'] += len(rows)
+            codes = [code for row in rows for code in row['qr_codes'] or []]
+            images: Dict[str, bytes] = {}
+            if codes:
+                # коды всех писем пачки кодируются вместе; без картинок письмо все равно уходит,
+                # коды билетов есть в его текстовой версии
+                with span('qr.encode'):
+                    try:
+                        images = qr_images.images_for(conn, codes)
+                    except Exception as e:
+                        conn.rollback()
+                        print(f'QR encode error: {e}')
+            with span('email.build'):
+                messages = [
+                    build_message(row['to_email'], row['subject'], row['body'], row['body_text'], message_images(row, images))
+                    for row in rows
+                ]
+            with span('smtp.send'):
+                results = transport.send_many(messages)
+            sent_ids = []
+            for row, error in zip(rows, results):
+                if error is None:
+                    sent_ids.append(row['id'])
+                else:
+                    print(f'Email error: {error}')
+                    mark_failed(conn, row, str(error))
+                    stats['failed'] += 1
+            mark_sent(conn, sent_ids)
+            stats['sent'] += len(sent_ids)
+            if len(rows) < BATCH_SIZE:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        release_db_connection(conn)
+    return stats
+
+def json_response(status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **(headers or {})},
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+def authorized(event: Dict[str, Any]) -> bool:
+    """Таймер передает тот же общий секрет MAINTENANCE_TOKEN, что и maintenance, в заголовке X-Maintenance-Token"""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'x-maintenance-token' and value:
+            return hmac.compare_digest(str(value).encode(), MAINTENANCE_TOKEN.encode())
+    return False
+
+@instrumented('mailer')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Отправляет письма из outbox (вызывается по таймеру)
+    Args: event - содержит httpMethod, заголовок X-Maintenance-Token, опционально body с max_batches
+          context - контекст выполнения функции
+    Returns: HTTP ответ со статистикой отправки
+    """
+    method = event.get('httpMethod', 'POST')
+
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Maintenance-Token',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    # каждый вызов держит соединение и SMTP-сессию на max_batches пачек: без секрета не запускается
+    if not MAINTENANCE_TOKEN:
+        return json_response(503, {'error': 'Не задан MAINTENANCE_TOKEN'})
+    if not authorized(event):
+        return json_response(401, {'error': 'Требуется заголовок X-Maintenance-Token'})
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return json_response(400, {'error': 'Неверный JSON в теле запроса'})
+    max_batches = body.get('max_batches', 10) if isinstance(body, dict) else None
+    if not isinstance(max_batches, int) or isinstance(max_batches, bool) or max_batches < 1:
+        return json_response(400, {'error': 'max_batches должно быть положительным целым'})
+
+    # без релея очередь не трогается: письма не арендуются и не копят неудачные попытки,
+    # а таймер получает ответ о том, что отправка выключена, а не 500
+    if not smtp_configured():
+        return json_response(200, {'success': True, 'smtp_configured': False, 'claimed': 0, 'sent': 0, 'failed': 0})
+
+    try:
+        stats = drain(min(max_batches, MAX_BATCHES_LIMIT))
+    except PoolTimeout as e:
+        return json_response(503, {'error': str(e)}, {'Retry-After': '1'})
+    except Exception as e:
+        print(f'Outbox error: {e}')
+        return json_response(500, {'error': str(e)})
+
+    return json_response(200, {'success': True, 'smtp_configured': True, **stats})
+
+if __name__ == '__main__':
+    import time
+    while True:
+        result = drain()
+        if not result['claimed']:
+            time.sleep(float(os.environ.get('OUTBOX_POLL_INTERVAL', '2')))
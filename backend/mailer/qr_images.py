@@ -0,0 +1,65 @@
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+POOL_WORKERS = int(os.environ.get('QR_POOL_WORKERS', '0')) or os.cpu_count() or 1
+# Меньше этого числа новых картинок кодируются в текущем процессе: передача задач в пул дороже
+POOL_MIN_BATCH = int(os.environ.get('QR_POOL_MIN_BATCH', '16'))
+QR_SCALE = int(os.environ.get('QR_SCALE', '4'))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def digest(code: str) -> str:
+    """Адрес картинки в кеше; тот же хеш стоит в Content-ID письма (orders/tickets.content_id)"""
+    return hashlib.sha256(code.encode()).hexdigest()
+
+def encode_png(code: str) -> bytes:
+    """PNG с QR-кодом; выполняется в процессах пула, поэтому функция уровня модуля"""
+    import segno
+    buffer = io.BytesIO()
+    segno.make(code, error='m', micro=False).save(buffer, kind='png', scale=QR_SCALE, border=2)
+    return buffer.getvalue()
+
+def _executor() -> ProcessPoolExecutor:
+    """Пул процессов создается при первой большой пачке, а не при импорте функции"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=POOL_WORKERS)
+    return _pool
+
+def encode_many(codes: List[str]) -> List[bytes]:
+    """Закодировать пачку кодов: крупные пачки — в пуле процессов чанками по воркерам"""
+    if len(codes) < POOL_MIN_BATCH or POOL_WORKERS < 2:
+        return [encode_png(code) for code in codes]
+    chunksize = max(1, len(codes) // (POOL_WORKERS * 4))
+    return list(_executor().map(encode_png, codes, chunksize=chunksize))
+
+def images_for(conn: Any, codes: List[str]) -> Dict[str, bytes]:
+    """PNG по хешу кода для всех писем пачки: из кеша qr_images, недостающие кодируются и сохраняются"""
+    wanted = {digest(code): code for code in codes}
+    if not wanted:
+        return {}
+    with conn.cursor() as cur:
+        cur.execute(
+            'SELECT digest, png FROM t_p613096_greeting_project_36.qr_images WHERE digest = ANY(%s)',
+            (list(wanted),)
+        )
+        images = {row[0]: bytes(row[1]) for row in cur.fetchall()}
+        missing = [key for key in wanted if key not in images]
+        if missing:
+            encoded = encode_many([wanted[key] for key in missing])
+            images.update(zip(missing, encoded))
+            cur.execute(
+                """INSERT INTO t_p613096_greeting_project_36.qr_images (digest, png)
+                SELECT * FROM unnest(%s::char(64)[], %s::bytea[])
+                ON CONFLICT (digest) DO NOTHING""",
+                (missing, encoded)
+            )
+    conn.commit()
+    return images
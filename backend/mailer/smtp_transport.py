@@ -0,0 +1,156 @@
+import os
+import smtplib
+import threading
+import time
+from email.message import Message
+from typing import Dict, List, Optional, Tuple
+
+class RelayRateLimiter:
+    """Ограничение писем в секунду на один SMTP-релей"""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_limiters: Dict[Tuple[str, int], RelayRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+def get_relay_limiter(host: str, port: int, per_second: float) -> RelayRateLimiter:
+    """Общий лимитер для всех сессий к одному релею"""
+    with _limiters_lock:
+        limiter = _limiters.get((host, port))
+        if limiter is None:
+            limiter = _limiters[(host, port)] = RelayRateLimiter(per_second)
+        return limiter
+
+class SmtpTransport:
+    """Постоянная авторизованная SMTP-сессия, переиспользуемая для многих писем"""
+
+    def __init__(self, host: str, port: int, user: Optional[str] = None, password: Optional[str] = None,
+                 use_tls: bool = True, timeout: float = 5.0, rate_limit: float = 0.0,
+                 max_messages_per_session: int = 100, idle_timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_messages_per_session = max_messages_per_session
+        self.idle_timeout = idle_timeout
+        self.limiter = get_relay_limiter(host, port, rate_limit)
+        self.stats = {'sessions': 0, 'reconnects': 0, 'sent': 0, 'errors': 0}
+        self._server: Optional[smtplib.SMTP] = None
+        self._session_messages = 0
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self.stats['sessions'] += 1
+        self._session_messages = 0
+        return server
+
+    def _drop(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                self._server.close()
+            self._server = None
+
+    def _session(self) -> smtplib.SMTP:
+        """Вернуть живую сессию, при необходимости переподключиться"""
+        if self._server is not None:
+            if self._session_messages >= self.max_messages_per_session:
+                self._drop()
+            elif time.monotonic() - self._last_used > self.idle_timeout:
+                try:
+                    if self._server.noop()[0] != 250:
+                        self._drop()
+                except (smtplib.SMTPException, OSError):
+                    self._server.close()
+                    self._server = None
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def send(self, msg: Message) -> None:
+        """Отправить одно письмо, один раз переподключившись при обрыве сессии"""
+        with self._lock:
+            self.limiter.wait()
+            for attempt in range(2):
+                server = self._session()
+                try:
+                    server.send_message(msg)
+                    break
+                except OSError as e:
+                    if isinstance(e, smtplib.SMTPException) and not isinstance(e, smtplib.SMTPServerDisconnected):
+                        self.stats['errors'] += 1
+                        raise
+                    self._server = None
+                    server.close()
+                    if attempt:
+                        self.stats['errors'] += 1
+                        raise
+                    self.stats['reconnects'] += 1
+            self._session_messages += 1
+            self._last_used = time.monotonic()
+            self.stats['sent'] += 1
+
+    def send_many(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """Отправить пачку писем в одной сессии; для каждого письма None или ошибка"""
+        results: List[Optional[Exception]] = []
+        for msg in messages:
+            try:
+                self.send(msg)
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
+
+_transport: Optional[SmtpTransport] = None
+
+def smtp_configured() -> bool:
+    """Задан ли релей: без SMTP_HOST письма отправлять некуда"""
+    return bool(os.environ.get('SMTP_HOST'))
+
+def get_transport() -> SmtpTransport:
+    """Транспорт уровня модуля, переживающий теплые вызовы функции"""
+    global _transport
+    if _transport is None:
+        if not smtp_configured():
+            raise RuntimeError('SMTP не настроен')
+        _transport = SmtpTransport(
+            os.environ['SMTP_HOST'],
+            int(os.environ.get('SMTP_PORT', '587')),
+            os.environ.get('SMTP_USER'),
+            os.environ.get('SMTP_PASSWORD'),
+            use_tls=os.environ.get('SMTP_STARTTLS', 'true').lower() != 'false',
+            rate_limit=float(os.environ.get('SMTP_RATE_LIMIT', '0')),
+            max_messages_per_session=int(os.environ.get('SMTP_MAX_MESSAGES_PER_SESSION', '100')),
+            idle_timeout=float(os.environ.get('SMTP_IDLE_TIMEOUT', '60'))
+        )
+    return _transport
@@ -0,0 +1,324 @@
+import gzip
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, List, Optional
+from db import PoolTimeout, get_db_connection, release_db_connection
+from metrics import dumps, instrumented, span, tag
+
+PURGE_BATCH_SIZE = int(os.environ.get('PURGE_BATCH_SIZE', '1000'))
+PURGE_TIME_BUDGET_SECONDS = float(os.environ.get('PURGE_TIME_BUDGET_SECONDS', '20'))
+SALES_REFRESH_WINDOW_HOURS = int(os.environ.get('SALES_REFRESH_WINDOW_HOURS', '24'))
+SALES_REFRESH_CHUNK_HOURS = int(os.environ.get('SALES_REFRESH_CHUNK_HOURS', '168'))
+ORDERS_PARTITIONS_AHEAD_MONTHS = int(os.environ.get('ORDERS_PARTITIONS_AHEAD_MONTHS', '3'))
+ORDERS_HOT_MONTHS = int(os.environ.get('ORDERS_HOT_MONTHS', '24'))
+ARCHIVE_CHUNK_ROWS = int(os.environ.get('ARCHIVE_CHUNK_ROWS', '50000'))
+ARCHIVE_LOCK_TIMEOUT = os.environ.get('ARCHIVE_LOCK_TIMEOUT', '5s')
+MAINTENANCE_TOKEN = os.environ.get('MAINTENANCE_TOKEN', '')
+
+def run_in_batches(conn: Any, sql: str) -> Dict[str, Any]:
+    """Повторять запрос (с параметром LIMIT) пачками с коммитом после каждой, чтобы не держать долгих блокировок"""
+    started = time.monotonic()
+    rows = 0
+    batches = 0
+    with conn.cursor() as cur:
+        while time.monotonic() - started < PURGE_TIME_BUDGET_SECONDS:
+            cur.execute(sql, (PURGE_BATCH_SIZE,))
+            affected = cur.rowcount
+            conn.commit()
+            rows += affected
+            batches += 1
+            if affected < PURGE_BATCH_SIZE:
+                break
+    return {'rows': rows, 'batches': batches, 'seconds': round(time.monotonic() - started, 3)}
+
+def purge_in_batches(conn: Any, table: str, condition: str) -> Dict[str, Any]:
+    """Удалить строки по условию короткими пачками"""
+    result = run_in_batches(
+        conn,
+        f"""DELETE FROM t_p613096_greeting_project_36.{table}
+        WHERE ctid = ANY(ARRAY(
+            SELECT ctid FROM t_p613096_greeting_project_36.{table}
+            WHERE {condition}
+            LIMIT %s FOR UPDATE SKIP LOCKED
+        ))"""
+    )
+    return {'rows_purged': result.pop('rows'), **result}
+
+def purge_verification_codes(conn: Any) -> Dict[str, Any]:
+    """Удалить использованные и просроченные коды подтверждения"""
+    return purge_in_batches(conn, 'verification_codes', 'used = TRUE OR expires_at < NOW()')
+
+def purge_idempotency_keys(conn: Any) -> Dict[str, Any]:
+    """Удалить истекшие ключи идемпотентности заказов"""
+    return purge_in_batches(conn, 'idempotency_keys', 'expires_at < NOW()')
+
+def purge_revoked_sessions(conn: Any) -> Dict[str, Any]:
+    """Удалить записи об отозванных сессиях, чьи токены уже истекли"""
+    return purge_in_batches(conn, 'revoked_sessions', 'expires_at < NOW()')
+
+def purge_rate_limit_buckets(conn: Any) -> Dict[str, Any]:
+    """Удалить давно не использованные ведра ограничения частоты (они уже полностью пополнились)"""
+    return purge_in_batches(conn, 'rate_limit_buckets', "updated_at < NOW() - INTERVAL '1 day'")
+
+def purge_qr_images(conn: Any) -> Dict[str, Any]:
+    """Удалить давно закодированные QR-картинки: письма с ними уже отправлены"""
+    return purge_in_batches(conn, 'qr_images', "created_at < NOW() - INTERVAL '30 days'")
+
+def release_expired_holds(conn: Any) -> Dict[str, Any]:
+    """Вернуть в продажу неоплаченные брони с истекшим сроком и пометить их заказы истекшими"""
+    result = run_in_batches(
+        conn,
+        """WITH expired AS (
+            UPDATE t_p613096_greeting_project_36.ticket_holds SET status = 'released'
+            WHERE id = ANY(ARRAY(
+                SELECT id FROM t_p613096_greeting_project_36.ticket_holds
+                WHERE status = 'held' AND expires_at < NOW()
+                ORDER BY expires_at LIMIT %s FOR UPDATE SKIP LOCKED
+            ))
+            RETURNING order_id, ticket_type_id, bucket, quantity
+        ), restocked AS (
+            UPDATE t_p613096_greeting_project_36.ticket_inventory_buckets b
+            SET remaining = b.remaining + r.quantity
+            FROM (
+                SELECT ticket_type_id, bucket, SUM(quantity) AS quantity
+                FROM expired GROUP BY ticket_type_id, bucket
+            ) r
+            WHERE b.ticket_type_id = r.ticket_type_id AND b.bucket = r.bucket
+        ), expired_orders AS (
+            UPDATE t_p613096_greeting_project_36.orders SET status = 'expired'
+            WHERE id IN (SELECT order_id FROM expired) AND status = 'reserved'
+        )
+        SELECT 1 FROM expired"""
+    )
+    return {'holds_released': result.pop('rows'), **result}
+
+SALES_WINDOW_SQL = """SELECT LEAST(COALESCE(w.settled_until, (
+        SELECT date_trunc('hour', MIN(o.created_at)) FROM t_p613096_greeting_project_36.orders o
+    )), win.start), win.start, date_trunc('hour', NOW()) + INTERVAL '1 hour'
+FROM t_p613096_greeting_project_36.sales_watermark w,
+     (SELECT date_trunc('hour', NOW() - make_interval(hours => %s)) AS start) win
+WHERE w.id = 1
+FOR UPDATE OF w"""
+
+SALES_CLEAR_SQL = """DELETE FROM t_p613096_greeting_project_36.sales_hourly WHERE hour >= %s AND hour < %s"""
+
+SALES_INSERT_SQL = """INSERT INTO t_p613096_greeting_project_36.sales_hourly
+(hour, event_title, ticket_type, orders, tickets, revenue)
+SELECT date_trunc('hour', o.created_at), oi.event_title, oi.ticket_type,
+       COUNT(DISTINCT oi.order_id), SUM(oi.quantity), SUM(oi.price * oi.quantity)
+FROM t_p613096_greeting_project_36.orders o
+JOIN t_p613096_greeting_project_36.order_items oi ON oi.order_id = o.id AND oi.created_at = o.created_at
+WHERE o.created_at >= %s AND o.created_at < %s AND o.status NOT IN ('reserved', 'expired')
+GROUP BY 1, 2, 3"""
+
+def refresh_sales_aggregates(conn: Any) -> Dict[str, Any]:
+    """Пересчитать почасовые итоги продаж за скользящее окно и еще не окончательные часы"""
+    # Часы окна каждый раз строятся заново из заказов, а не дополняются после отметки:
+    # заказ из транзакции, закоммиченной позже (пакетный импорт), или бронь, оплаченная
+    # после прошлого запуска, попадает в итоги при следующем запуске, пока его час в окне.
+    # Отстающие часы (первый запуск, долгий простой) догоняются кусками по
+    # SALES_REFRESH_CHUNK_HOURS с коммитом после каждого, в пределах бюджета времени.
+    started = time.monotonic()
+    hours = 0
+    chunks = 0
+    with conn.cursor() as cur:
+        while True:
+            cur.execute(SALES_WINDOW_SQL, (SALES_REFRESH_WINDOW_HOURS,))
+            since, window_start, until = cur.fetchone()
+            final = since >= window_start
+            end = until if final else min(since + timedelta(hours=SALES_REFRESH_CHUNK_HOURS), window_start)
+            cur.execute(SALES_CLEAR_SQL, (since, end))
+            cur.execute(SALES_INSERT_SQL, (since, end))
+            cur.execute(
+                """UPDATE t_p613096_greeting_project_36.sales_watermark
+                SET settled_until = %s, refreshed_at = CASE WHEN %s THEN NOW() ELSE refreshed_at END
+                WHERE id = 1""",
+                (min(end, window_start), final)
+            )
+            conn.commit()
+            hours += int((end - since).total_seconds() // 3600)
+            chunks += 1
+            if final or time.monotonic() - started >= PURGE_TIME_BUDGET_SECONDS:
+                break
+    return {'hours_refreshed': hours, 'chunks': chunks, 'caught_up': final,
+            'seconds': round(time.monotonic() - started, 3)}
+
+def create_order_partitions(conn: Any) -> Dict[str, Any]:
+    """Создать помесячные секции заказов и позиций на несколько месяцев вперед"""
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT t_p613096_greeting_project_36.create_order_partitions(
+                NOW()::DATE, (NOW() + make_interval(months => %s))::DATE
+            )""",
+            (ORDERS_PARTITIONS_AHEAD_MONTHS,)
+        )
+        created = cur.fetchone()[0]
+    conn.commit()
+    return {'months_created': created}
+
+def _copy_field(value: Any) -> str:
+    """Значение в текстовом формате COPY: архив восстанавливается через COPY ... FROM STDIN"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def export_partition(conn: Any, cur: Any, table: str, suffix: str, month: Any) -> int:
+    """Выгрузить секцию в orders_archive чанками gzip, читая ее серверным курсором"""
+    exported = 0
+    chunk = 0
+    with conn.cursor(name=f'archive_{table}_{suffix}') as source:
+        source.execute(f'SELECT * FROM t_p613096_greeting_project_36.{table}_p{suffix} ORDER BY id')
+        while True:
+            rows = source.fetchmany(ARCHIVE_CHUNK_ROWS)
+            if not rows:
+                break
+            data = ''.join('\t'.join(map(_copy_field, row)) + '\n' for row in rows)
+            cur.execute(
+                """INSERT INTO t_p613096_greeting_project_36.orders_archive
+                (month, table_name, chunk, rows, columns, data) VALUES (%s, %s, %s, %s, %s, %s)""",
+                (month, table, chunk, len(rows), ','.join(column[0] for column in source.description),
+                 gzip.compress(data.encode()))
+            )
+            chunk += 1
+            exported += len(rows)
+    return exported
+
+def archive_order_partitions(conn: Any) -> Dict[str, Any]:
+    """Выгрузить холодные месяцы заказов в архив и отсоединить их секции"""
+    started = time.monotonic()
+    archived: List[str] = []
+    rows = 0
+    with conn.cursor() as cur:
+        cur.execute(
+            """SELECT substr(c.relname, 9) FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 't_p613096_greeting_project_36.orders'::regclass
+              AND c.relname ~ '^orders_p[0-9]{6}$'
+              AND to_date(substr(c.relname, 9), 'YYYYMM') < date_trunc('month', NOW()) - make_interval(months => %s)
+            ORDER BY 1""",
+            (ORDERS_HOT_MONTHS,)
+        )
+        suffixes = [row[0] for row in cur.fetchall()]
+        conn.commit()
+
+        # Каждый месяц — одна транзакция: выгрузка, отсоединение и удаление секций либо
+        # проходят вместе, либо откатываются, и архив не расходится с таблицами.
+        for suffix in suffixes:
+            if time.monotonic() - started >= PURGE_TIME_BUDGET_SECONDS:
+                break
+            cur.execute('SET LOCAL lock_timeout = %s', (ARCHIVE_LOCK_TIMEOUT,))
+            cur.execute(
+                f"""LOCK TABLE t_p613096_greeting_project_36.orders_p{suffix},
+                t_p613096_greeting_project_36.order_items_p{suffix} IN SHARE MODE"""
+            )
+            month = datetime.strptime(suffix, '%Y%m').date()
+            cur.execute(
+                """SELECT settled_until IS NULL OR settled_until < %s::DATE + INTERVAL '1 month'
+                FROM t_p613096_greeting_project_36.sales_watermark WHERE id = 1""",
+                (month,)
+            )
+            if cur.fetchone()[0]:
+                # часы месяца еще не окончательны в почасовых итогах продаж
+                conn.rollback()
+                break
+            for table in ('orders', 'order_items'):
+                rows += export_partition(conn, cur, table, suffix, month)
+            for table in ('order_items', 'orders'):
+                cur.execute(
+                    f"""ALTER TABLE t_p613096_greeting_project_36.{table}
+                    DETACH PARTITION t_p613096_greeting_project_36.{table}_p{suffix}"""
+                )
+                cur.execute(f'DROP TABLE t_p613096_greeting_project_36.{table}_p{suffix}')
+            conn.commit()
+            archived.append(suffix)
+    return {'months_archived': archived, 'rows_archived': rows, 'seconds': round(time.monotonic() - started, 3)}
+
+JOBS: Dict[str, Callable[[Any], Dict[str, Any]]] = {
+    'purge_verification_codes': purge_verification_codes,
+    'purge_idempotency_keys': purge_idempotency_keys,
+    'purge_revoked_sessions': purge_revoked_sessions,
+    'purge_rate_limit_buckets': purge_rate_limit_buckets,
+    'purge_qr_images': purge_qr_images,
+    'release_expired_holds': release_expired_holds,
+    'refresh_sales_aggregates': refresh_sales_aggregates,
+    'create_order_partitions': create_order_partitions,
+    'archive_order_partitions': archive_order_partitions,
+}
+
+def json_response(status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **(headers or {})},
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+def authorized(event: Dict[str, Any]) -> bool:
+    """Таймер и ручной запуск передают общий секрет MAINTENANCE_TOKEN в заголовке X-Maintenance-Token"""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() == 'x-maintenance-token' and value:
+            return hmac.compare_digest(str(value).encode(), MAINTENANCE_TOKEN.encode())
+    return False
+
+@instrumented('maintenance')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Выполняет фоновые задачи обслуживания БД (вызывается по таймеру)
+    Args: event - содержит httpMethod, заголовок X-Maintenance-Token, опционально body с job (по умолчанию все задачи)
+          context - контекст выполнения функции
+    Returns: HTTP ответ с отчетом по каждой задаче
+    """
+    method = event.get('httpMethod', 'POST')
+
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-Maintenance-Token',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    # задачи удаляют и отсоединяют данные заказов, поэтому без секрета не запускается ни одна
+    if not MAINTENANCE_TOKEN:
+        return json_response(503, {'error': 'Не задан MAINTENANCE_TOKEN'})
+    if not authorized(event):
+        return json_response(401, {'error': 'Требуется заголовок X-Maintenance-Token'})
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        return json_response(400, {'error': 'Неверный JSON в теле запроса'})
+    if not isinstance(body, dict):
+        return json_response(400, {'error': 'Неверный формат запроса'})
+    job = body.get('job')
+    if job and (not isinstance(job, str) or job not in JOBS):
+        tag(job='unknown')
+        return json_response(400, {'error': 'Неизвестная задача'})
+    tag(job=job or 'all')
+
+    try:
+        conn = get_db_connection()
+    except PoolTimeout as e:
+        return json_response(503, {'error': str(e)}, {'Retry-After': '1'})
+    report = {}
+    try:
+        for name in ([job] if job else JOBS):
+            with span(f'job.{name}'):
+                report[name] = JOBS[name](conn)
+            print(f'Maintenance {name}: {report[name]}')
+    except Exception as e:
+        conn.rollback()
+        print(f'Maintenance error: {e}')
+        return json_response(500, {'error': str(e), 'report': report})
+    finally:
+        release_db_connection(conn)
+
+    return json_response(200, {'success': True, 'report': report})
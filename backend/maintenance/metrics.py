@@ -0,0 +1,227 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() == 'true'
+BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+_NOOP = nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+_histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+_collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+def _labels(tags: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in tags.items() if v is not None))
+
+def inc(name: str, value: float = 1, **tags: Any) -> None:
+    """Увеличить счетчик"""
+    if not ENABLED:
+        return
+    key = (name, _labels(tags))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, ms: float, **tags: Any) -> None:
+    """Записать значение в гистограмму (миллисекунды)"""
+    if not ENABLED:
+        return
+    key = (name, _labels(tags))
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(BUCKETS_MS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS_MS):
+            if ms <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS_MS)] += 1
+        hist[-1] += ms
+
+@contextmanager
+def _span(name: str, tags: Dict[str, Any]) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        observe('span_duration', ms, function=getattr(_local, 'function', None), span=name, **tags)
+        spans = getattr(_local, 'spans', None)
+        if spans is not None:
+            label = f"{name}:{tags['statement']}" if 'statement' in tags else name
+            spans[label] = round(spans.get(label, 0) + ms, 3)
+
+def span(name: str, **tags: Any) -> Any:
+    """Замер участка запроса: with span('db.commit'): ..."""
+    if not ENABLED:
+        return _NOOP
+    return _span(name, tags)
+
+HTTP_METHODS = frozenset(('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'HEAD'))
+
+def tag(**tags: Any) -> None:
+    """Добавить теги к текущему вызову (например action); только значения из конечного набора — они становятся метками"""
+    if ENABLED and getattr(_local, 'tags', None) is not None:
+        _local.tags.update(tags)
+
+def instrumented(function: str) -> Callable[[Callable], Callable]:
+    """Декоратор handler: структурированная строка лога и счетчики на каждый вызов"""
+    def decorate(handler: Callable) -> Callable:
+        if not ENABLED:
+            return handler
+
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            _local.function, _local.spans, _local.tags = function, {}, {}
+            started = time.perf_counter()
+            status = 500
+            try:
+                response = handler(event, context)
+                status = response.get('statusCode', 200)
+                return response
+            finally:
+                ms = (time.perf_counter() - started) * 1000
+                method = event.get('httpMethod')
+                # метод приходит от клиента: незнакомые значения не должны плодить серии
+                tags = {'function': function, 'method': method if method in HTTP_METHODS else 'other', **_local.tags}
+                inc('invocations_total', status=status, **tags)
+                observe('invocation_duration', ms, **tags)
+                print(json.dumps({
+                    'type': 'invocation', **tags, 'status': status,
+                    'duration_ms': round(ms, 3), 'spans': _local.spans
+                }, ensure_ascii=False))
+                _local.spans = _local.tags = None
+        return wrapper
+    return decorate
+
+def _timed_dumps(obj: Any, **kwargs: Any) -> str:
+    with _span('serialize', {}):
+        return json.dumps(obj, **kwargs)
+
+dumps: Callable[..., str] = _timed_dumps if ENABLED else json.dumps
+
+_STATEMENT_RE = re.compile(r'\b(SELECT\b.*?\bFROM|INSERT\s+INTO|UPDATE|DELETE\s+FROM|COPY)\s+(?:\w+\.)?(\w+)', re.I | re.S)
+_statement_names: Dict[str, str] = {}
+
+def statement_name(sql: str) -> str:
+    """Короткое имя запроса вида insert_orders, кешируется по тексту SQL"""
+    name = _statement_names.get(sql)
+    if name is None:
+        match = _STATEMENT_RE.search(sql)
+        name = f'{match.group(1).split()[0].lower()}_{match.group(2).lower()}' if match else 'other'
+        _statement_names[sql] = name
+    return name
+
+class TracedCursor:
+    def __init__(self, cursor: Any):
+        self._cursor = cursor
+
+    def execute(self, sql: Any, params: Any = None) -> Any:
+        with _span('db.query', {'statement': statement_name(str(sql))}):
+            return self._cursor.execute(sql, params)
+
+    def __enter__(self) -> 'TracedCursor':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._cursor.close()
+
+    def __iter__(self) -> Any:
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+class TracedConnection:
+    """Соединение, замеряющее каждый запрос и commit"""
+
+    def __init__(self, conn: Any):
+        self.raw = conn
+
+    def cursor(self, *args: Any, **kwargs: Any) -> TracedCursor:
+        return TracedCursor(self.raw.cursor(*args, **kwargs))
+
+    def commit(self) -> None:
+        with _span('db.commit', {}):
+            self.raw.commit()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.raw, name)
+
+def trace_connection(conn: Any) -> Any:
+    return TracedConnection(conn) if ENABLED else conn
+
+def untrace_connection(conn: Any) -> Any:
+    return conn.raw if isinstance(conn, TracedConnection) else conn
+
+def add_collector(prefix: str, collect: Callable[[], Dict[str, float]]) -> None:
+    """Зарегистрировать источник мгновенных значений (gauge), например статистику пула"""
+    _collectors[prefix] = collect
+
+def _escape_label(value: Any) -> str:
+    """Значение метки по формату экспозиции Prometheus: \\, " и перевод строки экранируются"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + '}'
+
+def render_prometheus() -> str:
+    """Все метрики процесса в текстовом формате Prometheus"""
+    lines: List[str] = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+    for name in sorted({k[0] for k in counters}):
+        lines.append(f'# TYPE eventhub_{name} counter')
+        for (metric, labels), value in counters.items():
+            if metric == name:
+                lines.append(f'eventhub_{name}{_format_labels(labels)} {value:g}')
+    for name in sorted({k[0] for k in histograms}):
+        lines.append(f'# TYPE eventhub_{name}_seconds histogram')
+        for (metric, labels), hist in histograms.items():
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS_MS + (None,), hist[:-1]):
+                cumulative += count
+                le = '+Inf' if bound is None else f'{bound / 1000:g}'
+                lines.append(f'eventhub_{name}_seconds_bucket{_format_labels(labels, ("le", le))} {cumulative}')
+            lines.append(f'eventhub_{name}_seconds_sum{_format_labels(labels)} {hist[-1] / 1000:g}')
+            lines.append(f'eventhub_{name}_seconds_count{_format_labels(labels)} {cumulative}')
+    for prefix, collect in _collectors.items():
+        for key, value in collect().items():
+            lines.append(f'# TYPE eventhub_{prefix}_{key} gauge')
+            lines.append(f'eventhub_{prefix}_{key} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+def start_exporter(port: int) -> None:
+    """HTTP-эндпоинт /metrics для локального сбора Prometheus"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(('0.0.0.0', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+if ENABLED and os.environ.get('METRICS_PORT'):
+    start_exporter(int(os.environ['METRICS_PORT']))
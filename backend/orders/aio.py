@@ -0,0 +1,203 @@
+import asyncio
+import itertools
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import idempotency
+from catalog import CartError, TICKETS_SQL, cart_ticket_ids, catalog, price_cart
+from emails import order_confirmation
+from index import ORDER_INSERT_SQL, ORDER_SCHEMA, PREFLIGHT, handler as sync_handler
+from inventory import hold_terms, retryable_conflict, sold_out_ticket
+from metrics import HTTP_METHODS, inc, observe
+from order_numbers import generate_order_number
+from outbox import ENQUEUE_SQL, qr_codes_json
+from tickets import ticket_codes
+from runtime import ValidationError, dumps, error, parse_body, respond
+
+POOL_SIZE = int(os.environ.get('ORDERS_ASYNC_POOL_SIZE', '10'))
+MAX_IN_FLIGHT = int(os.environ.get('ORDERS_ASYNC_MAX_IN_FLIGHT', '200'))
+QUEUE_WAIT_SECONDS = float(os.environ.get('ORDERS_ASYNC_QUEUE_WAIT_SECONDS', '2'))
+ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get('ORDERS_ASYNC_ACQUIRE_TIMEOUT_SECONDS', '2'))
+SYNC_WORKERS = int(os.environ.get('ORDERS_ASYNC_SYNC_WORKERS', '4'))
+
+_PLACEHOLDER = re.compile(r'%s')
+
+def to_asyncpg(sql: str) -> str:
+    """Плейсхолдеры psycopg2 (%s) в нумерованные параметры asyncpg ($1, $2, ...)"""
+    numbers = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda _: f'${next(numbers)}', sql).replace('%%', '%')
+
+# Текст запросов общий с синхронным обработчиком, здесь он только переводится в синтаксис asyncpg
+TICKETS = to_asyncpg(TICKETS_SQL)
+CLAIM = to_asyncpg(idempotency.CLAIM_SQL)
+STORED = to_asyncpg(idempotency.STORED_SQL)
+ORDER_INSERT = to_asyncpg(ORDER_INSERT_SQL)
+ENQUEUE = to_asyncpg(ENQUEUE_SQL)
+
+_pool: Any = None
+_pool_lock = asyncio.Lock()
+# Ограничение одновременных оформлений: лишние запросы ждут недолго и получают 503,
+# а не копятся в памяти, пока все соединения пула заняты
+_in_flight = asyncio.Semaphore(MAX_IN_FLIGHT)
+_sync_pool: Optional[ThreadPoolExecutor] = None
+
+async def get_pool() -> Any:
+    """Пул соединений asyncpg, создается при первом оформлении заказа"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                import asyncpg
+                _pool = await asyncpg.create_pool(os.environ['DATABASE_URL'], min_size=1, max_size=POOL_SIZE)
+    return _pool
+
+def sync_executor() -> ThreadPoolExecutor:
+    global _sync_pool
+    if _sync_pool is None:
+        _sync_pool = ThreadPoolExecutor(max_workers=SYNC_WORKERS, thread_name_prefix='orders-sync')
+    return _sync_pool
+
+async def validate_cart(conn: Any, cart_items: List[Dict[str, Any]], total_amount: Any) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+    """Проверить корзину по каталогу; в теплом кеше без обращения к БД"""
+    ticket_ids = cart_ticket_ids(cart_items)
+    cached = catalog.cached(ticket_ids)
+    if cached is None:
+        version, found = catalog.store(ticket_ids, await conn.fetch(TICKETS, ticket_ids))
+        tickets = {ticket_id: found.get(ticket_id) for ticket_id in ticket_ids}
+    else:
+        tickets, version = cached
+    lines, total = price_cart(cart_items, tickets, total_amount)
+    return lines, total, version
+
+async def insert_order(conn: Any, order_number: str, body: Dict[str, Any], lines: List[Dict[str, Any]],
+                       total_amount: int, catalog_version: Optional[int]) -> None:
+    """Заказ, позиции, резерв и письмо в outbox в текущей транзакции"""
+    order_status, hold_status, hold_until = hold_terms()
+    for _ in range(2):
+        items_json = dumps(lines)
+        inserted = asyncio.ensure_future(conn.fetchval(
+            ORDER_INSERT, order_number, body['full_name'], body['email'], body['phone'], total_amount,
+            order_status, datetime.now(), catalog_version, items_json, items_json, hold_status, hold_until
+        ))
+        # письмо не зависит от результата вставки: запрос уходит в БД, и пока ждем ответ, рендерим
+        await asyncio.sleep(0)
+        try:
+            codes = ticket_codes(order_number, lines)
+            rendered = order_confirmation(order_number, body['full_name'], body['email'], body['phone'], lines, total_amount, codes)
+        except BaseException:
+            await asyncio.gather(inserted, return_exceptions=True)
+            raise
+        if await inserted is not None:
+            break
+        # каталог изменился после загрузки в кеш: перечитать цены и повторить
+        catalog.invalidate()
+        lines, total_amount, catalog_version = await validate_cart(conn, body['cart_items'], body.get('total_amount'))
+    else:
+        raise RuntimeError('Каталог меняется слишком часто, повторите попытку')
+
+    subject, email_html, email_text = rendered
+    await conn.execute(ENQUEUE, body['email'], subject, email_html, email_text, qr_codes_json([code['code'] for code in codes]))
+
+async def create_order(event: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+    """Оформить заказ по корзине и поставить письмо с билетами в очередь"""
+    # структура корзины проверяется до того, как занять соединение пула
+    try:
+        cart_ticket_ids(body['cart_items'])
+    except CartError as e:
+        return error(e.status, str(e))
+
+    idempotency_key = idempotency.extract_key(event, body)
+    if idempotency_key:
+        request_hash = idempotency.fingerprint(body)
+        replay = idempotency.cached_response(idempotency_key, request_hash)
+        if replay:
+            return replay
+
+    pool = await get_pool()
+    try:
+        conn = await pool.acquire(timeout=ACQUIRE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return error(503, 'Нет свободных соединений, повторите попытку', {'Retry-After': '1'})
+    try:
+        lines, total_amount, catalog_version = await validate_cart(conn, body['cart_items'], body.get('total_amount'))
+
+        order_number = generate_order_number()
+        response = respond(200, {
+            'success': True,
+            'order_number': order_number,
+            'email_queued': True,
+            'message': 'Билеты отправлены на email'
+        })
+
+        async with conn.transaction():
+            claimed = not idempotency_key or await conn.fetchval(
+                CLAIM, *idempotency.claim_params(idempotency_key, request_hash, response)
+            ) is not None
+            if claimed:
+                await insert_order(conn, order_number, body, lines, total_amount, catalog_version)
+
+        if not claimed:
+            replay = idempotency.replay_stored(idempotency_key, await conn.fetchrow(STORED, idempotency_key), request_hash)
+            if replay:
+                return replay
+            raise RuntimeError('Ключ идемпотентности занят, но ответ не найден')
+
+        if idempotency_key:
+            idempotency.remember(idempotency_key, request_hash, response)
+
+        return response
+
+    except CartError as e:
+        return error(e.status, str(e))
+    except Exception as e:
+        if sold_out_ticket(e):
+            return error(409, 'Билеты закончились', ticket_id=sold_out_ticket(e))
+        if retryable_conflict(e):
+            return error(503, 'Билеты сейчас покупают, повторите попытку', {'Retry-After': '1'})
+        print(f'Order error: {e}')
+        return error(500, f'Ошибка оформления заказа: {str(e)}')
+    finally:
+        await pool.release(conn)
+
+async def dispatch(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    method = event.get('httpMethod', 'GET')
+
+    if method == 'OPTIONS':
+        return PREFLIGHT()
+
+    if method != 'POST' or (event.get('queryStringParameters') or {}).get('action'):
+        # история заказов и импорт пакетов не на пути оформления: синхронный обработчик в ограниченном пуле потоков
+        return await asyncio.get_running_loop().run_in_executor(sync_executor(), sync_handler, event, context)
+
+    try:
+        body = ORDER_SCHEMA.validate(parse_body(event))
+    except ValidationError as e:
+        return error(e.status, str(e))
+
+    try:
+        await asyncio.wait_for(_in_flight.acquire(), QUEUE_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        return error(503, 'Сервер перегружен, повторите попытку', {'Retry-After': '1'})
+    try:
+        return await create_order(event, body)
+    finally:
+        _in_flight.release()
+
+async def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Асинхронный вариант index.handler для долгоживущего процесса: тот же контракт запроса
+    и ответа, оформление заказа на asyncpg, много одновременных запросов в одном потоке
+    Args: event - содержит httpMethod, body с данными заказа
+          context - контекст выполнения функции
+    Returns: HTTP ответ с результатом операции
+    """
+    started = time.perf_counter()
+    response = await dispatch(event, context)
+    method = event.get('httpMethod')
+    tags = {'function': 'orders_async', 'method': method if method in HTTP_METHODS else 'other'}
+    inc('invocations_total', status=response['statusCode'], **tags)
+    observe('invocation_duration', (time.perf_counter() - started) * 1000, **tags)
+    return response
@@ -0,0 +1,244 @@
+import base64
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import idempotency
+from catalog import CartError, cart_ticket_ids, catalog, price_cart
+from emails import order_confirmation
+from inventory import hold_terms
+from order_numbers import generate_order_number
+from outbox import qr_codes_json
+from tickets import ticket_codes
+from runtime import Schema, ValidationError, dumps
+
+MAX_ROWS = int(os.environ.get('ORDER_IMPORT_MAX_ROWS', '10000'))
+COPY_READ_SIZE = 64 * 1024
+
+class BatchError(ValidationError):
+    """Пакет целиком не принят: тело не разбирается или строк больше лимита"""
+
+STAGING_DDL = """CREATE TEMP TABLE import_orders (
+    row_no INTEGER NOT NULL,
+    order_number VARCHAR(50) NOT NULL,
+    full_name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    total_amount INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    idempotency_key VARCHAR(255),
+    request_hash VARCHAR(64),
+    response_body TEXT,
+    items JSONB NOT NULL
+) ON COMMIT DROP"""
+
+STAGING_COPY = """COPY import_orders (row_no, order_number, full_name, email, phone, total_amount,
+    created_at, idempotency_key, request_hash, response_body, items) FROM STDIN"""
+
+OUTBOX_COPY = """COPY t_p613096_greeting_project_36.email_outbox
+    (to_email, subject, body, body_text, qr_codes) FROM STDIN"""
+
+MERGE_SQL = """SELECT row_no, status, order_number, replayed, error, ticket_id
+FROM t_p613096_greeting_project_36.merge_imported_orders(%s, %s, %s, %s)"""
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+def request_text(event: Dict[str, Any]) -> str:
+    """Тело пакета строкой; шлюз передает двоичные тела в base64"""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        try:
+            body = base64.b64decode(body).decode('utf-8')
+        except ValueError:
+            raise BatchError('Неверная кодировка тела запроса')
+    return body
+
+def iter_records(text: str) -> Iterator[Any]:
+    """
+    Записи пакета по одной: JSON-массив или NDJSON. Список всех заказов не строится;
+    испорченная строка NDJSON становится ошибкой этой строки, испорченный массив — всего пакета;
+    пакет без единой записи не принимается
+    """
+    position = _WHITESPACE.match(text).end()
+    if text.startswith('[', position):
+        position = _WHITESPACE.match(text, position + 1).end()
+        if text.startswith(']', position):
+            raise BatchError('Пакет не содержит заказов')
+        while True:
+            try:
+                record, position = _decoder.raw_decode(text, position)
+            except ValueError:
+                raise BatchError('Неверный JSON в теле запроса')
+            yield record
+            position = _WHITESPACE.match(text, position).end()
+            if text.startswith(']', position):
+                break
+            if not text.startswith(',', position):
+                raise BatchError('Неверный JSON в теле запроса')
+            position = _WHITESPACE.match(text, position + 1).end()
+        if _WHITESPACE.match(text, position + 1).end() != len(text):
+            raise BatchError('Лишние данные после JSON-массива')
+        return
+
+    if position == len(text):
+        raise BatchError('Пакет не содержит заказов')
+    while position < len(text):
+        end = text.find('\n', position)
+        if end < 0:
+            end = len(text)
+        line = text[position:end].strip()
+        position = end + 1
+        if not line:
+            continue
+        try:
+            record, consumed = _decoder.raw_decode(line)
+            if consumed != len(line):
+                raise ValueError(line)
+        except ValueError:
+            yield ValidationError('Неверный JSON в строке')
+            continue
+        yield record
+
+def copy_field(value: Any) -> str:
+    """Значение в текстовом формате COPY"""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+class CopyStream:
+    """Файлоподобный источник для copy_expert: строки COPY формируются по мере чтения драйвером"""
+
+    def __init__(self, rows: Iterator[Tuple[Any, ...]]):
+        self._rows = rows
+        self._buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = '\t'.join(map(copy_field, row)) + '\n'
+            parts.append(line)
+            length += len(line)
+        data = ''.join(parts)
+        if size < 0:
+            self._buffer = ''
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+class Batch:
+    """Один пакет импорта: три прохода по телу вместо хранения разобранных заказов в памяти"""
+
+    def __init__(self, text: str, schema: Schema):
+        self.text = text
+        self.schema = schema
+        self.results: Dict[int, Dict[str, Any]] = {}
+
+    def records(self) -> Iterator[Tuple[int, Any]]:
+        for row_no, record in enumerate(iter_records(self.text), 1):
+            if row_no > MAX_ROWS:
+                raise BatchError(f'В пакете больше {MAX_ROWS} заказов', 413)
+            yield row_no, record
+
+    def ticket_ids(self) -> List[str]:
+        """Первый проход: id всех типов билетов пакета, чтобы загрузить каталог одним запросом"""
+        ticket_ids = set()
+        for _, record in self.records():
+            cart_items = record.get('cart_items') if isinstance(record, dict) else None
+            for item in cart_items if isinstance(cart_items, list) else ():
+                if isinstance(item, dict) and item.get('ticketId'):
+                    ticket_ids.add(str(item['ticketId']))
+        return sorted(ticket_ids)
+
+    def priced(self, tickets: Dict[str, Optional[Dict[str, Any]]],
+               keep: Callable[[int], bool]) -> Iterator[Tuple[int, Dict[str, Any], List[Dict[str, Any]], int]]:
+        """Проверенные и оцененные по каталогу заказы; ошибки проверки записываются в результаты"""
+        for row_no, record in self.records():
+            if not keep(row_no):
+                continue
+            try:
+                if isinstance(record, ValidationError):
+                    raise record
+                body = self.schema.validate(record)
+                cart_ticket_ids(body['cart_items'])
+                lines, total = price_cart(body['cart_items'], tickets, body.get('total_amount'))
+            except (ValidationError, CartError) as e:
+                self.results[row_no] = {'row': row_no, 'status': e.status, 'error': str(e)}
+                continue
+            yield row_no, body, lines, total
+
+    def staged_rows(self, tickets: Dict[str, Optional[Dict[str, Any]]]) -> Iterator[Tuple[Any, ...]]:
+        """Второй проход: строки для COPY во временную таблицу import_orders"""
+        for row_no, body, lines, total in self.priced(tickets, lambda row_no: True):
+            order_number = generate_order_number()
+            key = body.get('idempotency_key')
+            key = str(key)[:255] if key else None
+            response_body = dumps({
+                'success': True,
+                'order_number': order_number,
+                'email_queued': True,
+                'message': 'Билеты отправлены на email'
+            })
+            yield (row_no, order_number, body['full_name'], body['email'], body['phone'], total, datetime.now(),
+                   key, idempotency.fingerprint(body) if key else None, response_body if key else None, dumps(lines))
+
+    def confirmations(self, tickets: Dict[str, Optional[Dict[str, Any]]]) -> Iterator[Tuple[Any, ...]]:
+        """Третий проход: письма только для заказов, созданных этим пакетом"""
+        def created(row_no: int) -> bool:
+            result = self.results.get(row_no)
+            return result is not None and result['status'] == 200 and not result.get('replayed')
+
+        for row_no, body, lines, total in self.priced(tickets, created):
+            order_number = self.results[row_no]['order_number']
+            codes = ticket_codes(order_number, lines)
+            subject, email_html, email_text = order_confirmation(
+                order_number, body['full_name'], body['email'], body['phone'], lines, total, codes
+            )
+            yield body['email'], subject, email_html, email_text, qr_codes_json([code['code'] for code in codes])
+
+def run(cur: Any, text: str, schema: Schema) -> Dict[str, Any]:
+    """Импортировать пакет в текущей транзакции и вернуть результат по каждой строке"""
+    batch = Batch(text, schema)
+
+    # правки каталога ждут конца импорта, так что цены пакета не устаревают между проходами
+    cur.execute('SELECT version FROM t_p613096_greeting_project_36.catalog_version WHERE id = 1 FOR SHARE')
+    if cur.fetchone()['version'] != catalog.version:
+        catalog.invalidate()
+    ticket_ids = batch.ticket_ids()
+    tickets = catalog.lookup(cur, ticket_ids)[0] if ticket_ids else {}
+
+    cur.execute(STAGING_DDL)
+    cur.copy_expert(STAGING_COPY, CopyStream(batch.staged_rows(tickets)), size=COPY_READ_SIZE)
+
+    order_status, hold_status, hold_until = hold_terms()
+    cur.execute(MERGE_SQL, (order_status, hold_status, hold_until, idempotency.KEY_TTL_HOURS))
+    for row in cur.fetchall():
+        result: Dict[str, Any] = {'row': row['row_no'], 'status': row['status']}
+        if row['order_number']:
+            result['order_number'] = row['order_number']
+        if row['replayed']:
+            result['replayed'] = True
+        if row['error']:
+            result['error'] = row['error']
+        if row['ticket_id']:
+            result['ticket_id'] = row['ticket_id']
+        batch.results[row['row_no']] = result
+
+    cur.copy_expert(OUTBOX_COPY, CopyStream(batch.confirmations(tickets)), size=COPY_READ_SIZE)
+
+    results = [batch.results[row_no] for row_no in sorted(batch.results)]
+    created = sum(1 for result in results if result['status'] == 200 and not result.get('replayed'))
+    replayed = sum(1 for result in results if result.get('replayed'))
+    return {
+        'success': True,
+        'rows': len(results),
+        'created': created,
+        'replayed': replayed,
+        'failed': len(results) - created - replayed,
+        'results': results
+    }
@@ -0,0 +1,123 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from cache import TtlLruCache
+
+MAX_QUANTITY_PER_LINE = int(os.environ.get('MAX_QUANTITY_PER_LINE', '100'))
+
+TICKETS_SQL = """SELECT cv.version, t.id, t.event_id, e.title AS event_title, t.name AS ticket_type, t.price
+FROM t_p613096_greeting_project_36.catalog_version cv
+LEFT JOIN t_p613096_greeting_project_36.ticket_types t
+    ON t.id = ANY(%s) AND t.is_active
+LEFT JOIN t_p613096_greeting_project_36.events e
+    ON e.id = t.event_id AND e.is_active
+WHERE cv.id = 1"""
+
+class CartError(Exception):
+    """Корзина не прошла проверку по каталогу"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+class Catalog:
+    """Кеш типов билетов в памяти процесса; сбрасывается по TTL, явно или при смене версии каталога"""
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 10000):
+        self._tickets = TtlLruCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.version: Optional[int] = None
+        self.stats = {'lookups': 0}
+
+    def invalidate(self) -> None:
+        """Сбросить кеш (например, после изменения цен)"""
+        with self._lock:
+            self._tickets.invalidate()
+            self.version = None
+
+    def _fetch(self, cur: Any, ticket_ids: List[str]) -> Tuple[Optional[int], Dict[str, Any]]:
+        """Одним запросом загрузить типы билетов и текущую версию каталога"""
+        cur.execute(TICKETS_SQL, (ticket_ids,))
+        return self.store(ticket_ids, cur.fetchall())
+
+    def store(self, ticket_ids: List[str], rows: List[Any]) -> Tuple[Optional[int], Dict[str, Any]]:
+        """Положить в кеш результат TICKETS_SQL; отсутствующие билеты кешируются как False"""
+        self.stats['lookups'] += 1
+        version = rows[0]['version'] if rows else None
+        found = {row['id']: dict(row) for row in rows if row['id'] and row['event_title']}
+        with self._lock:
+            if version != self.version:
+                self._tickets.invalidate()
+                self.version = version
+            for ticket_id in ticket_ids:
+                self._tickets.set(ticket_id, found.get(ticket_id, False))
+        return version, found
+
+    def cached(self, ticket_ids: List[str]) -> Optional[Tuple[Dict[str, Optional[Dict[str, Any]]], Optional[int]]]:
+        """Типы билетов и версия каталога, если все они есть в кеше; иначе None"""
+        version = self.version
+        result = {}
+        for ticket_id in ticket_ids:
+            entry = self._tickets.get(ticket_id)
+            if entry is None:
+                return None
+            result[ticket_id] = entry or None
+        return result, version
+
+    def lookup(self, cur: Any, ticket_ids: List[str]) -> Tuple[Dict[str, Optional[Dict[str, Any]]], Optional[int]]:
+        """Типы билетов по id и версия каталога, к которой они относятся; в теплом кеше без обращения к БД"""
+        version = self.version
+        result = {ticket_id: self._tickets.get(ticket_id) for ticket_id in ticket_ids}
+        missing = [ticket_id for ticket_id, entry in result.items() if entry is None]
+        if missing:
+            fetched_version, found = self._fetch(cur, missing)
+            if fetched_version != version and len(missing) < len(ticket_ids):
+                # часть билетов взята из кеша прежней версии каталога — перечитать все
+                fetched_version, found = self._fetch(cur, ticket_ids)
+                missing = ticket_ids
+            for ticket_id in missing:
+                result[ticket_id] = found.get(ticket_id, False)
+            version = fetched_version
+        return {ticket_id: entry or None for ticket_id, entry in result.items()}, version
+
+    def validate_cart(self, cur: Any, cart_items: List[Dict[str, Any]], total_amount: Any) -> Tuple[List[Dict[str, Any]], int, Optional[int]]:
+        """Проверить корзину по каталогу: строки с серверными ценами, итоговая сумма и версия каталога"""
+        tickets, version = self.lookup(cur, cart_ticket_ids(cart_items))
+        lines, total = price_cart(cart_items, tickets, total_amount)
+        return lines, total, version
+
+def cart_ticket_ids(cart_items: List[Dict[str, Any]]) -> List[str]:
+    """Проверить строки корзины без обращения к каталогу и вернуть id типов билетов"""
+    for item in cart_items:
+        if not isinstance(item, dict) or not item.get('ticketId'):
+            raise CartError('В корзине есть билет без ticketId')
+        quantity = item.get('quantity')
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or not 0 < quantity <= MAX_QUANTITY_PER_LINE:
+            raise CartError('Неверное количество билетов')
+    return list({str(item['ticketId']) for item in cart_items})
+
+def price_cart(cart_items: List[Dict[str, Any]], tickets: Dict[str, Optional[Dict[str, Any]]],
+               total_amount: Any) -> Tuple[List[Dict[str, Any]], int]:
+    """Строки заказа с серверными ценами и итоговая сумма"""
+    lines = []
+    total = 0
+    for item in cart_items:
+        ticket = tickets[str(item['ticketId'])]
+        if ticket is None:
+            raise CartError('Билет не найден или снят с продажи', 404)
+        if item.get('price') is not None and item['price'] != ticket['price']:
+            raise CartError('Цены изменились, обновите корзину', 409)
+        lines.append({
+            'ticket_type_id': ticket['id'],
+            'event_id': ticket['event_id'],
+            'event_title': ticket['event_title'],
+            'ticket_type': ticket['ticket_type'],
+            'price': ticket['price'],
+            'quantity': item['quantity']
+        })
+        total += ticket['price'] * item['quantity']
+    if total_amount is not None and total_amount != total:
+        raise CartError('Сумма заказа не совпадает с ценами каталога', 409)
+    return lines, total
+
+catalog = Catalog(ttl=float(os.environ.get('CATALOG_CACHE_TTL', '60')))
@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from metrics import add_collector, span, trace_connection, untrace_connection
+
+class PoolTimeout(Exception):
+    """Не удалось получить соединение за отведенное время"""
+
+class ConnectionPool:
+    """Пул соединений PostgreSQL, переживающий теплые вызовы функции"""
+
+    def __init__(self, dsn: str, max_size: int = 5, max_wait: float = 2.0, health_check_after: float = 30.0):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.health_check_after = health_check_after
+        self._idle: List[Any] = []
+        self._last_used: Dict[int, float] = {}
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {'hits': 0, 'misses': 0, 'reconnects': 0, 'timeouts': 0}
+        # драйвер грузится вместе с пулом, а не при импорте: preflight и ошибки валидации обходятся без него
+        import psycopg2.extensions
+        self._driver = psycopg2
+
+    def _is_alive(self, conn: Any) -> bool:
+        """Проверить, что соединение живо и готово к работе"""
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != self._driver.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if time.monotonic() - self._last_used.get(id(conn), 0) < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except self._driver.Error:
+            return False
+
+    def _discard(self, conn: Any) -> None:
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except self._driver.Error:
+            pass
+
+    def acquire(self) -> Any:
+        """Взять соединение из пула или открыть новое"""
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout(f'Нет свободных соединений за {self.max_wait} с')
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._size += 1
+            if conn is None:
+                break
+            if self._is_alive(conn):
+                with self._cond:
+                    self.stats['hits'] += 1
+                return conn
+            self._discard(conn)
+            with self._cond:
+                self._size -= 1
+                self.stats['reconnects'] += 1
+        try:
+            conn = self._driver.connect(self.dsn)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self.stats['misses'] += 1
+        return conn
+
+    def release(self, conn: Any) -> None:
+        """Вернуть соединение в пул"""
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except self._driver.Error:
+                self._discard(conn)
+        with self._cond:
+            if conn.closed:
+                self._size -= 1
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close_all(self) -> None:
+        """Закрыть все простаивающие соединения"""
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._size -= 1
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {**self.stats, 'size': self._size, 'idle': len(self._idle)}
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Получить пул уровня модуля, создав его при первом обращении"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.environ['DATABASE_URL'],
+                    max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '5')),
+                    max_wait=float(os.environ.get('DB_POOL_MAX_WAIT', '2.0')),
+                    health_check_after=float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', '30'))
+                )
+                add_collector('db_pool', _pool.get_stats)
+    return _pool
+
+def get_db_connection():
+    """Получить подключение к БД из пула"""
+    with span('db.connect'):
+        conn = get_pool().acquire()
+    return trace_connection(conn)
+
+def dict_cursor(conn: Any) -> Any:
+    """Курсор, возвращающий строки словарями"""
+    from psycopg2.extras import RealDictCursor
+    return conn.cursor(cursor_factory=RealDictCursor)
+
+def release_db_connection(conn: Any) -> None:
+    """Вернуть подключение в пул"""
+    get_pool().release(untrace_connection(conn))
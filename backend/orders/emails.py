@@ -0,0 +1,149 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from templates import Template
+from tickets import content_id
+
+TICKET_ROW_HTML = Template("""
+    <tr>
+        <td style="padding: 15px; border-bottom: 1px solid #eee;">
+            <strong style="color: #333; display: block; margin-bottom: 5px;">{{ event_title }}</strong>
+            <span style="color: #666; font-size: 14px;">{{ ticket_type }}</span>
+        </td>
+        <td style="padding: 15px; border-bottom: 1px solid #eee; text-align: center; color: #666;">
+            {{ quantity }} шт.
+        </td>
+        <td style="padding: 15px; border-bottom: 1px solid #eee; text-align: right; color: #333; font-weight: bold;">
+            {{ amount }} ₽
+        </td>
+    </tr>
+""")
+
+ORDER_CONFIRMATION_HTML = Template("""
+    <html>
+    <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; background: #f5f5f5;">
+        <div style="background: #9b87f5; padding: 30px; text-align: center;">
+            <h1 style="color: white; margin: 0; font-size: 32px;">🎫 EventHub</h1>
+        </div>
+
+        <div style="padding: 30px; background: white;">
+            <h2 style="color: #333; margin-top: 0;">Спасибо за заказ!</h2>
+            <p style="color: #666; font-size: 16px; line-height: 1.6;">
+                Здравствуйте, {{ full_name }}!<br><br>
+                Ваш заказ успешно оформлен. Ниже вы найдете детали вашего заказа.
+            </p>
+
+            <div style="background: #f9f9f9; padding: 20px; border-radius: 8px; margin: 25px 0;">
+                <p style="margin: 5px 0; color: #666;"><strong>Номер заказа:</strong> {{ order_number }}</p>
+                <p style="margin: 5px 0; color: #666;"><strong>Дата:</strong> {{ created_at }}</p>
+                <p style="margin: 5px 0; color: #666;"><strong>Email:</strong> {{ email }}</p>
+                <p style="margin: 5px 0; color: #666;"><strong>Телефон:</strong> {{ phone }}</p>
+            </div>
+
+            <h3 style="color: #333; margin-top: 30px;">Ваши билеты:</h3>
+            <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
+                <thead>
+                    <tr style="background: #f9f9f9;">
+                        <th style="padding: 15px; text-align: left; color: #666; font-weight: 600;">Мероприятие</th>
+                        <th style="padding: 15px; text-align: center; color: #666; font-weight: 600;">Кол-во</th>
+                        <th style="padding: 15px; text-align: right; color: #666; font-weight: 600;">Сумма</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    {{{ tickets_html }}}
+                </tbody>
+                <tfoot>
+                    <tr>
+                        <td colspan="2" style="padding: 20px 15px; text-align: right; font-weight: bold; color: #333; font-size: 18px;">
+                            Итого:
+                        </td>
+                        <td style="padding: 20px 15px; text-align: right; font-weight: bold; color: #9b87f5; font-size: 20px;">
+                            {{ total_amount }} ₽
+                        </td>
+                    </tr>
+                </tfoot>
+            </table>
+
+            {{{ qr_html }}}
+
+            <div style="background: #e8f5e9; padding: 20px; border-radius: 8px; border-left: 4px solid #4caf50; margin: 25px 0;">
+                <p style="margin: 0; color: #2e7d32; font-weight: 600;">✓ Билеты забронированы</p>
+                <p style="margin: 10px 0 0 0; color: #666; font-size: 14px;">
+                    Сохраните это письмо. Покажите его на входе или предъявите QR-код с номером заказа.
+                </p>
+            </div>
+
+            <p style="color: #999; font-size: 14px; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
+                Если у вас возникли вопросы, свяжитесь с нами: info@eventhub.ru или +7 (495) 123-45-67
+            </p>
+        </div>
+
+        <div style="background: #f9f9f9; padding: 20px; text-align: center;">
+            <p style="color: #999; font-size: 12px; margin: 0;">
+                © 2025 EventHub. Все права защищены.
+            </p>
+        </div>
+    </body>
+    </html>
+""")
+
+# Картинки кодов рассыльщик прикладывает к письму с Content-ID из tickets.content_id
+TICKET_QR_HTML = Template("""
+    <div style="display: inline-block; width: 180px; margin: 10px; text-align: center; vertical-align: top;">
+        <img src="cid:{{ cid }}" width="160" height="160" alt="QR-код билета" style="display: block; margin: 0 auto;">
+        <p style="margin: 5px 0 0 0; color: #333; font-size: 13px;"><strong>{{ event_title }}</strong></p>
+        <p style="margin: 2px 0 0 0; color: #666; font-size: 12px;">{{ ticket_type }}, билет {{ seq }} из {{ quantity }}</p>
+    </div>
+""")
+
+TICKET_QR_SECTION_HTML = Template("""
+    <h3 style="color: #333; margin-top: 30px;">QR-коды для входа:</h3>
+    <div style="text-align: center; margin: 20px 0;">{{{ codes_html }}}</div>
+""")
+
+TICKET_ROW_TEXT = Template("- {{ event_title }}, {{ ticket_type }}: {{ quantity }} шт. x {{ price }} ₽ = {{ amount }} ₽\n", escape=False, compact=False)
+
+TICKET_CODE_TEXT = Template("- {{ event_title }}, {{ ticket_type }}, билет {{ seq }} из {{ quantity }}: {{ code }}\n", escape=False, compact=False)
+
+ORDER_CONFIRMATION_TEXT = Template("""
+EventHub — спасибо за заказ!
+
+Здравствуйте, {{ full_name }}!
+Ваш заказ успешно оформлен.
+
+Номер заказа: {{ order_number }}
+Дата: {{ created_at }}
+Email: {{ email }}
+Телефон: {{ phone }}
+
+Ваши билеты:
+{{{ tickets_text }}}
+Итого: {{ total_amount }} ₽
+{{{ codes_text }}}
+Сохраните это письмо. Покажите его на входе или предъявите QR-код с номером заказа.
+Вопросы: info@eventhub.ru или +7 (495) 123-45-67
+""", escape=False, compact=False)
+
+def order_confirmation(order_number: str, full_name: str, email: str, phone: str,
+                       lines: List[Dict[str, Any]], total_amount: int,
+                       codes: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, str, str]:
+    """Тема, HTML и текстовая версия письма с билетами и QR-кодами из tickets.ticket_codes"""
+    rows = [{**line, 'amount': line['price'] * line['quantity']} for line in lines]
+    values = {
+        'order_number': order_number,
+        'full_name': full_name,
+        'email': email,
+        'phone': phone,
+        'created_at': datetime.now().strftime('%d.%m.%Y %H:%M'),
+        'total_amount': total_amount
+    }
+    qr_html = codes_text = ''
+    if codes:
+        qr_html = TICKET_QR_SECTION_HTML.render(
+            codes_html=TICKET_QR_HTML.render_each({**code, 'cid': content_id(code['code'])} for code in codes)
+        )
+        codes_text = '\nКоды билетов для входа:\n' + TICKET_CODE_TEXT.render_each(codes)
+    html_body = ORDER_CONFIRMATION_HTML.render(tickets_html=TICKET_ROW_HTML.render_each(rows), qr_html=qr_html, **values)
+    text_body = ORDER_CONFIRMATION_TEXT.render(
+        tickets_text=TICKET_ROW_TEXT.render_each(rows), codes_text=codes_text, **values
+    ).strip() + '\n'
+    return f'Ваши билеты EventHub - Заказ {order_number}', html_body, text_body
@@ -0,0 +1,99 @@
+import base64
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from order_numbers import order_number_time
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('ORDER_HISTORY_PAGE_SIZE', '20'))
+MAX_PAGE_SIZE = int(os.environ.get('ORDER_HISTORY_MAX_PAGE_SIZE', '100'))
+
+ORDER_COLUMNS = """o.id, o.order_number, o.full_name, o.email, o.phone, o.total_amount, o.status, o.created_at"""
+
+# Позиции заказов страницы собираются в том же запросе, без отдельного запроса на каждый заказ
+ITEMS_JOIN = """LEFT JOIN LATERAL (
+    SELECT json_agg(json_build_object(
+        'ticket_type_id', oi.ticket_type_id,
+        'event_title', oi.event_title,
+        'ticket_type', oi.ticket_type,
+        'price', oi.price,
+        'quantity', oi.quantity
+    ) ORDER BY oi.id) AS items
+    FROM t_p613096_greeting_project_36.order_items oi
+    WHERE oi.order_id = o.id AND oi.created_at = o.created_at
+) i ON TRUE"""
+
+class CursorError(ValueError):
+    """Курсор страницы поврежден"""
+
+def encode_cursor(created_at: datetime, order_id: int) -> str:
+    """Непрозрачный курсор следующей страницы: (created_at, id) последнего заказа"""
+    raw = f'{created_at.isoformat()}|{order_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, order_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(order_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CursorError('Неверный курсор страницы') from e
+
+def page_size(value: Any) -> int:
+    try:
+        size = int(value) if value not in (None, '') else DEFAULT_PAGE_SIZE
+    except (TypeError, ValueError):
+        size = DEFAULT_PAGE_SIZE
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+def _serialize(row: Dict[str, Any]) -> Dict[str, Any]:
+    order = {key: value for key, value in row.items() if key != 'id'}
+    order['created_at'] = row['created_at'].isoformat()
+    order['items'] = row['items'] or []
+    return order
+
+def list_orders(cur: Any, email: str, limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Страница заказов покупателя от новых к старым с позициями; keyset-пагинация по (created_at, id)"""
+    params: List[Any] = [email]
+    after = ''
+    if cursor:
+        created_at, order_id = decode_cursor(cursor)
+        after = 'AND (o.created_at, o.id) < (%s, %s)'
+        params += [created_at, order_id]
+    params.append(limit + 1)
+    cur.execute(
+        f"""SELECT {ORDER_COLUMNS}, i.items
+        FROM (
+            SELECT * FROM t_p613096_greeting_project_36.orders o
+            WHERE o.email = %s {after}
+            ORDER BY o.created_at DESC, o.id DESC
+            LIMIT %s
+        ) o
+        {ITEMS_JOIN}
+        ORDER BY o.created_at DESC, o.id DESC""",
+        params
+    )
+    rows = cur.fetchall()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    return {'orders': [_serialize(row) for row in rows], 'next_cursor': next_cursor}
+
+def get_order(cur: Any, order_number: str) -> Optional[Dict[str, Any]]:
+    """Заказ с позициями по номеру"""
+    params: List[Any] = [order_number]
+    bounds = ''
+    issued_at = order_number_time(order_number)
+    if issued_at:
+        # номер выдается перед вставкой заказа, так что окно в сутки оставляет одну-две месячные
+        # секции вместо всех и переживает перевод часов
+        bounds = 'AND o.created_at >= %s AND o.created_at < %s'
+        params += [issued_at - timedelta(days=1), issued_at + timedelta(days=1)]
+    cur.execute(
+        f"""SELECT {ORDER_COLUMNS}, i.items
+        FROM t_p613096_greeting_project_36.orders o
+        {ITEMS_JOIN}
+        WHERE o.order_number = %s {bounds}""",
+        params
+    )
+    row = cur.fetchone()
+    return _serialize(row) if row else None
@@ -0,0 +1,78 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional
+from cache import TtlLruCache
+from runtime import error, respond_raw
+
+KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+_recent = TtlLruCache(
+    maxsize=int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '2048')),
+    ttl=float(os.environ.get('IDEMPOTENCY_CACHE_TTL', '600'))
+)
+
+def extract_key(event: Dict[str, Any], body: Dict[str, Any]) -> Optional[str]:
+    """Ключ идемпотентности из заголовка Idempotency-Key или поля idempotency_key"""
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() in ('idempotency-key', 'x-idempotency-key') and value:
+            return str(value)[:255]
+    key = body.get('idempotency_key')
+    return str(key)[:255] if key else None
+
+def fingerprint(body: Dict[str, Any]) -> str:
+    """Отпечаток тела запроса, чтобы ключ нельзя было переиспользовать для другого заказа"""
+    return hashlib.sha256(json.dumps(body, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+REPLAY_HEADERS = {'Idempotent-Replayed': 'true'}
+
+CLAIM_SQL = """INSERT INTO t_p613096_greeting_project_36.idempotency_keys
+(idempotency_key, request_hash, response_status, response_body, expires_at)
+VALUES (%s, %s, %s, %s, NOW() + make_interval(hours => %s))
+ON CONFLICT (idempotency_key) DO UPDATE SET
+    request_hash = EXCLUDED.request_hash,
+    response_status = EXCLUDED.response_status,
+    response_body = EXCLUDED.response_body,
+    created_at = NOW(),
+    expires_at = EXCLUDED.expires_at
+WHERE idempotency_keys.expires_at < NOW()
+RETURNING idempotency_key"""
+
+STORED_SQL = """SELECT request_hash, response_status, response_body
+FROM t_p613096_greeting_project_36.idempotency_keys
+WHERE idempotency_key = %s"""
+
+def _replay(entry: Dict[str, Any], request_hash: str) -> Dict[str, Any]:
+    if entry['request_hash'] != request_hash:
+        return error(422, 'Ключ идемпотентности уже использован для другого запроса')
+    return respond_raw(entry['status'], entry['body'], REPLAY_HEADERS)
+
+def cached_response(key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+    """Ответ из памяти процесса, без обращения к БД"""
+    entry = _recent.get(key)
+    return _replay(entry, request_hash) if entry else None
+
+def claim_params(key: str, request_hash: str, response: Dict[str, Any]) -> tuple:
+    return (key, request_hash, response['statusCode'], response['body'], KEY_TTL_HOURS)
+
+def claim(cur: Any, key: str, request_hash: str, response: Dict[str, Any]) -> bool:
+    """Занять ключ в текущей транзакции вместе с ответом; False, если ключ уже занят"""
+    cur.execute(CLAIM_SQL, claim_params(key, request_hash, response))
+    return cur.fetchone() is not None
+
+def stored_response(cur: Any, key: str, request_hash: str) -> Optional[Dict[str, Any]]:
+    """Сохраненный ответ для уже занятого ключа"""
+    cur.execute(STORED_SQL, (key,))
+    return replay_stored(key, cur.fetchone(), request_hash)
+
+def replay_stored(key: str, row: Any, request_hash: str) -> Optional[Dict[str, Any]]:
+    """Ответ по строке STORED_SQL; строка кешируется для следующих повторов"""
+    if not row:
+        return None
+    entry = {'request_hash': row['request_hash'], 'status': row['response_status'], 'body': row['response_body']}
+    _recent.set(key, entry)
+    return _replay(entry, request_hash)
+
+def remember(key: str, request_hash: str, response: Dict[str, Any]) -> None:
+    """Запомнить закоммиченный ответ для быстрых повторов"""
+    _recent.set(key, {'request_hash': request_hash, 'status': response['statusCode'], 'body': response['body']})
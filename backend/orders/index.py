@@ -1,228 +1,311 @@
-import json
-import os
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from typing import Dict, Any
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from typing import Callable, Dict, Any
+from db import PoolTimeout, dict_cursor, get_db_connection, release_db_connection
+from metrics import instrumented, span
+from outbox import enqueue_email
+from emails import order_confirmation
+from order_numbers import generate_order_number
+import tickets
+import idempotency
+from catalog import CartError, cart_ticket_ids, catalog
+from inventory import hold_terms, retryable_conflict, sold_out_ticket
+import history
+import bulk_import
+from sessions import SessionStoreError, TokenError, authenticate
+from runtime import Field, Router, Schema, ValidationError, dumps, error, parse_body, preflight, respond
 
-def get_db_connection():
-    """Получить подключение к БД"""
-    return psycopg2.connect(os.environ['DATABASE_URL'])
+PREFLIGHT = preflight('GET, POST, OPTIONS', 'Content-Type, Idempotency-Key, Authorization, X-Authorization')
 
-def send_email(to_email: str, subject: str, body: str) -> bool:
-    """Отправить email"""
+ORDER_SCHEMA = Schema(
+    full_name=Field(str, max_length=255),
+    email=Field(str, max_length=255),
+    phone=Field(str, max_length=50),
+    cart_items=Field(list, message='Корзина пуста'),
+    total_amount=Field((int, float), required=False),
+    idempotency_key=Field(str, required=False)
+)
+
+# Заказ, его позиции и резерв билетов — одним запросом; пустой результат означает, что
+# версия каталога сменилась. Явные приведения типов нужны драйверам с серверными параметрами.
+ORDER_INSERT_SQL = """WITH new_order AS (
+    INSERT INTO t_p613096_greeting_project_36.orders
+    (order_number, full_name, email, phone, total_amount, status, created_at)
+    SELECT %s, %s, %s, %s, %s::integer, %s, %s::timestamp
+    WHERE EXISTS (
+        SELECT 1 FROM t_p613096_greeting_project_36.catalog_version
+        WHERE id = 1 AND version = %s
+    )
+    RETURNING id, order_number, created_at
+), registered AS (
+    -- глобальная уникальность номера: orders уникальна только вместе с created_at
+    INSERT INTO t_p613096_greeting_project_36.order_numbers (order_number, created_at)
+    SELECT order_number, created_at FROM new_order
+), new_items AS (
+    INSERT INTO t_p613096_greeting_project_36.order_items
+    (order_id, created_at, ticket_type_id, event_title, ticket_type, price, quantity)
+    SELECT new_order.id, new_order.created_at, i.ticket_type_id, i.event_title, i.ticket_type, i.price, i.quantity
+    FROM new_order, jsonb_to_recordset(%s::jsonb)
+    AS i(ticket_type_id VARCHAR(50), event_title VARCHAR(255), ticket_type VARCHAR(100),
+         price INTEGER, quantity INTEGER)
+), reserved AS (
+    SELECT t_p613096_greeting_project_36.reserve_tickets(new_order.id, %s::jsonb, %s::varchar, %s::timestamp)
+    FROM new_order
+)
+SELECT new_order.id FROM new_order, reserved"""
+
+IMPORT_ROLES = frozenset(('admin', 'partner'))
+RAW_BODY_ACTIONS = frozenset(('import',))
+
+router = Router()
+
+def read_orders(fetch: Callable[[Any], Any]) -> Dict[str, Any]:
+    """Выполнить чтение истории заказов; None от fetch означает 404"""
+    conn = get_db_connection()
+    cur = dict_cursor(conn)
+    
     try:
-        smtp_host = os.environ.get('SMTP_HOST')
-        smtp_port = int(os.environ.get('SMTP_PORT', '587'))
-        smtp_user = os.environ.get('SMTP_USER')
-        smtp_password = os.environ.get('SMTP_PASSWORD')
-        
-        if not all([smtp_host, smtp_user, smtp_password]):
-            return False
-        
-        msg = MIMEMultipart()
-        msg['From'] = smtp_user
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html', 'utf-8'))
-        
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=5) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        result = fetch(cur)
+        conn.rollback()
         
-        return True
+        if result is None:
+            return error(404, 'Заказ не найден')
+        return respond(200, result)
+    except history.CursorError as e:
+        conn.rollback()
+        return error(400, str(e))
     except Exception as e:
-        print(f'Email error: {e}')
-        return False
+        conn.rollback()
+        print(f'Order history error: {e}')
+        return error(500, f'Ошибка получения заказов: {str(e)}')
+    finally:
+        cur.close()
+        release_db_connection(conn)
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """
-    Обрабатывает заказы билетов и отправляет подтверждение на email
-    Args: event - содержит httpMethod, body с данными заказа
-          context - контекст выполнения функции
-    Returns: HTTP ответ с результатом операции
-    """
-    method = event.get('httpMethod', 'GET')
+@router.route(('GET', 'list'), Schema(
+    email=Field(str, required=False),
+    limit=Field(str, required=False),
+    cursor=Field(str, required=False)
+))
+def list_orders(event: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Заказы покупателя от новых к старым; чужие заказы видит только администратор"""
+    try:
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+    except SessionStoreError as e:
+        return error(503, str(e), {'Retry-After': '1'})
     
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    body = json.loads(event.get('body', '{}'))
-    
-    full_name = body.get('full_name')
-    email = body.get('email')
-    phone = body.get('phone')
-    cart_items = body.get('cart_items', [])
-    total_amount = body.get('total_amount', 0)
-    
-    if not all([full_name, email, phone]):
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Заполните все поля'}),
-            'isBase64Encoded': False
-        }
-    
-    if not cart_items:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Корзина пуста'}),
-            'isBase64Encoded': False
-        }
+    email = params['email'] if session['role'] == 'admin' else session['email']
+    if not email:
+        return error(400, 'Укажите email')
+    
+    return read_orders(lambda cur: history.list_orders(cur, email, history.page_size(params['limit']), params['cursor']))
+
+@router.route(('GET', 'get'), Schema(order_number=Field(str, max_length=50, message='Укажите номер заказа')))
+def get_order(event: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Заказ по номеру; чужой заказ видит только администратор"""
+    try:
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+    except SessionStoreError as e:
+        return error(503, str(e), {'Retry-After': '1'})
+    
+    def fetch(cur: Any) -> Any:
+        order = history.get_order(cur, params['order_number'])
+        if order and session['role'] != 'admin' and order['email'] != session['email']:
+            return None
+        return order
+    
+    return read_orders(fetch)
+
+@router.route(('POST', None), ORDER_SCHEMA)
+def create_order(event: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+    """Оформить заказ по корзине и поставить письмо с билетами в очередь"""
+    full_name = body['full_name']
+    email = body['email']
+    phone = body['phone']
+    cart_items = body['cart_items']
+    
+    # структура корзины проверяется до того, как занять соединение пула
+    try:
+        cart_ticket_ids(cart_items)
+    except CartError as e:
+        return error(e.status, str(e))
+    
+    idempotency_key = idempotency.extract_key(event, body)
+    if idempotency_key:
+        request_hash = idempotency.fingerprint(body)
+        replay = idempotency.cached_response(idempotency_key, request_hash)
+        if replay:
+            return replay
     
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=RealDictCursor)
+    cur = dict_cursor(conn)
     
     try:
-        order_number = f"ORD-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        lines, total_amount, catalog_version = catalog.validate_cart(cur, cart_items, body.get('total_amount'))
         
-        cur.execute(
-            """INSERT INTO t_p613096_greeting_project_36.orders 
-            (order_number, full_name, email, phone, total_amount, status, created_at) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
-            (order_number, full_name, email, phone, total_amount, 'confirmed', datetime.now())
-        )
-        order_id = cur.fetchone()['id']
+        order_number = generate_order_number()
+        response = respond(200, {
+            'success': True,
+            'order_number': order_number,
+            'email_queued': True,
+            'message': 'Билеты отправлены на email'
+        })
         
-        for item in cart_items:
+        if idempotency_key and not idempotency.claim(cur, idempotency_key, request_hash, response):
+            conn.rollback()
+            replay = idempotency.stored_response(cur, idempotency_key, request_hash)
+            if replay:
+                return replay
+            raise RuntimeError('Ключ идемпотентности занят, но ответ не найден')
+        
+        order_status, hold_status, hold_until = hold_terms()
+        for _ in range(2):
+            items_json = dumps(lines)
             cur.execute(
-                """INSERT INTO t_p613096_greeting_project_36.order_items 
-                (order_id, event_title, ticket_type, price, quantity) 
-                VALUES (%s, %s, %s, %s, %s)""",
-                (order_id, item['eventTitle'], item['ticketType'], item['price'], item['quantity'])
+                ORDER_INSERT_SQL,
+                (order_number, full_name, email, phone, total_amount, order_status, datetime.now(),
+                 catalog_version, items_json, items_json, hold_status, hold_until)
             )
+            if cur.fetchone():
+                break
+            # каталог изменился после загрузки в кеш: перечитать цены и повторить
+            catalog.invalidate()
+            lines, total_amount, catalog_version = catalog.validate_cart(cur, cart_items, body.get('total_amount'))
+        else:
+            raise RuntimeError('Каталог меняется слишком часто, повторите попытку')
         
-        conn.commit()
-        
-        tickets_html = ""
-        for item in cart_items:
-            tickets_html += f"""
-            <tr>
-                <td style="padding: 15px; border-bottom: 1px solid #eee;">
-                    <strong style="color: #333; display: block; margin-bottom: 5px;">{item['eventTitle']}</strong>
-                    <span style="color: #666; font-size: 14px;">{item['ticketType']}</span>
-                </td>
-                <td style="padding: 15px; border-bottom: 1px solid #eee; text-align: center; color: #666;">
-                    {item['quantity']} шт.
-                </td>
-                <td style="padding: 15px; border-bottom: 1px solid #eee; text-align: right; color: #333; font-weight: bold;">
-                    {item['price'] * item['quantity']} ₽
-                </td>
-            </tr>
-            """
+        codes = tickets.ticket_codes(order_number, lines)
+        with span('email.render'):
+            subject, email_html, email_text = order_confirmation(order_number, full_name, email, phone, lines, total_amount, codes)
         
-        email_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; background: #f5f5f5;">
-            <div style="background: #9b87f5; padding: 30px; text-align: center;">
-                <h1 style="color: white; margin: 0; font-size: 32px;">🎫 EventHub</h1>
-            </div>
-            
-            <div style="padding: 30px; background: white;">
-                <h2 style="color: #333; margin-top: 0;">Спасибо за заказ!</h2>
-                <p style="color: #666; font-size: 16px; line-height: 1.6;">
-                    Здравствуйте, {full_name}!<br><br>
-                    Ваш заказ успешно оформлен. Ниже вы найдете детали вашего заказа.
-                </p>
-                
-                <div style="background: #f9f9f9; padding: 20px; border-radius: 8px; margin: 25px 0;">
-                    <p style="margin: 5px 0; color: #666;"><strong>Номер заказа:</strong> {order_number}</p>
-                    <p style="margin: 5px 0; color: #666;"><strong>Дата:</strong> {datetime.now().strftime('%d.%m.%Y %H:%M')}</p>
-                    <p style="margin: 5px 0; color: #666;"><strong>Email:</strong> {email}</p>
-                    <p style="margin: 5px 0; color: #666;"><strong>Телефон:</strong> {phone}</p>
-                </div>
-                
-                <h3 style="color: #333; margin-top: 30px;">Ваши билеты:</h3>
-                <table style="width: 100%; border-collapse: collapse; margin: 20px 0;">
-                    <thead>
-                        <tr style="background: #f9f9f9;">
-                            <th style="padding: 15px; text-align: left; color: #666; font-weight: 600;">Мероприятие</th>
-                            <th style="padding: 15px; text-align: center; color: #666; font-weight: 600;">Кол-во</th>
-                            <th style="padding: 15px; text-align: right; color: #666; font-weight: 600;">Сумма</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-                        {tickets_html}
-                    </tbody>
-                    <tfoot>
-                        <tr>
-                            <td colspan="2" style="padding: 20px 15px; text-align: right; font-weight: bold; color: #333; font-size: 18px;">
-                                Итого:
-                            </td>
-                            <td style="padding: 20px 15px; text-align: right; font-weight: bold; color: #9b87f5; font-size: 20px;">
-                                {total_amount} ₽
-                            </td>
-                        </tr>
-                    </tfoot>
-                </table>
-                
-                <div style="background: #e8f5e9; padding: 20px; border-radius: 8px; border-left: 4px solid #4caf50; margin: 25px 0;">
-                    <p style="margin: 0; color: #2e7d32; font-weight: 600;">✓ Билеты забронированы</p>
-                    <p style="margin: 10px 0 0 0; color: #666; font-size: 14px;">
-                        Сохраните это письмо. Покажите его на входе или предъявите QR-код с номером заказа.
-                    </p>
-                </div>
-                
-                <p style="color: #999; font-size: 14px; margin-top: 30px; padding-top: 20px; border-top: 1px solid #eee;">
-                    Если у вас возникли вопросы, свяжитесь с нами: info@eventhub.ru или +7 (495) 123-45-67
-                </p>
-            </div>
-            
-            <div style="background: #f9f9f9; padding: 20px; text-align: center;">
-                <p style="color: #999; font-size: 12px; margin: 0;">
-                    © 2025 EventHub. Все права защищены.
-                </p>
-            </div>
-        </body>
-        </html>
-        """
+        enqueue_email(cur, email, subject, email_html, email_text, [code['code'] for code in codes])
+        conn.commit()
         
-        email_sent = send_email(email, f'Ваши билеты EventHub - Заказ {order_number}', email_body)
+        if idempotency_key:
+            idempotency.remember(idempotency_key, request_hash, response)
         
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'order_number': order_number,
-                'email_sent': email_sent,
-                'message': 'Билеты отправлены на email' if email_sent else 'Заказ оформлен, но email не отправлен'
-            }),
-            'isBase64Encoded': False
-        }
+        return response
         
+    except CartError as e:
+        conn.rollback()
+        return error(e.status, str(e))
     except Exception as e:
         conn.rollback()
+        if sold_out_ticket(e):
+            return error(409, 'Билеты закончились', ticket_id=sold_out_ticket(e))
+        if retryable_conflict(e):
+            return error(503, 'Билеты сейчас покупают, повторите попытку', {'Retry-After': '1'})
         print(f'Order error: {e}')
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': f'Ошибка оформления заказа: {str(e)}'}),
-            'isBase64Encoded': False
-        }
+        return error(500, f'Ошибка оформления заказа: {str(e)}')
+    finally:
+        cur.close()
+        release_db_connection(conn)
+
+@router.route(('POST', 'import'))
+def import_orders(event: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Пакет заказов кассы или партнера (NDJSON или JSON-массив): COPY во временную таблицу и перенос одной транзакцией"""
+    try:
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+    except SessionStoreError as e:
+        return error(503, str(e), {'Retry-After': '1'})
+    
+    if session['role'] not in IMPORT_ROLES:
+        return error(403, 'Импорт заказов доступен только кассам и партнерам')
+    
+    conn = get_db_connection()
+    cur = dict_cursor(conn)
+    
+    try:
+        with span('orders.import'):
+            result = bulk_import.run(cur, bulk_import.request_text(event), ORDER_SCHEMA)
+        conn.commit()
+        return respond(200, result)
+    except ValidationError as e:
+        conn.rollback()
+        return error(e.status, str(e))
+    except Exception as e:
+        conn.rollback()
+        if retryable_conflict(e):
+            return error(503, 'Билеты сейчас покупают, повторите попытку', {'Retry-After': '1'})
+        print(f'Order import error: {e}')
+        return error(500, f'Ошибка импорта заказов: {str(e)}')
+    finally:
+        cur.close()
+        release_db_connection(conn)
+
+@router.route(('POST', 'scan'), Schema(code=Field(str, max_length=200, message='Укажите код билета')))
+def scan_ticket(event: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Проверить QR-код билета на входе и отметить проход; повторный проход — 409"""
+    try:
+        session = authenticate(event)
+    except TokenError as e:
+        return error(401, str(e))
+    except SessionStoreError as e:
+        return error(503, str(e), {'Retry-After': '1'})
+    
+    if session['role'] not in tickets.SCAN_ROLES:
+        return error(403, 'Проверка билетов доступна только контролерам')
+    
+    try:
+        ticket = tickets.verify(params['code'])
+    except tickets.TicketCodeError as e:
+        return respond(400, {'valid': False, 'error': str(e)})
+    
+    conn = get_db_connection()
+    cur = dict_cursor(conn)
+    
+    try:
+        status, result = tickets.scan(cur, *ticket, scanned_by=session['email'])
+        conn.commit()
+        return respond(status, result)
+    except Exception as e:
+        conn.rollback()
+        print(f'Ticket scan error: {e}')
+        return error(500, f'Ошибка проверки билета: {str(e)}')
     finally:
         cur.close()
-        conn.close()
+        release_db_connection(conn)
+
+@instrumented('orders')
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Обрабатывает заказы билетов и отправляет подтверждение на email
+    Args: event - содержит httpMethod, body с данными заказа
+          context - контекст выполнения функции
+    Returns: HTTP ответ с результатом операции
+    """
+    method = event.get('httpMethod', 'GET')
+    
+    if method == 'OPTIONS':
+        return PREFLIGHT()
+    
+    try:
+        if method == 'GET':
+            params = event.get('queryStringParameters') or {}
+            route = router.resolve(('GET', params.get('action', 'list')))
+            if route is None:
+                return error(400, 'Неизвестное действие')
+        else:
+            # действие — в строке запроса (?action=scan), параметры — в JSON-теле; тело импорта
+            # (NDJSON) читает сам обработчик
+            query = event.get('queryStringParameters') or {}
+            action = query.get('action')
+            route = router.resolve((method, action))
+            if route is None:
+                return error(405, 'Method not allowed') if action is None else error(400, 'Неизвестное действие')
+            params = query if action in RAW_BODY_ACTIONS else parse_body(event)
+        action_handler, schema = route
+        body = schema.validate(params)
+    except ValidationError as e:
+        return error(e.status, str(e))
+    
+    try:
+        return action_handler(event, body)
+    except PoolTimeout as e:
+        # все соединения заняты: клиенту лучше повторить, чем получить 500
+        return error(503, str(e), {'Retry-After': '1'})
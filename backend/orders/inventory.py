@@ -0,0 +1,26 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
+
+SOLD_OUT_PGCODE = 'EH001'
+# взаимоблокировка и сбой сериализации: транзакция откачена целиком, запрос можно повторить
+RETRYABLE_PGCODES = frozenset(('40P01', '40001'))
+UNPAID_HOLD_MINUTES = int(os.environ.get('UNPAID_HOLD_MINUTES', '0'))
+
+def hold_terms() -> Tuple[str, str, Optional[datetime]]:
+    """Статус заказа, статус брони и срок брони: без оплаты бронь сразу подтверждена"""
+    if UNPAID_HOLD_MINUTES > 0:
+        return 'reserved', 'held', datetime.now() + timedelta(minutes=UNPAID_HOLD_MINUTES)
+    return 'confirmed', 'confirmed', None
+
+def sold_out_ticket(error: Any) -> Optional[str]:
+    """id типа билета, если ошибка БД означает, что билеты закончились"""
+    # psycopg2 хранит код ошибки в pgcode, asyncpg — в sqlstate
+    if (getattr(error, 'pgcode', None) or getattr(error, 'sqlstate', None)) != SOLD_OUT_PGCODE:
+        return None
+    message = getattr(getattr(error, 'diag', None), 'message_primary', None) or str(error)
+    return message.split('sold_out:', 1)[-1].strip()
+
+def retryable_conflict(error: Any) -> bool:
+    """Ошибка БД — конфликт блокировок, после которого клиенту стоит повторить запрос"""
+    return (getattr(error, 'pgcode', None) or getattr(error, 'sqlstate', None)) in RETRYABLE_PGCODES
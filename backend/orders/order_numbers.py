@@ -0,0 +1,64 @@
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+NODE_ALPHABET = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+
+def random_node_id(length: int = 5) -> str:
+    """Случайный идентификатор экземпляра функции без похожих символов (0/O, 1/I)"""
+    return ''.join(secrets.choice(NODE_ALPHABET) for _ in range(length))
+
+class OrderNumberGenerator:
+    """Номера заказов вида ORD-<время>-<экземпляр>-<счетчик> без обращения к БД"""
+
+    def __init__(self, node_id: str, counter_width: int = 4):
+        self.node_id = node_id
+        self.counter_limit = 10 ** counter_width
+        self.counter_width = counter_width
+        self._second = 0
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        with self._lock:
+            now = max(int(time.time()), self._second)
+            if now != self._second:
+                self._second = now
+                self._counter = 0
+            elif self._counter >= self.counter_limit - 1:
+                # счетчик идет с 1, последний номер секунды — counter_limit - 1: суффикс
+                # остается ровно counter_width цифр, иначе на пиковой секунде номер стал бы длиннее
+                while int(time.time()) <= self._second:
+                    time.sleep(0.001)
+                self._second = int(time.time())
+                self._counter = 0
+            self._counter += 1
+            second, counter = self._second, self._counter
+        stamp = datetime.fromtimestamp(second).strftime('%Y%m%d%H%M%S')
+        return f'ORD-{stamp}-{self.node_id}-{counter:0{self.counter_width}d}'
+
+_generator = OrderNumberGenerator(os.environ.get('ORDER_NODE_ID') or random_node_id())
+
+def _reset_after_fork() -> None:
+    global _generator
+    _generator = OrderNumberGenerator(random_node_id())
+
+if not os.environ.get('ORDER_NODE_ID'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def generate_order_number() -> str:
+    """Сгенерировать уникальный номер заказа"""
+    return _generator.next()
+
+def order_number_time(order_number: str) -> Optional[datetime]:
+    """Время выдачи номера заказа ORD-<время>-...; None для номеров другого формата"""
+    parts = order_number.split('-')
+    if len(parts) != 4 or parts[0] != 'ORD':
+        return None
+    try:
+        return datetime.strptime(parts[1], '%Y%m%d%H%M%S')
+    except ValueError:
+        return None
@@ -0,0 +1,14 @@
+import json
+from typing import Any, List, Optional
+
+ENQUEUE_SQL = """INSERT INTO t_p613096_greeting_project_36.email_outbox
+(to_email, subject, body, body_text, qr_codes) VALUES (%s, %s, %s, %s, %s::jsonb)"""
+
+def qr_codes_json(qr_codes: Optional[List[str]]) -> Optional[str]:
+    """Коды для QR-картинок письма в формате колонки qr_codes; рассыльщик кодирует их в PNG"""
+    return json.dumps(qr_codes) if qr_codes else None
+
+def enqueue_email(cur: Any, to_email: str, subject: str, body: str, body_text: Optional[str] = None,
+                  qr_codes: Optional[List[str]] = None) -> None:
+    """Поставить письмо (HTML, необязательные текстовая версия и QR-коды) в outbox в текущей транзакции"""
+    cur.execute(ENQUEUE_SQL, (to_email, subject, body, body_text, qr_codes_json(qr_codes)))
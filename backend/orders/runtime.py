@@ -0,0 +1,145 @@
+import json
+import os
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+from metrics import ENABLED as METRICS_ENABLED, span
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+def _default_codec() -> Tuple[str, Callable[[Any], str], Callable[[Any], Any]]:
+    """Самый быстрый доступный кодек: orjson, если установлен, иначе стандартный json"""
+    if os.environ.get('JSON_CODEC', 'auto') != 'json':
+        try:
+            import orjson
+        except ImportError:
+            pass
+        else:
+            options = orjson.OPT_NON_STR_KEYS
+            return 'orjson', lambda obj: orjson.dumps(obj, default=str, option=options).decode(), orjson.loads
+    return 'json', _stdlib_dumps, json.loads
+
+codec_name, _encode, _decode = _default_codec()
+
+def set_codec(name: str, encode: Callable[[Any], str], decode: Callable[[Any], Any]) -> None:
+    """Подключить другой JSON-кодек (например, для сравнения в бенчмарке)"""
+    global codec_name, _encode, _decode
+    codec_name, _encode, _decode = name, encode, decode
+
+def dumps(obj: Any) -> str:
+    if METRICS_ENABLED:
+        with span('serialize'):
+            return _encode(obj)
+    return _encode(obj)
+
+def loads(data: Any) -> Any:
+    return _decode(data)
+
+JSON_HEADERS: Mapping[str, str] = MappingProxyType({
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+})
+def respond_raw(status: int, body: str, headers: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """HTTP-ответ с уже сериализованным телом"""
+    return {
+        'statusCode': status,
+        # словарь заголовков свой у каждого ответа: вызывающий код и платформа могут его дополнять
+        'headers': {**JSON_HEADERS, **headers} if headers else dict(JSON_HEADERS),
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def respond(status: int, payload: Any, headers: Optional[Mapping[str, str]] = None) -> Dict[str, Any]:
+    """HTTP-ответ с JSON-телом"""
+    return respond_raw(status, dumps(payload), headers)
+
+def error(status: int, message: str, headers: Optional[Mapping[str, str]] = None, **extra: Any) -> Dict[str, Any]:
+    """HTTP-ответ с ошибкой {'error': message, ...}"""
+    return respond(status, {'error': message, **extra}, headers)
+
+def preflight(methods: str, allow_headers: str) -> Callable[[], Dict[str, Any]]:
+    """Фабрика ответов на CORS preflight: заголовки собираются при импорте, словарь ответа новый на каждый вызов"""
+    cors_headers = MappingProxyType({
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': methods,
+        'Access-Control-Allow-Headers': allow_headers,
+        'Access-Control-Max-Age': '86400'
+    })
+
+    def response() -> Dict[str, Any]:
+        return {'statusCode': 200, 'headers': dict(cors_headers), 'body': '', 'isBase64Encoded': False}
+    return response
+
+class ValidationError(Exception):
+    """Тело запроса не соответствует схеме"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+class Field:
+    """Описание поля запроса; пустые значения ('' и []) считаются отсутствующими"""
+
+    def __init__(self, kind: Any = str, required: bool = True, max_length: Optional[int] = None,
+                 default: Any = None, message: Optional[str] = None):
+        self.kind = kind
+        self.required = required
+        self.max_length = max_length
+        self.default = default
+        self.message = message
+
+class Schema:
+    """Схема тела запроса, скомпилированная при импорте в кортеж правил для одного прохода"""
+
+    def __init__(self, message: str = 'Заполните все поля', **fields: Field):
+        self._rules = tuple(
+            (name, field.kind, field.required, field.max_length, field.default, field.message or message)
+            for name, field in fields.items()
+        )
+
+    def validate(self, body: Any) -> Dict[str, Any]:
+        if not isinstance(body, dict):
+            raise ValidationError('Неверный формат запроса')
+        data = {}
+        for name, kind, required, max_length, default, message in self._rules:
+            value = body.get(name)
+            if value is None or value == '' or value == []:
+                if required:
+                    raise ValidationError(message)
+                data[name] = default
+                continue
+            if not isinstance(value, kind) or (max_length is not None and len(value) > max_length):
+                raise ValidationError(f'Неверное значение поля {name}')
+            data[name] = value
+        return data
+
+EMPTY_SCHEMA = Schema()
+
+def parse_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-тело запроса; ошибка разбора — 400, а не 500"""
+    raw = event.get('body') or '{}'
+    try:
+        body = loads(raw)
+    except ValueError:
+        raise ValidationError('Неверный JSON в теле запроса')
+    if not isinstance(body, dict):
+        raise ValidationError('Неверный формат запроса')
+    return body
+
+class Router:
+    """Таблица действий: ключ -> (обработчик, схема); поиск — одно обращение к словарю"""
+
+    def __init__(self) -> None:
+        self._routes: Dict[Hashable, Tuple[Callable[..., Dict[str, Any]], Schema]] = {}
+
+    def route(self, key: Hashable, schema: Schema = EMPTY_SCHEMA) -> Callable[[Callable], Callable]:
+        def register(fn: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+            self._routes[key] = (fn, schema)
+            return fn
+        return register
+
+    def resolve(self, key: Hashable) -> Optional[Tuple[Callable[..., Dict[str, Any]], Schema]]:
+        return self._routes.get(key)
+
+    def keys(self) -> Tuple[Hashable, ...]:
+        return tuple(self._routes)
@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from db import get_db_connection, release_db_connection
+
+TOKEN_PREFIX = 'v1'
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', str(7 * 24 * 3600)))
+REVOCATION_REFRESH_SECONDS = float(os.environ.get('SESSION_REVOCATION_REFRESH_SECONDS', '30'))
+
+class TokenError(Exception):
+    """Токен сессии отсутствует, поврежден, просрочен или отозван"""
+
+class SessionStoreError(Exception):
+    """Список отзыва не удалось перечитать из БД: проверить сессию сейчас нельзя"""
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+def _load_keys() -> List[Tuple[str, bytes]]:
+    """Ключи подписи из SESSION_SIGNING_KEYS вида "kid:secret,kid:secret"; первым подписываются новые токены"""
+    # Остальные ключи только принимаются: при ротации новый ключ ставится первым, а старый
+    # удаляется через SESSION_TTL_SECONDS, когда подписанные им токены истекут.
+    keys = []
+    for pair in os.environ.get('SESSION_SIGNING_KEYS', '').split(','):
+        kid, _, secret = pair.strip().partition(':')
+        if kid and secret:
+            keys.append((kid, secret.encode()))
+    return keys
+
+_keys = _load_keys()
+_keys_by_id = dict(_keys)
+
+def signing_configured() -> bool:
+    """Заданы ли ключи подписи: без них токен не выдать, проверять до работы входа"""
+    return bool(_keys)
+
+def _sign(kid: str, signing_input: str) -> str:
+    return _b64encode(hmac.new(_keys_by_id[kid], signing_input.encode(), hashlib.sha256).digest())
+
+def issue_token(user: Dict[str, Any]) -> Tuple[str, int]:
+    """Подписанный токен сессии с id, ролью и email пользователя и время его истечения"""
+    if not _keys:
+        raise RuntimeError('Не заданы ключи подписи сессий SESSION_SIGNING_KEYS')
+    kid = _keys[0][0]
+    now = int(time.time())
+    claims = {
+        'sub': user['id'],
+        'role': user['role'],
+        'email': user['email'],
+        'iat': now,
+        'exp': now + SESSION_TTL_SECONDS,
+        'jti': secrets.token_urlsafe(12)
+    }
+    signing_input = f'{TOKEN_PREFIX}.{kid}.{_b64encode(json.dumps(claims, separators=(",", ":")).encode())}'
+    return f'{signing_input}.{_sign(kid, signing_input)}', claims['exp']
+
+class RevocationList:
+    """Отозванные до истечения токены; в памяти процесса, перечитываются из БД не чаще раза в интервал"""
+
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._revoked: Dict[str, int] = {}
+        self._loaded_at = float('-inf')
+        self._lock = threading.Lock()
+        self.stats = {'refreshes': 0}
+
+    def _refresh(self) -> None:
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    """SELECT jti, EXTRACT(EPOCH FROM expires_at)::BIGINT
+                    FROM t_p613096_greeting_project_36.revoked_sessions
+                    WHERE expires_at > NOW()"""
+                )
+                revoked = dict(cur.fetchall())
+            conn.rollback()
+        finally:
+            release_db_connection(conn)
+        self._revoked = revoked
+        self._loaded_at = time.monotonic()
+        self.stats['refreshes'] += 1
+
+    def is_revoked(self, jti: str) -> bool:
+        if time.monotonic() - self._loaded_at > self.refresh_seconds:
+            with self._lock:
+                if time.monotonic() - self._loaded_at > self.refresh_seconds:
+                    try:
+                        self._refresh()
+                    except Exception as e:
+                        print(f'Revocation list refresh error: {e}')
+                        raise SessionStoreError('Проверка сессии временно недоступна')
+        return jti in self._revoked
+
+    def revoke(self, cur: Any, jti: str, expires_at: int) -> None:
+        """Отозвать токен в текущей транзакции; в этом процессе отзыв действует сразу"""
+        cur.execute(
+            """INSERT INTO t_p613096_greeting_project_36.revoked_sessions (jti, expires_at)
+            VALUES (%s, to_timestamp(%s)::TIMESTAMP) ON CONFLICT (jti) DO NOTHING""",
+            (jti, expires_at)
+        )
+        self._revoked[jti] = expires_at
+
+revocations = RevocationList(REVOCATION_REFRESH_SECONDS)
+
+def verify_token(token: Optional[str]) -> Dict[str, Any]:
+    """Проверить подпись, срок и отзыв токена; возвращает claims. Обращается к БД только при обновлении списка отзыва"""
+    if not token:
+        raise TokenError('Требуется авторизация')
+    try:
+        prefix, kid, payload, signature = token.split('.')
+    except ValueError:
+        raise TokenError('Неверный токен')
+    if prefix != TOKEN_PREFIX or kid not in _keys_by_id:
+        raise TokenError('Неверный токен')
+    if not hmac.compare_digest(signature, _sign(kid, f'{prefix}.{kid}.{payload}')):
+        raise TokenError('Неверный токен')
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        raise TokenError('Неверный токен')
+    if claims['exp'] < time.time():
+        raise TokenError('Сессия истекла')
+    if revocations.is_revoked(claims['jti']):
+        raise TokenError('Сессия завершена')
+    return claims
+
+def token_from_event(event: Dict[str, Any]) -> Optional[str]:
+    """Токен из заголовка Authorization (или X-Authorization) вида "Bearer <token>" """
+    for name, value in (event.get('headers') or {}).items():
+        if name.lower() in ('authorization', 'x-authorization') and value:
+            scheme, _, token = str(value).partition(' ')
+            return token.strip() if scheme.lower() == 'bearer' else str(value).strip()
+    return None
+
+def authenticate(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Claims сессии из запроса; TokenError — ответ 401, SessionStoreError — 503"""
+    return verify_token(token_from_event(event))
@@ -0,0 +1,125 @@
+import base64
+import hashlib
+import hmac
+import os
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+from order_numbers import order_number_time
+
+CODE_PREFIX = 'EH1'
+SIGNATURE_BYTES = 16
+SCAN_ROLES = frozenset(('admin', 'staff'))
+
+class TicketCodeError(Exception):
+    """QR-код билета не прошел проверку подписи или формата"""
+
+def _load_keys() -> List[Tuple[str, bytes]]:
+    """Ключи подписи QR-кодов из TICKET_SIGNING_KEYS вида "kid:secret,kid:secret"; первым подписываются новые коды"""
+    # Коды живут до конца мероприятия, поэтому старый ключ при ротации остается в списке,
+    # пока не пройдут все события, билеты на которые им подписаны.
+    keys = []
+    for pair in os.environ.get('TICKET_SIGNING_KEYS', '').split(','):
+        kid, _, secret = pair.strip().partition(':')
+        if kid and secret:
+            keys.append((kid, secret.encode()))
+    return keys
+
+_keys = _load_keys()
+_keys_by_id = dict(_keys)
+
+def _signature(secret: bytes, order_number: str, line: int, seq: int) -> str:
+    digest = hmac.new(secret, f'{order_number}.{line}.{seq}'.encode(), hashlib.sha256).digest()
+    # 128 бит подписи достаточно, а короткий код дает более крупные модули QR
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode().rstrip('=')
+
+def sign(order_number: str, line: int, seq: int) -> str:
+    """Код билета: seq-й билет line-й позиции заказа, подписанный текущим ключом"""
+    kid, secret = _keys[0]
+    return f'{CODE_PREFIX}.{kid}.{order_number}.{line}.{seq}.{_signature(secret, order_number, line, seq)}'
+
+def verify(code: str) -> Tuple[str, int, int]:
+    """Номер заказа, позиция и номер билета из кода; подделка отсекается без обращения к БД"""
+    parts = code.strip().split('.')
+    if len(parts) != 6 or parts[0] != CODE_PREFIX or not parts[3].isdigit() or not parts[4].isdigit():
+        raise TicketCodeError('Неверный формат QR-кода')
+    _, kid, order_number, line, seq, signature = parts
+    secret = _keys_by_id.get(kid)
+    if secret is None or not hmac.compare_digest(signature, _signature(secret, order_number, int(line), int(seq))):
+        raise TicketCodeError('Недействительный QR-код')
+    return order_number, int(line), int(seq)
+
+def ticket_codes(order_number: str, lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Подписанные коды по одному на билет (позиция × количество); без ключей подписи — пусто"""
+    if not _keys:
+        return []
+    return [
+        {
+            'code': sign(order_number, line_no, seq),
+            'event_title': line['event_title'],
+            'ticket_type': line['ticket_type'],
+            'seq': seq + 1,
+            'quantity': line['quantity']
+        }
+        for line_no, line in enumerate(lines)
+        for seq in range(line['quantity'])
+    ]
+
+def content_id(code: str) -> str:
+    """Content-ID картинки в письме — хеш кода; по нему же рассыльщик кеширует PNG"""
+    return f'{hashlib.sha256(code.encode()).hexdigest()}@eventhub'
+
+# Позиция кода — порядковый номер строки order_items заказа (вставляются в порядке корзины).
+# Отметка о проходе вставляется в том же запросе, повторное сканирование видит первую.
+SCAN_SQL = """WITH ticket AS (
+    SELECT o.status, o.full_name, i.event_title, i.ticket_type, i.quantity
+    FROM t_p613096_greeting_project_36.orders o
+    CROSS JOIN LATERAL (
+        SELECT oi.event_title, oi.ticket_type, oi.quantity
+        FROM t_p613096_greeting_project_36.order_items oi
+        WHERE oi.order_id = o.id AND oi.created_at = o.created_at
+        ORDER BY oi.id OFFSET %(line)s LIMIT 1
+    ) i
+    WHERE o.order_number = %(order_number)s {bounds}
+), admitted AS (
+    INSERT INTO t_p613096_greeting_project_36.ticket_scans (order_number, line, seq, scanned_by)
+    SELECT %(order_number)s, %(line)s, %(seq)s, %(scanned_by)s
+    FROM ticket WHERE status = 'confirmed' AND %(seq)s < quantity
+    ON CONFLICT DO NOTHING
+    RETURNING scanned_at
+)
+SELECT ticket.*,
+    (SELECT scanned_at FROM admitted) AS admitted_at,
+    (SELECT s.scanned_at FROM t_p613096_greeting_project_36.ticket_scans s
+     WHERE s.order_number = %(order_number)s AND s.line = %(line)s AND s.seq = %(seq)s) AS first_scanned_at
+FROM ticket"""
+
+def scan(cur: Any, order_number: str, line: int, seq: int, scanned_by: str) -> Tuple[int, Dict[str, Any]]:
+    """Проверить билет из verify по заказу и отметить проход; статус ответа и тело"""
+    params: Dict[str, Any] = {'order_number': order_number, 'line': line, 'seq': seq, 'scanned_by': scanned_by}
+    bounds = ''
+    issued_at = order_number_time(order_number)
+    if issued_at:
+        # как в history.get_order: окно в сутки вокруг времени из номера отсекает лишние секции
+        bounds = 'AND o.created_at >= %(since)s AND o.created_at < %(until)s'
+        params.update(since=issued_at - timedelta(days=1), until=issued_at + timedelta(days=1))
+    cur.execute(SCAN_SQL.format(bounds=bounds), params)
+    row = cur.fetchone()
+
+    if row is None or seq >= row['quantity']:
+        return 404, {'valid': False, 'error': 'Билет не найден'}
+    if row['status'] != 'confirmed':
+        return 409, {'valid': False, 'error': 'Заказ не оплачен или отменен', 'order_status': row['status']}
+    ticket = {
+        'order_number': order_number,
+        'full_name': row['full_name'],
+        'event_title': row['event_title'],
+        'ticket_type': row['ticket_type'],
+        'seq': seq + 1,
+        'quantity': row['quantity']
+    }
+    if row['admitted_at'] is None:
+        # одновременное сканирование в другой транзакции не видно снимку запроса
+        first = row['first_scanned_at']
+        return 409, {'valid': False, 'error': 'Билет уже использован',
+                     'scanned_at': first.isoformat() if first else None, 'ticket': ticket}
+    return 200, {'valid': True, 'admitted_at': row['admitted_at'].isoformat(), 'ticket': ticket}
@@ -0,0 +1,129 @@
+"""
+Бенчмарк оформления заказов в одном процессе: синхронный index.handler в пуле потоков
+против асинхронного aio.handler на asyncpg при одинаковом числе одновременных запросов
+и одинаковом размере пула соединений. Запросы в секунду на ядро = заказы / процессорное
+время процесса, так что результат не зависит от числа ядер машины.
+
+Запуск (нужен локальный PostgreSQL с применёнными миграциями; тестовый тип билета без
+ограничения остатка и заказы создаются и удаляются самим скриптом):
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/async_checkout.py
+    python benchmarks/async_checkout.py --orders 2000 --concurrency 1 16 64 --pool 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = 't_p613096_greeting_project_36'
+TICKET_ID = 'bench-async'
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--pool', type=int, default=10, help='соединений с БД у каждого варианта')
+    return parser.parse_args()
+
+args = parse_args()
+# размеры пулов читаются при импорте функции
+os.environ['DB_POOL_MAX_SIZE'] = str(args.pool)
+os.environ['ORDERS_ASYNC_POOL_SIZE'] = str(args.pool)
+os.environ['ORDERS_ASYNC_MAX_IN_FLIGHT'] = str(max(args.concurrency))
+
+from common import load_function  # noqa: E402
+
+index = load_function('orders')
+import aio  # noqa: E402
+
+EMAIL = f'async-bench-{uuid.uuid4().hex[:12]}@example.com'
+EVENT = {
+    'httpMethod': 'POST',
+    'body': json.dumps({
+        'full_name': 'Нагрузочный Тест',
+        'email': EMAIL,
+        'phone': '+79990000000',
+        'cart_items': [{'ticketId': TICKET_ID, 'quantity': 2, 'price': 1}],
+        'total_amount': 2
+    })
+}
+
+def sql(statements: List[str]) -> None:
+    conn = index.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            for statement in statements:
+                cur.execute(statement, {'ticket': TICKET_ID, 'email': EMAIL})
+        conn.commit()
+    finally:
+        index.release_db_connection(conn)
+
+def setup() -> None:
+    # тип билета без строк остатка не ограничен, так что заказы не упираются в распродажу
+    sql([f"""INSERT INTO {SCHEMA}.ticket_types (id, event_id, name, price)
+        VALUES (%(ticket)s, '1', 'Бенчмарк', 1) ON CONFLICT (id) DO NOTHING"""])
+
+def cleanup() -> None:
+    sql([
+        f"""DELETE FROM {SCHEMA}.order_items WHERE (order_id, created_at) IN
+        (SELECT id, created_at FROM {SCHEMA}.orders WHERE email = %(email)s)""",
+        f"""DELETE FROM {SCHEMA}.ticket_holds WHERE order_id IN
+        (SELECT id FROM {SCHEMA}.orders WHERE email = %(email)s)""",
+        f"""DELETE FROM {SCHEMA}.order_numbers WHERE order_number IN
+        (SELECT order_number FROM {SCHEMA}.orders WHERE email = %(email)s)""",
+        f'DELETE FROM {SCHEMA}.orders WHERE email = %(email)s',
+        f'DELETE FROM {SCHEMA}.email_outbox WHERE to_email = %(email)s',
+        f'DELETE FROM {SCHEMA}.ticket_types WHERE id = %(ticket)s',
+    ])
+
+def measure(run: Callable[[], List[int]]) -> Dict[str, float]:
+    wall, cpu = time.perf_counter(), time.process_time()
+    statuses = run()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    failed = [status for status in statuses if status != 200]
+    assert not failed, f'неуспешные ответы: {failed[:5]}'
+    return {'rps': len(statuses) / wall, 'cpu_seconds': cpu, 'rps_per_core': len(statuses) / cpu}
+
+def run_sync(orders: int, concurrency: int) -> List[int]:
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return [response['statusCode'] for response in pool.map(lambda _: index.handler(EVENT, None), range(orders))]
+
+# пул asyncpg привязан к циклу событий, поэтому все асинхронные замеры идут в одном цикле
+loop = asyncio.new_event_loop()
+
+def run_async(orders: int, concurrency: int) -> List[int]:
+    async def bounded() -> List[int]:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one() -> int:
+            async with gate:
+                return (await aio.handler(EVENT, None))['statusCode']
+
+        return await asyncio.gather(*(one() for _ in range(orders)))
+
+    return loop.run_until_complete(bounded())
+
+def main() -> None:
+    setup()
+    try:
+        # прогрев: кеш каталога, пулы соединений, подготовленные запросы asyncpg
+        run_sync(20, 4)
+        run_async(20, 4)
+
+        print(f'{"mode":>6} {"concurrency":>11} {"req/s":>8} {"cpu s":>7} {"req/s per core":>15}')
+        for concurrency in args.concurrency:
+            for mode, run in (('sync', run_sync), ('async', run_async)):
+                result = measure(lambda: run(args.orders, concurrency))
+                print(f'{mode:>6} {concurrency:>11} {result["rps"]:8.0f} {result["cpu_seconds"]:7.2f} {result["rps_per_core"]:15.0f}')
+    finally:
+        cleanup()
+        loop.close()
+
+if __name__ == '__main__':
+    main()
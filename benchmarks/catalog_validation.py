@@ -0,0 +1,52 @@
+"""
+Бенчмарк проверки корзины по каталогу: обращения к БД и время для холодного и теплого кеша.
+
+Запуск (нужен локальный PostgreSQL с применёнными миграциями):
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/catalog_validation.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import load_function, instrument_db, make_cart, reset_round_trips, round_trips  # noqa: E402
+
+index = load_function('orders')
+instrument_db(index)
+
+from catalog import catalog  # noqa: E402
+from psycopg2.extras import RealDictCursor  # noqa: E402
+
+CART_SIZE = 50
+REPEATS = 1000
+
+def main() -> None:
+    cart = make_cart(CART_SIZE)
+    total = sum(item['price'] * item['quantity'] for item in cart)
+    conn = index.get_db_connection()
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        catalog.invalidate()
+        reset_round_trips()
+        started = time.perf_counter()
+        catalog.validate_cart(cur, cart, total)
+        cold_ms = (time.perf_counter() - started) * 1000
+        cold_trips = round_trips()
+
+        reset_round_trips()
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            catalog.validate_cart(cur, cart, total)
+        warm_ms = (time.perf_counter() - started) * 1000 / REPEATS
+        warm_trips = round_trips() / REPEATS
+    finally:
+        cur.close()
+        index.release_db_connection(conn)
+
+    print(f'cart_size={CART_SIZE}')
+    print(f'cold: round_trips={cold_trips} ms={cold_ms:.3f}')
+    print(f'warm: round_trips={warm_trips:.0f} ms={warm_ms:.3f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Бенчмарк холодного старта auth и orders: каждый замер — новый процесс интерпретатора.
+Показывает самые дорогие модули по `python -X importtime`, время импорта index.py и время
+до первого ответа (OPTIONS и ошибка валидации), проверяет, что тяжелые модули (psycopg2,
+smtplib, email.mime, concurrent.futures) не загружаются на этих путях. Завершается с кодом 1,
+если медиана превышает бюджет:
+
+    python benchmarks/cold_start.py
+    COLD_START_IMPORT_BUDGET_MS=40 COLD_START_RESPONSE_BUDGET_MS=60 python benchmarks/cold_start.py
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import BACKEND  # noqa: E402
+
+FUNCTIONS = ('auth', 'orders')
+RUNS = int(os.environ.get('COLD_START_RUNS', '7'))
+IMPORT_BUDGET_MS = float(os.environ.get('COLD_START_IMPORT_BUDGET_MS', '60'))
+RESPONSE_BUDGET_MS = float(os.environ.get('COLD_START_RESPONSE_BUDGET_MS', '80'))
+HEAVY_MODULES = ('psycopg2', 'smtplib', 'email.mime', 'concurrent.futures')
+
+# Первые запросы, которые не должны трогать БД и SMTP
+FIRST_EVENTS = {
+    'auth': [{'httpMethod': 'OPTIONS'}, {'httpMethod': 'POST', 'body': json.dumps({'action': 'login'})}],
+    'orders': [{'httpMethod': 'OPTIONS'}, {'httpMethod': 'POST', 'body': '{"email": ""}'}],
+}
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import index
+imported = time.perf_counter()
+statuses = [index.handler(event, None)['statusCode'] for event in json.loads(sys.argv[1])]
+responded = time.perf_counter()
+heavy = sorted(name for name in sys.modules if name.startswith(tuple(json.loads(sys.argv[2]))))
+print(json.dumps({'import_ms': (imported - started) * 1000, 'response_ms': (responded - started) * 1000,
+                  'statuses': statuses, 'heavy': heavy}))
+"""
+
+def probe(name: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, json.dumps(FIRST_EVENTS[name]), json.dumps(HEAVY_MODULES)],
+        cwd=os.path.join(BACKEND, name), capture_output=True, text=True, check=True
+    )
+    data = json.loads(result.stdout)
+    data['process_ms'] = (time.perf_counter() - started) * 1000
+    return data
+
+def import_profile(name: str, top: int = 8) -> List[Tuple[int, str]]:
+    """Модули с наибольшим собственным временем импорта index.py, мкс"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'],
+        cwd=os.path.join(BACKEND, name), capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, module = line[len('import time:'):].split('|')
+        rows.append((int(self_us), module.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main() -> int:
+    failures = []
+    for name in FUNCTIONS:
+        print(f'== {name}')
+        for self_us, module in import_profile(name):
+            print(f'   {self_us / 1000:6.2f} ms  {module}')
+
+        samples = [probe(name) for _ in range(RUNS)]
+        import_ms = statistics.median(s['import_ms'] for s in samples)
+        response_ms = statistics.median(s['response_ms'] for s in samples)
+        process_ms = statistics.median(s['process_ms'] for s in samples)
+        heavy = samples[0]['heavy']
+        print(f'   import index: {import_ms:.1f} ms, first responses {samples[0]["statuses"]}: {response_ms:.1f} ms, '
+              f'process with interpreter startup: {process_ms:.1f} ms (median of {RUNS})')
+        print(f'   heavy modules loaded: {", ".join(heavy) or "none"}')
+
+        if import_ms > IMPORT_BUDGET_MS:
+            failures.append(f'{name}: import {import_ms:.1f} ms > {IMPORT_BUDGET_MS:.0f} ms')
+        if response_ms > RESPONSE_BUDGET_MS:
+            failures.append(f'{name}: first response {response_ms:.1f} ms > {RESPONSE_BUDGET_MS:.0f} ms')
+        if heavy:
+            failures.append(f'{name}: loaded on the cold path: {", ".join(heavy)}')
+
+    for failure in failures:
+        print(f'BUDGET EXCEEDED {failure}')
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Общие помощники бенчмарков: загрузка функций, подсчет обращений к БД, SMTP-заглушка."""
+import importlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Dict, List, Set
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+
+def load_function(name: str) -> Any:
+    """Импортировать index.py облачной функции. Модули функций называются одинаково
+    (index, db, ...), поэтому в одном процессе можно загрузить только одну функцию."""
+    loaded = sys.modules.get('index')
+    if loaded is not None and os.path.dirname(loaded.__file__) != os.path.join(BACKEND, name):
+        raise RuntimeError(f'В процессе уже загружена функция {os.path.dirname(loaded.__file__)}')
+    sys.path.insert(0, os.path.join(BACKEND, name))
+    return importlib.import_module('index')
+
+def load_test_events(name: str) -> List[Dict[str, Any]]:
+    """События из tests.json функции"""
+    path = os.path.join(BACKEND, name, 'tests.json')
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        tests = json.load(f)['tests']
+    return [
+        {
+            'name': test['name'],
+            'event': {
+                'httpMethod': test.get('method', 'POST'),
+                'headers': test.get('headers', {}),
+                'queryStringParameters': test.get('query', {}),
+                'body': json.dumps(test['body']) if 'body' in test else ''
+            }
+        }
+        for test in tests
+    ]
+
+# Типы билетов из сида каталога (V0008)
+SEED_TICKETS = [
+    ('1', 'Концерт джазового оркестра', 't1', 'VIP', 5000),
+    ('1', 'Концерт джазового оркестра', 't2', 'Партер', 3000),
+    ('1', 'Концерт джазового оркестра', 't3', 'Балкон', 1500),
+    ('2', 'Театральная постановка "Гамлет"', 't4', 'Премиум', 4000),
+    ('2', 'Театральная постановка "Гамлет"', 't5', 'Стандарт', 2000),
+    ('3', 'Выставка современного искусства', 't6', 'Входной билет', 800),
+]
+
+def make_cart(size: int) -> List[Dict[str, Any]]:
+    """Корзина из size строк по билетам каталога, в формате фронтенда"""
+    cart = []
+    for n in range(size):
+        event_id, event_title, ticket_id, ticket_type, price = SEED_TICKETS[n % len(SEED_TICKETS)]
+        cart.append({'eventId': event_id, 'eventTitle': event_title, 'ticketId': ticket_id,
+                     'ticketType': ticket_type, 'price': price, 'quantity': 1 + n % 3})
+    return cart
+
+_local = threading.local()
+
+def round_trips() -> int:
+    return getattr(_local, 'round_trips', 0)
+
+def reset_round_trips() -> None:
+    _local.round_trips = 0
+
+def _count() -> None:
+    _local.round_trips = round_trips() + 1
+
+class CountingCursor:
+    def __init__(self, cursor: Any):
+        self._cursor = cursor
+
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        _count()
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args: Any, **kwargs: Any) -> Any:
+        _count()
+        return self._cursor.executemany(*args, **kwargs)
+
+    def copy_expert(self, *args: Any, **kwargs: Any) -> Any:
+        _count()
+        return self._cursor.copy_expert(*args, **kwargs)
+
+    def __enter__(self) -> 'CountingCursor':
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._cursor.close()
+
+    def __iter__(self) -> Any:
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+class CountingConnection:
+    """Обертка соединения, считающая обращения к БД в текущем потоке"""
+
+    def __init__(self, conn: Any):
+        self._conn = conn
+
+    def cursor(self, *args: Any, **kwargs: Any) -> CountingCursor:
+        return CountingCursor(self._conn.cursor(*args, **kwargs))
+
+    def commit(self) -> None:
+        _count()
+        self._conn.commit()
+
+    def rollback(self) -> None:
+        _count()
+        self._conn.rollback()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+def instrument_db(module: Any) -> None:
+    """Подменить get_db_connection/release_db_connection в модуле функции на считающие"""
+    acquire, release = module.get_db_connection, module.release_db_connection
+    module.get_db_connection = lambda: CountingConnection(acquire())
+    module.release_db_connection = lambda conn: release(getattr(conn, '_conn', conn))
+
+class SmtpStandIn:
+    """
+    SMTP-заглушка на сокетах стандартной библиотеки (smtpd/asyncore удалены в Python 3.12):
+    принимает любые письма, считает сессии и письма и умеет оборвать открытые соединения.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.sessions = 0
+        self.messages = 0
+        self._sockets: Set[socket.socket] = set()
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                stand_in._serve(self.request, self.rfile, self.wfile)
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def _serve(self, sock: socket.socket, rfile: Any, wfile: Any) -> None:
+        with self._lock:
+            self.sessions += 1
+            self._sockets.add(sock)
+        try:
+            wfile.write(b'220 stand-in ESMTP\r\n')
+            for line in iter(rfile.readline, b''):
+                verb = line[:4].upper()
+                if verb == b'DATA':
+                    wfile.write(b'354 End data with <CR><LF>.<CR><LF>\r\n')
+                    for data in iter(rfile.readline, b''):
+                        if data == b'.\r\n':
+                            break
+                    else:
+                        return
+                    with self._lock:
+                        self.messages += 1
+                    wfile.write(b'250 OK\r\n')
+                elif verb == b'QUIT':
+                    wfile.write(b'221 Bye\r\n')
+                    return
+                else:
+                    wfile.write(b'250 OK\r\n')
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._sockets.discard(sock)
+
+    def drop_connections(self) -> None:
+        """Оборвать все открытые сессии со стороны сервера"""
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+def start_smtp_stand_in(host: str = '127.0.0.1', port: int = 0) -> int:
+    """Поднять локальную SMTP-заглушку, принимающую любые письма. Возвращает порт."""
+    return SmtpStandIn(host, port).port
@@ -0,0 +1,67 @@
+"""
+Микробенчмарк общего рантайма функций: стоимость маршрутизации, проверки схемы и
+сериализации ответа на один вызов, для стандартного json и orjson, и проверка того,
+что число зарегистрированных действий не влияет на время маршрутизации.
+
+    python benchmarks/dispatch.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'auth'))
+
+import runtime  # noqa: E402
+from runtime import Field, Router, Schema  # noqa: E402
+
+REPEATS = 200000
+
+LOGIN_BODY = {'action': 'login', 'email': 'user@example.com', 'password': 'correct horse battery staple'}
+LOGIN_SCHEMA = Schema(email=Field(str, max_length=255), password=Field(str, max_length=1024))
+USER_PAYLOAD = {
+    'success': True,
+    'token': 'v1.k1.' + 'x' * 160,
+    'expires_at': 1767225600,
+    'user': {'id': 1, 'email': 'user@example.com', 'phone': '+79990000000', 'full_name': 'Иван Иванов', 'role': 'basic'}
+}
+
+def per_call_ns(fn, repeats: int = REPEATS) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1e9
+
+def make_router(actions: int) -> Router:
+    router = Router()
+    for n in range(actions - 1):
+        router.route(f'action_{n}', LOGIN_SCHEMA)(lambda *args: None)
+    router.route('login', LOGIN_SCHEMA)(lambda *args: None)
+    return router
+
+def main() -> None:
+    print(f'codec by default: {runtime.codec_name}')
+
+    for actions in (8, 1000):
+        router = make_router(actions)
+
+        def dispatch() -> None:
+            _, schema = router.resolve(LOGIN_BODY['action'])
+            schema.validate(LOGIN_BODY)
+
+        print(f'dispatch + validate, {actions:>4} actions: {per_call_ns(dispatch):8.0f} ns')
+
+    codecs = [('json', runtime._stdlib_dumps, json.loads)]
+    try:
+        import orjson
+        codecs.append(('orjson', lambda obj: orjson.dumps(obj, default=str).decode(), orjson.loads))
+    except ImportError:
+        print('orjson не установлен, сравнивается только json')
+    for name, encode, decode in codecs:
+        runtime.set_codec(name, encode, decode)
+        print(f'respond(200, user) [{name:>6}]:          {per_call_ns(lambda: runtime.respond(200, USER_PAYLOAD)):8.0f} ns')
+        raw = {'body': json.dumps(LOGIN_BODY)}
+        print(f'parse_body [{name:>6}]:                  {per_call_ns(lambda: runtime.parse_body(raw)):8.0f} ns')
+
+if __name__ == '__main__':
+    main()
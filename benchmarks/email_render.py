@@ -0,0 +1,82 @@
+"""
+Бенчмарк рендеринга письма с билетами: время и размер для корзин от 1 до 500 строк,
+в сравнении с прежней сборкой таблицы билетов через f-строку и tickets_html += ...
+
+    python benchmarks/email_render.py
+"""
+import os
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'orders'))
+
+from common import SEED_TICKETS  # noqa: E402
+from emails import TICKET_ROW_HTML, order_confirmation  # noqa: E402
+
+SIZES = (1, 10, 50, 100, 500)
+
+def make_lines(size: int):
+    lines = []
+    for n in range(size):
+        _, event_title, ticket_id, ticket_type, price = SEED_TICKETS[n % len(SEED_TICKETS)]
+        lines.append({'ticket_type_id': ticket_id, 'event_title': event_title, 'ticket_type': ticket_type,
+                      'price': price, 'quantity': 1 + n % 3})
+    return lines
+
+def legacy_rows(lines) -> str:
+    """Прежняя сборка таблицы билетов: f-строка и tickets_html += ... в цикле"""
+    tickets_html = ""
+    for item in lines:
+        tickets_html += f"""
+                <tr>
+                    <td style="padding: 15px; border-bottom: 1px solid #eee;">
+                        <strong style="color: #333; display: block; margin-bottom: 5px;">{item['event_title']}</strong>
+                        <span style="color: #666; font-size: 14px;">{item['ticket_type']}</span>
+                    </td>
+                    <td style="padding: 15px; border-bottom: 1px solid #eee; text-align: center; color: #666;">
+                        {item['quantity']} шт.
+                    </td>
+                    <td style="padding: 15px; border-bottom: 1px solid #eee; text-align: right; color: #333; font-weight: bold;">
+                        {item['price'] * item['quantity']} ₽
+                    </td>
+                </tr>
+                """
+    return tickets_html
+
+def per_call_ms(fn, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1000
+
+def main() -> None:
+    print(f"{'lines':>6} {'rows legacy ms':>15} {'rows template ms':>17} {'email ms':>9} "
+          f"{'rows legacy KB':>15} {'rows KB':>8} {'html KB':>8} {'text KB':>8} {'MIME KB':>8}")
+    for size in SIZES:
+        lines = make_lines(size)
+        rows = [{**line, 'amount': line['price'] * line['quantity']} for line in lines]
+        total = sum(row['amount'] for row in rows)
+        repeats = max(20, 2000 // size)
+        args = ('ORD-20250101000000-ABCDE-0001', 'Иван Иванов', 'test@example.com', '+79990000000', lines, total)
+
+        legacy_ms = per_call_ms(lambda: legacy_rows(lines), repeats)
+        rows_ms = per_call_ms(lambda: TICKET_ROW_HTML.render_each(rows), repeats)
+        # письмо целиком: HTML и текстовая версия
+        email_ms = per_call_ms(lambda: order_confirmation(*args), repeats)
+
+        subject, html_body, text_body = order_confirmation(*args)
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg.attach(MIMEText(text_body, 'plain', 'utf-8'))
+        msg.attach(MIMEText(html_body, 'html', 'utf-8'))
+
+        kb = lambda text: len(text.encode()) / 1024  # noqa: E731
+        print(f"{size:>6} {legacy_ms:>15.3f} {rows_ms:>17.3f} {email_ms:>9.3f} "
+              f"{kb(legacy_rows(lines)):>15.1f} {kb(TICKET_ROW_HTML.render_each(rows)):>8.1f} "
+              f"{kb(html_body):>8.1f} {kb(text_body):>8.1f} {kb(msg.as_string()):>8.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Стресс-тест резервирования билетов: много покупателей одновременно берут один
+популярный тип билета. Сравнивает пропускную способность при одной корзине остатка
+и при нескольких и проверяет, что билетов продано не больше, чем было. Второй прогон —
+почти распроданный билет: по паре билетов в корзине и заказы от 2 билетов, которым
+приходится собирать остаток из нескольких корзин; взаимоблокировки (40P01) и сбои
+сериализации (40001) в нем считаются ошибкой.
+
+Запуск (нужен локальный PostgreSQL с применёнными миграциями; тестовый тип билета
+создается и удаляется самим скриптом):
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/inventory_stress.py
+    python benchmarks/inventory_stress.py --buyers 64 --capacity 2000 --buckets 1 16
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+import psycopg2
+
+SCHEMA = 't_p613096_greeting_project_36'
+TICKET_ID = 'stress-hot'
+SOLD_OUT_PGCODE = 'EH001'
+CONFLICT_PGCODES = ('40P01', '40001')
+
+def setup(conn: Any, capacity: int, buckets: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {SCHEMA}.ticket_holds WHERE ticket_type_id = %s", (TICKET_ID,))
+        cur.execute(
+            f"""INSERT INTO {SCHEMA}.ticket_types (id, event_id, name, price)
+            VALUES (%s, '1', 'Стресс-тест', 1) ON CONFLICT (id) DO NOTHING""",
+            (TICKET_ID,)
+        )
+        cur.execute(f"SELECT {SCHEMA}.set_ticket_capacity(%s, %s, %s)", (TICKET_ID, capacity, buckets))
+    conn.commit()
+
+def teardown(conn: Any) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {SCHEMA}.ticket_holds WHERE ticket_type_id = %s", (TICKET_ID,))
+        cur.execute(f"DELETE FROM {SCHEMA}.ticket_inventory_buckets WHERE ticket_type_id = %s", (TICKET_ID,))
+        cur.execute(f"DELETE FROM {SCHEMA}.ticket_types WHERE id = %s", (TICKET_ID,))
+    conn.commit()
+
+def run(dsn: str, buyers: int, capacity: int, buckets: int, max_quantity: int, min_quantity: int = 1) -> Dict[str, Any]:
+    admin = psycopg2.connect(dsn)
+    setup(admin, capacity, buckets)
+    local = threading.local()
+    connections: List[Any] = []
+    counters = {'orders': 0, 'sold': 0, 'sold_out': 0, 'conflicts': 0}
+    counters_lock = threading.Lock()
+    order_ids = iter(range(1, 10 ** 9))
+
+    def buy(_: int) -> None:
+        conn = getattr(local, 'conn', None)
+        if conn is None:
+            conn = local.conn = psycopg2.connect(dsn)
+            with counters_lock:
+                connections.append(conn)
+        quantity = random.randint(min_quantity, max_quantity)
+        with counters_lock:
+            order_id = -next(order_ids)
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT {SCHEMA}.reserve_tickets(%s, %s::jsonb, 'confirmed', NULL)",
+                    (order_id, f'[{{"ticket_type_id": "{TICKET_ID}", "quantity": {quantity}}}]')
+                )
+            conn.commit()
+            with counters_lock:
+                counters['orders'] += 1
+                counters['sold'] += quantity
+        except psycopg2.Error as e:
+            conn.rollback()
+            if e.pgcode == SOLD_OUT_PGCODE:
+                counter = 'sold_out'
+            elif e.pgcode in CONFLICT_PGCODES:
+                counter = 'conflicts'
+            else:
+                raise
+            with counters_lock:
+                counters[counter] += 1
+
+    # заведомо больше попыток, чем билетов, чтобы упереться в распродажу
+    attempts = capacity * 2
+    started = time.perf_counter()
+    with ThreadPoolExecutor(buyers) as pool:
+        list(pool.map(buy, range(attempts)))
+    wall = time.perf_counter() - started
+
+    with admin.cursor() as cur:
+        cur.execute(f"SELECT COALESCE(SUM(remaining), 0) FROM {SCHEMA}.ticket_inventory_buckets WHERE ticket_type_id = %s", (TICKET_ID,))
+        remaining = cur.fetchone()[0]
+        cur.execute(f"SELECT COALESCE(SUM(quantity), 0) FROM {SCHEMA}.ticket_holds WHERE ticket_type_id = %s", (TICKET_ID,))
+        held = cur.fetchone()[0]
+    admin.commit()
+    teardown(admin)
+    admin.close()
+    for conn in connections:
+        conn.close()
+
+    return {
+        'buckets': buckets,
+        'attempts': attempts,
+        'reservations_per_s': round(counters['orders'] / wall, 1),
+        'wall_s': round(wall, 3),
+        **counters,
+        'remaining': remaining,
+        'oversold': counters['sold'] > capacity or held != counters['sold'] or remaining != capacity - counters['sold'],
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--buyers', type=int, default=32, help='одновременных покупателей (соединений)')
+    parser.add_argument('--capacity', type=int, default=1000)
+    parser.add_argument('--buckets', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--max-quantity', type=int, default=4)
+    parser.add_argument('--near-sold-out-per-bucket', type=int, default=2,
+                        help='билетов в корзине во втором прогоне (0 — не запускать)')
+    args = parser.parse_args()
+    dsn = os.environ['DATABASE_URL']
+
+    runs = [('stock', buckets, args.capacity, 1) for buckets in args.buckets]
+    if args.near_sold_out_per_bucket > 0:
+        runs += [('near sold out', buckets, buckets * args.near_sold_out_per_bucket, 2)
+                 for buckets in args.buckets if buckets > 1]
+
+    failed = False
+    print(f"{'run':>14} {'buckets':>8} {'res/s':>9} {'orders':>7} {'sold':>6} {'sold_out':>9} "
+          f"{'conflicts':>10} {'remaining':>10} {'oversold':>9}")
+    for name, buckets, capacity, min_quantity in runs:
+        result = run(dsn, args.buyers, capacity, buckets, max(args.max_quantity, min_quantity), min_quantity)
+        failed |= result['oversold'] or result['conflicts'] > 0
+        print(f"{name:>14} {result['buckets']:>8} {result['reservations_per_s']:>9.1f} {result['orders']:>7} "
+              f"{result['sold']:>6} {result['sold_out']:>9} {result['conflicts']:>10} {result['remaining']:>10} "
+              f"{str(result['oversold']):>9}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Нагрузочный стенд для облачных функций: импортирует handler(event, context) и
+проигрывает события из tests.json и сгенерированные события с заданной конкурентностью.
+
+Нужны локальный PostgreSQL с применёнными миграциями (DATABASE_URL). Для mailer
+поднимается SMTP-заглушка, если SMTP_HOST не задан. На время прогона orders остаток
+билетов каталога поднимается до неограниченного и потом возвращается.
+
+    python benchmarks/load.py                       # auth, orders, затем mailer
+    python benchmarks/load.py --function orders --concurrency 16 --requests 500
+    python benchmarks/load.py --output bench_output.json --baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import (  # noqa: E402
+    ROOT, SEED_TICKETS, load_function, load_test_events, instrument_db, make_cart, reset_round_trips, round_trips,
+    start_smtp_stand_in
+)
+
+import test_fixtures  # noqa: E402
+
+FUNCTIONS = ['auth', 'orders', 'mailer']
+SCHEMA = 't_p613096_greeting_project_36'
+LOAD_CAPACITY = 10 ** 9
+
+def _event(body: Dict[str, Any], method: str = 'POST') -> Dict[str, Any]:
+    return {'httpMethod': method, 'headers': {}, 'body': json.dumps(body)}
+
+def gen_registration(i: int) -> Dict[str, Any]:
+    return _event({
+        'action': 'register',
+        'email': f'load-{uuid.uuid4().hex[:12]}@example.com',
+        'phone': '+79990000000',
+        'full_name': 'Нагрузочный Тест',
+        'password': 'loadtest-password'
+    })
+
+def gen_order(cart_size: int) -> Callable[[int], Dict[str, Any]]:
+    def make(i: int) -> Dict[str, Any]:
+        items = make_cart(cart_size)
+        return _event({
+            'full_name': 'Нагрузочный Тест',
+            'email': f'load-{i % 100}@example.com',
+            'phone': '+79990000000',
+            'cart_items': items,
+            'total_amount': sum(item['price'] * item['quantity'] for item in items)
+        })
+    return make
+
+def gen_drain(i: int) -> Dict[str, Any]:
+    event = _event({'max_batches': 1})
+    event['headers'] = {'X-Maintenance-Token': os.environ['MAINTENANCE_TOKEN']}
+    return event
+
+GENERATORS: Dict[str, Dict[str, Callable[[int], Dict[str, Any]]]] = {
+    'auth': {'register (generated)': gen_registration},
+    'orders': {'order 1 line': gen_order(1), 'order 50 lines': gen_order(50)},
+    'mailer': {'drain': gen_drain},
+}
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_action(module: Any, name: str, make_event: Callable[[int], Dict[str, Any]],
+               requests: int, concurrency: int) -> Dict[str, Any]:
+    def one(i: int) -> Dict[str, Any]:
+        event = make_event(i)
+        reset_round_trips()
+        started = time.perf_counter()
+        response = module.handler(event, None)
+        elapsed = time.perf_counter() - started
+        return {'ms': elapsed * 1000, 'status': response['statusCode'],
+                'round_trips': round_trips(), 'body': response.get('body', '')}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(s['ms'] for s in samples)
+    statuses: Dict[str, int] = {}
+    for s in samples:
+        statuses[str(s['status'])] = statuses.get(str(s['status']), 0) + 1
+    result = {
+        'action': name,
+        'requests': requests,
+        'statuses': statuses,
+        'errors': sum(1 for s in samples if s['status'] >= 500),
+        'throughput_rps': round(requests / wall, 2),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'db_round_trips_avg': round(sum(s['round_trips'] for s in samples) / requests, 2),
+    }
+    if name == 'drain':
+        sent = sum(json.loads(s['body']).get('sent', 0) for s in samples if s['status'] == 200)
+        result['emails_sent'] = sent
+        result['smtp_ms_per_email'] = round(sum(latencies) / sent, 3) if sent else None
+    return result
+
+def raise_stock(module: Any) -> Callable[[], None]:
+    """
+    Остаток билетов каталога на время прогона: в сиде (V0009) его хватает на несколько
+    заказов по 50 строк, дальше стенд мерил бы ответы 409. Заодно создается неограниченный
+    тип билета из tests.json (test_fixtures). Возвращает функцию, которая кладет прежние
+    корзины на место и удаляет фикстуру.
+    """
+    ticket_ids = sorted({ticket_id for _, _, ticket_id, _, _ in SEED_TICKETS})
+    conn = module.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT ticket_type_id, bucket, remaining FROM {SCHEMA}.ticket_inventory_buckets
+                WHERE ticket_type_id = ANY(%s) FOR UPDATE""",
+                (ticket_ids,)
+            )
+            saved = cur.fetchall()
+            for ticket_id in {row[0] for row in saved}:
+                cur.execute(f'SELECT {SCHEMA}.set_ticket_capacity(%s, %s, %s)', (ticket_id, LOAD_CAPACITY, 16))
+            test_fixtures.setup(cur)
+        conn.commit()
+    finally:
+        module.release_db_connection(conn)
+
+    def restore() -> None:
+        conn = module.get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f'DELETE FROM {SCHEMA}.ticket_inventory_buckets WHERE ticket_type_id = ANY(%s)',
+                            (ticket_ids,))
+                for row in saved:
+                    cur.execute(
+                        f'INSERT INTO {SCHEMA}.ticket_inventory_buckets (ticket_type_id, bucket, remaining) '
+                        'VALUES (%s, %s, %s)',
+                        row
+                    )
+                test_fixtures.teardown(cur)
+            conn.commit()
+        finally:
+            module.release_db_connection(conn)
+    return restore
+
+def run_function(name: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    if name == 'mailer' and not os.environ.get('SMTP_HOST'):
+        os.environ.update({'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(start_smtp_stand_in()),
+                           'SMTP_STARTTLS': 'false'})
+    if name == 'mailer':
+        # секрет читается при импорте; по умолчанию тот же, что в tests.json
+        os.environ.setdefault('MAINTENANCE_TOKEN', 'tests-maintenance-token')
+    module = load_function(name)
+    instrument_db(module)
+
+    actions = [(test['name'], (lambda event: lambda i: event)(test['event'])) for test in load_test_events(name)]
+    actions += list(GENERATORS.get(name, {}).items())
+    restore = raise_stock(module) if name == 'orders' else None
+    try:
+        results = [run_action(module, action, make, requests, concurrency) for action, make in actions]
+    finally:
+        if restore:
+            restore()
+
+    pool = sys.modules['db'].get_pool().get_stats() if 'db' in sys.modules else {}
+    return {'function': name, 'concurrency': concurrency, 'actions': results, 'db_pool': pool}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Список регрессий p95 и пропускной способности относительно сохраненного прогона"""
+    old = {(run['function'], a['action']): a for run in baseline['runs'] for a in run['actions']}
+    regressions = []
+    for run in current['runs']:
+        for action in run['actions']:
+            before = old.get((run['function'], action['action']))
+            if not before:
+                continue
+            if action['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append(f"{run['function']}/{action['action']}: p95 {before['p95_ms']} -> {action['p95_ms']} ms")
+            if action['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+                regressions.append(f"{run['function']}/{action['action']}: rps {before['throughput_rps']} -> {action['throughput_rps']}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--function', choices=FUNCTIONS, help='одна функция; по умолчанию все по очереди')
+    parser.add_argument('--requests', type=int, default=200, help='запросов на действие')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output', default=os.path.join(ROOT, 'bench_output.json'))
+    parser.add_argument('--baseline', help='сравнить с предыдущим файлом результатов')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='допустимое ухудшение, доля')
+    parser.add_argument('--json-stdout', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.function:
+        run = run_function(args.function, args.requests, args.concurrency)
+        if args.json_stdout:
+            print(json.dumps(run))
+            return 0
+        runs = [run]
+    else:
+        runs = []
+        for name in FUNCTIONS:
+            out = subprocess.run(
+                [sys.executable, __file__, '--function', name, '--requests', str(args.requests),
+                 '--concurrency', str(args.concurrency), '--json-stdout'],
+                check=True, capture_output=True, text=True
+            ).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    report = {'started_at': datetime.now().isoformat(timespec='seconds'), 'runs': runs}
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"{'function/action':<40} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'rt':>5} {'5xx':>5}")
+    for run in runs:
+        for a in run['actions']:
+            print(f"{run['function'] + '/' + a['action']:<40} {a['throughput_rps']:>9.1f} {a['p50_ms']:>8.2f} "
+                  f"{a['p95_ms']:>8.2f} {a['p99_ms']:>8.2f} {a['db_round_trips_avg']:>5.1f} {a['errors']:>5}")
+    print(f'Результаты записаны в {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'РЕГРЕССИЯ {line}')
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Бенчмарк истории заказов: время первой и глубоких страниц для покупателя с тысячами
+заказов. При keyset-пагинации задержка не должна расти с номером страницы.
+
+Запуск (нужен локальный PostgreSQL с применёнными миграциями и SESSION_SIGNING_KEYS;
+тестовые заказы создаются и удаляются самим скриптом):
+    DATABASE_URL=postgresql://localhost/eventhub SESSION_SIGNING_KEYS=bench:secret python benchmarks/order_history.py --orders 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import load_function, instrument_db, reset_round_trips, round_trips  # noqa: E402
+
+index = load_function('orders')
+instrument_db(index)
+
+from sessions import issue_token  # noqa: E402
+
+SCHEMA = 't_p613096_greeting_project_36'
+
+def seed(email: str, orders: int) -> None:
+    conn = index.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""WITH new_orders AS (
+                    INSERT INTO {SCHEMA}.orders (order_number, full_name, email, phone, total_amount, status, created_at)
+                    SELECT 'BENCH-' || %s || '-' || n, 'Нагрузочный Тест', %s, '+79990000000', 6500, 'confirmed',
+                           NOW() - make_interval(mins => n)
+                    FROM generate_series(1, %s) AS n
+                    RETURNING id, created_at
+                )
+                INSERT INTO {SCHEMA}.order_items (order_id, created_at, ticket_type_id, event_title, ticket_type, price, quantity)
+                SELECT id, created_at, t.ticket_type_id, t.event_title, t.ticket_type, t.price, 1
+                FROM new_orders, (VALUES ('t1', 'Концерт джазового оркестра', 'VIP', 5000),
+                                         ('t3', 'Концерт джазового оркестра', 'Балкон', 1500))
+                AS t(ticket_type_id, event_title, ticket_type, price)""",
+                (email.split('@')[0], email, orders)
+            )
+        conn.commit()
+    finally:
+        index.release_db_connection(conn)
+
+def cleanup(email: str) -> None:
+    conn = index.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""DELETE FROM {SCHEMA}.order_items WHERE (order_id, created_at) IN
+                (SELECT id, created_at FROM {SCHEMA}.orders WHERE email = %s)""",
+                (email,)
+            )
+            cur.execute(f"DELETE FROM {SCHEMA}.orders WHERE email = %s", (email,))
+        conn.commit()
+    finally:
+        index.release_db_connection(conn)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    email = f'history-{uuid.uuid4().hex[:12]}@example.com'
+    token, _ = issue_token({'id': 0, 'role': 'basic', 'email': email})
+    headers = {'Authorization': f'Bearer {token}'}
+    seed(email, args.orders)
+    try:
+        cursor = None
+        page = 0
+        timings = []
+        while True:
+            query = {'limit': str(args.limit)}
+            if cursor:
+                query['cursor'] = cursor
+            reset_round_trips()
+            started = time.perf_counter()
+            response = index.handler({'httpMethod': 'GET', 'headers': headers, 'queryStringParameters': query}, None)
+            timings.append(((time.perf_counter() - started) * 1000, round_trips()))
+            cursor = json.loads(response['body'])['next_cursor']
+            page += 1
+            if not cursor:
+                break
+    finally:
+        cleanup(email)
+
+    print(f'orders={args.orders} limit={args.limit} pages={page}')
+    for label, n in (('first', 0), ('middle', page // 2), ('last', page - 1)):
+        ms, trips = timings[n]
+        print(f'{label:>6} page {n + 1:>5}: {ms:.3f} ms, round_trips={trips}')
+
+if __name__ == '__main__':
+    main()
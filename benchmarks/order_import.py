@@ -0,0 +1,154 @@
+"""
+Бенчмарк пакетного импорта заказов: N заказов партнера по одному через index.handler
+против одного запроса ?action=import с тем же пакетом в NDJSON. Сравнивает время,
+обращения к БД и пиковую память Python (tracemalloc) — при импорте она не должна
+расти пропорционально числу заказов сверх результата по строкам. Перед замерами
+проверяет распределение остатка: строка, которой не хватило билетов, получает 409,
+а следующие строки поменьше еще принимаются.
+
+Запуск (нужен локальный PostgreSQL с применёнными миграциями и SESSION_SIGNING_KEYS;
+тестовый тип билета без ограничения остатка, заказы и письма удаляются самим скриптом):
+    DATABASE_URL=postgresql://localhost/eventhub SESSION_SIGNING_KEYS=bench:secret python benchmarks/order_import.py
+    python benchmarks/order_import.py --orders 100 1000 10000 --items 3
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from typing import Dict
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import load_function, instrument_db, reset_round_trips, round_trips  # noqa: E402
+
+index = load_function('orders')
+instrument_db(index)
+
+from sessions import issue_token  # noqa: E402
+
+SCHEMA = 't_p613096_greeting_project_36'
+TICKET_ID = 'bench-import'
+LIMITED_TICKET_ID = 'bench-import-limited'
+EMAIL = f'import-bench-{uuid.uuid4().hex[:12]}@example.com'
+
+def sql(statements: list) -> None:
+    conn = index.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            for statement in statements:
+                cur.execute(statement, {'ticket': TICKET_ID, 'limited': LIMITED_TICKET_ID, 'email': EMAIL})
+        conn.commit()
+    finally:
+        index.release_db_connection(conn)
+
+def setup() -> None:
+    sql([
+        f"""INSERT INTO {SCHEMA}.ticket_types (id, event_id, name, price)
+        VALUES (%(ticket)s, '1', 'Бенчмарк', 1), (%(limited)s, '1', 'Бенчмарк, остаток 5', 1)
+        ON CONFLICT (id) DO NOTHING""",
+        f'SELECT {SCHEMA}.set_ticket_capacity(%(limited)s, 5, 2)',
+    ])
+
+def teardown() -> None:
+    cleanup()
+    sql([
+        f'DELETE FROM {SCHEMA}.ticket_inventory_buckets WHERE ticket_type_id = %(limited)s',
+        f'DELETE FROM {SCHEMA}.ticket_types WHERE id = %(limited)s',
+    ])
+
+def cleanup() -> None:
+    sql([
+        f"""DELETE FROM {SCHEMA}.order_items WHERE (order_id, created_at) IN
+        (SELECT id, created_at FROM {SCHEMA}.orders WHERE email = %(email)s)""",
+        f"""DELETE FROM {SCHEMA}.ticket_holds WHERE order_id IN
+        (SELECT id FROM {SCHEMA}.orders WHERE email = %(email)s)""",
+        f"""DELETE FROM {SCHEMA}.order_numbers WHERE order_number IN
+        (SELECT order_number FROM {SCHEMA}.orders WHERE email = %(email)s)""",
+        f'DELETE FROM {SCHEMA}.orders WHERE email = %(email)s',
+        f'DELETE FROM {SCHEMA}.email_outbox WHERE to_email = %(email)s',
+    ])
+
+def order(items: int, ticket_id: str = TICKET_ID, quantity: int = 1) -> Dict:
+    return {
+        'full_name': 'Нагрузочный Тест',
+        'email': EMAIL,
+        'phone': '+79990000000',
+        'cart_items': [{'ticketId': ticket_id, 'quantity': quantity, 'price': 1} for _ in range(items)],
+        'total_amount': items * quantity
+    }
+
+def check_allocation(headers: Dict[str, str]) -> None:
+    """Остаток 5, строки по 3, 3 и 1 билету: вторая не помещается, третья принимается"""
+    event = {
+        'httpMethod': 'POST',
+        'headers': headers,
+        'queryStringParameters': {'action': 'import'},
+        'body': '\n'.join(json.dumps(order(1, LIMITED_TICKET_ID, quantity)) for quantity in (3, 3, 1))
+    }
+    response = index.handler(event, None)
+    assert response['statusCode'] == 200, response['body']
+    statuses = [row['status'] for row in json.loads(response['body'])['results']]
+    assert statuses == [200, 409, 200], statuses
+
+def one_by_one(orders: int, items: int) -> Dict[str, float]:
+    event = {'httpMethod': 'POST', 'body': json.dumps(order(items))}
+    reset_round_trips()
+    started = time.perf_counter()
+    for _ in range(orders):
+        response = index.handler(event, None)
+        assert response['statusCode'] == 200, response['body']
+    return {'seconds': time.perf_counter() - started, 'round_trips': round_trips(), 'peak_kb': 0.0}
+
+def bulk(orders: int, items: int, headers: Dict[str, str]) -> Dict[str, float]:
+    line = json.dumps(order(items))
+    event = {
+        'httpMethod': 'POST',
+        'headers': headers,
+        'queryStringParameters': {'action': 'import'},
+        'body': '\n'.join(line for _ in range(orders))
+    }
+    reset_round_trips()
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = index.handler(event, None)
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert response['statusCode'] == 200, response['body']
+    result = json.loads(response['body'])
+    assert result['created'] == orders, {key: value for key, value in result.items() if key != 'results'}
+    return {'seconds': seconds, 'round_trips': round_trips(), 'peak_kb': peak / 1024}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--items', type=int, default=2, help='строк в каждом заказе')
+    parser.add_argument('--single-limit', type=int, default=1000,
+                        help='не гонять поштучный вариант на пакетах больше этого')
+    args = parser.parse_args()
+
+    token, _ = issue_token({'id': 0, 'role': 'partner', 'email': 'partner@example.com'})
+    headers = {'Authorization': f'Bearer {token}'}
+    setup()
+    try:
+        check_allocation(headers)
+        cleanup()
+        bulk(10, args.items, headers)
+        print(f'{"orders":>7} {"mode":>7} {"seconds":>8} {"orders/s":>9} {"db calls":>9} {"peak KB":>9}')
+        for orders in args.orders:
+            runs = [('import', lambda: bulk(orders, args.items, headers))]
+            if orders <= args.single_limit:
+                runs.insert(0, ('single', lambda: one_by_one(orders, args.items)))
+            for mode, run in runs:
+                result = run()
+                print(f'{orders:>7} {mode:>7} {result["seconds"]:8.2f} {orders / result["seconds"]:9.0f} '
+                      f'{result["round_trips"]:>9} {result["peak_kb"]:9.0f}')
+            cleanup()
+    finally:
+        teardown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Стресс-тест генератора номеров заказов: несколько процессов (экземпляров функции)
+по несколько потоков генерируют номера одновременно, дубликатов быть не должно.
+
+Запуск:
+    python benchmarks/order_number_stress.py [processes] [threads] [per_thread]
+"""
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'backend', 'orders'))
+
+from order_numbers import generate_order_number  # noqa: E402
+
+def instance(threads: int, per_thread: int) -> List[str]:
+    with ThreadPoolExecutor(threads) as pool:
+        chunks = pool.map(lambda _: [generate_order_number() for _ in range(per_thread)], range(threads))
+    return [number for chunk in chunks for number in chunk]
+
+def main() -> int:
+    args = [int(arg) for arg in sys.argv[1:]]
+    processes, threads, per_thread = args + [8, 8, 5000][len(args):]
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(instance, [(threads, per_thread)] * processes)
+    elapsed = time.perf_counter() - started
+    numbers = [number for result in results for number in result]
+    unique = len(set(numbers))
+    print(f'generated={len(numbers)} unique={unique} duplicates={len(numbers) - unique} '
+          f'rate={len(numbers) / elapsed:,.0f}/s max_len={max(map(len, numbers))} sample={numbers[-1]}')
+    return 0 if unique == len(numbers) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
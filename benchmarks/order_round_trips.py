@@ -0,0 +1,58 @@
+"""
+Бенчмарк оформления заказа: число обращений к БД и время в зависимости от размера корзины.
+
+Запуск (нужен локальный PostgreSQL с применёнными миграциями):
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/order_round_trips.py
+"""
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import load_function, instrument_db, make_cart, reset_round_trips, round_trips  # noqa: E402
+
+index = load_function('orders')
+instrument_db(index)
+
+CART_SIZES = [1, 5, 20, 50, 200]
+REPEATS = 20
+
+def make_event(cart_size: int) -> Dict[str, Any]:
+    items = make_cart(cart_size)
+    return {
+        'httpMethod': 'POST',
+        'body': json.dumps({
+            'full_name': 'Бенчмарк',
+            'email': 'bench@example.com',
+            'phone': '+79990000000',
+            'cart_items': items,
+            'total_amount': sum(i['price'] * i['quantity'] for i in items)
+        })
+    }
+
+def run() -> List[Dict[str, Any]]:
+    results = []
+    for size in CART_SIZES:
+        event = make_event(size)
+        trips = 0
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            reset_round_trips()
+            response = index.handler(event, None)
+            assert response['statusCode'] == 200, response['body']
+            trips += round_trips()
+        elapsed = time.perf_counter() - started
+        results.append({
+            'cart_size': size,
+            'round_trips_per_order': trips / REPEATS,
+            'ms_per_order': round(elapsed / REPEATS * 1000, 2)
+        })
+    return results
+
+if __name__ == '__main__':
+    print(f"{'cart_size':>10} {'round_trips':>12} {'ms/order':>10}")
+    for row in run():
+        print(f"{row['cart_size']:>10} {row['round_trips_per_order']:>12.1f} {row['ms_per_order']:>10.2f}")
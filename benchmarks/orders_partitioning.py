@@ -0,0 +1,193 @@
+"""
+Бенчмарк помесячного секционирования заказов: одна и та же выборка из десятков миллионов
+заказов в обычной таблице и в таблице с секциями по месяцам (как в V0015). Сравнивает
+задержку вставки, выборок по email (страница истории), по номеру заказа (с подсказкой
+времени из номера и без нее) и по дню, а также время VACUUM всей таблицы и текущего месяца.
+
+Запуск (нужен PostgreSQL; данные создаются в отдельной схеме и удаляются в конце,
+на 20 млн строк заполнение занимает десятки минут и ~10 ГБ диска):
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/orders_partitioning.py
+    python benchmarks/orders_partitioning.py --rows 2000000 --months 24 --samples 500 --keep
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+import psycopg2
+
+SCHEMA = 'bench_orders_partitioning'
+FILL_BATCH = 1_000_000
+CUSTOMERS = 500_000
+
+COLUMNS = """id BIGINT NOT NULL,
+    order_number VARCHAR(50) NOT NULL,
+    full_name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    total_amount INTEGER NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'confirmed',
+    created_at TIMESTAMP NOT NULL"""
+
+def setup(cur: Any, months: int) -> datetime:
+    first = (datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0) - timedelta(days=31 * (months - 1))).replace(day=1)
+    cur.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+    cur.execute(f'CREATE SCHEMA {SCHEMA}')
+    cur.execute(f'CREATE TABLE {SCHEMA}.heap_orders ({COLUMNS})')
+    cur.execute(f'CREATE TABLE {SCHEMA}.part_orders ({COLUMNS}) PARTITION BY RANGE (created_at)')
+    month = first
+    while month <= datetime.now() + timedelta(days=62):
+        following = (month + timedelta(days=32)).replace(day=1)
+        cur.execute(
+            f"""CREATE TABLE {SCHEMA}.part_orders_p{month:%Y%m} PARTITION OF {SCHEMA}.part_orders
+            FOR VALUES FROM (%s) TO (%s)""",
+            (month, following)
+        )
+        month = following
+    return first
+
+def fill(conn: Any, rows: int, first: datetime) -> None:
+    span_seconds = (datetime.now() - first).total_seconds()
+    with conn.cursor() as cur:
+        for start in range(0, rows, FILL_BATCH):
+            stop = min(rows, start + FILL_BATCH)
+            for table in ('heap_orders', 'part_orders'):
+                cur.execute(
+                    f"""INSERT INTO {SCHEMA}.{table}
+                    (id, order_number, full_name, email, phone, total_amount, created_at)
+                    SELECT n, 'ORD-' || to_char(t, 'YYYYMMDDHH24MISS') || '-BENCH-' || n,
+                           'Нагрузочный Тест', 'user' || (n %% %s) || '@example.com', '+79990000000',
+                           1500 + (n %% 7) * 500, t
+                    FROM (
+                        SELECT n, %s::timestamp + make_interval(secs => n * %s) AS t
+                        FROM generate_series(%s, %s) AS n
+                    ) s""",
+                    (CUSTOMERS, first, span_seconds / rows, start + 1, stop)
+                )
+            conn.commit()
+            print(f'  filled {stop:,} / {rows:,}')
+        for table in ('heap_orders', 'part_orders'):
+            key = 'id' if table == 'heap_orders' else 'id, created_at'
+            number = 'order_number' if table == 'heap_orders' else 'order_number, created_at'
+            cur.execute(f'ALTER TABLE {SCHEMA}.{table} ADD PRIMARY KEY ({key})')
+            cur.execute(f'ALTER TABLE {SCHEMA}.{table} ADD UNIQUE ({number})')
+            cur.execute(f'CREATE INDEX ON {SCHEMA}.{table} (email, created_at DESC, id DESC)')
+            cur.execute(f'ANALYZE {SCHEMA}.{table}')
+        conn.commit()
+
+def latencies(conn: Any, samples: int, query: Callable[[Any], None]) -> Dict[str, float]:
+    timings: List[float] = []
+    with conn.cursor() as cur:
+        for _ in range(samples):
+            started = time.perf_counter()
+            query(cur)
+            conn.commit()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {'p50': statistics.median(timings), 'p99': timings[int(len(timings) * 0.99) - 1]}
+
+def measure(conn: Any, table: str, rows: int, samples: int, first: datetime) -> Dict[str, Dict[str, float]]:
+    span_seconds = (datetime.now() - first).total_seconds()
+    next_id = iter(range(rows + 1, rows + 10 * samples))
+
+    def created_at(n: int) -> datetime:
+        return first + timedelta(seconds=n * span_seconds / rows)
+
+    def insert(cur: Any) -> None:
+        n = next(next_id)
+        cur.execute(
+            f"""INSERT INTO {SCHEMA}.{table} (id, order_number, full_name, email, phone, total_amount, created_at)
+            VALUES (%s, %s, 'Нагрузочный Тест', %s, '+79990000000', 1500, NOW())""",
+            (n, f'ORD-{datetime.now():%Y%m%d%H%M%S}-BENCH-{n}', f'user{n % CUSTOMERS}@example.com')
+        )
+
+    def by_email(cur: Any) -> None:
+        cur.execute(
+            f"""SELECT * FROM {SCHEMA}.{table} WHERE email = %s
+            ORDER BY created_at DESC, id DESC LIMIT 21""",
+            (f'user{random.randrange(CUSTOMERS)}@example.com',)
+        )
+        cur.fetchall()
+
+    with conn.cursor() as cur:
+        cur.execute(
+            f'SELECT order_number FROM {SCHEMA}.heap_orders WHERE id = ANY(%s)',
+            ([random.randint(1, rows) for _ in range(samples)],)
+        )
+        numbers = [row[0] for row in cur.fetchall()]
+    conn.commit()
+
+    def by_number(cur: Any) -> None:
+        cur.execute(f'SELECT * FROM {SCHEMA}.{table} WHERE order_number = %s', (random.choice(numbers),))
+        cur.fetchall()
+
+    def by_number_hinted(cur: Any) -> None:
+        # как history.get_order: время выдачи из номера ORD-<время>-..., окно в сутки
+        number = random.choice(numbers)
+        issued_at = datetime.strptime(number.split('-')[1], '%Y%m%d%H%M%S')
+        cur.execute(
+            f"""SELECT * FROM {SCHEMA}.{table} WHERE order_number = %s
+            AND created_at >= %s AND created_at < %s""",
+            (number, issued_at - timedelta(days=1), issued_at + timedelta(days=1))
+        )
+        cur.fetchall()
+
+    def by_day(cur: Any) -> None:
+        day = created_at(random.randint(1, rows)).replace(hour=0, minute=0, second=0, microsecond=0)
+        cur.execute(
+            f'SELECT COUNT(*), SUM(total_amount) FROM {SCHEMA}.{table} WHERE created_at >= %s AND created_at < %s',
+            (day, day + timedelta(days=1))
+        )
+        cur.fetchall()
+
+    result = {
+        'insert': latencies(conn, samples, insert),
+        'by email, page of 20': latencies(conn, samples, by_email),
+        'by order number': latencies(conn, samples, by_number),
+        'by order number + time hint': latencies(conn, samples, by_number_hinted),
+        'one day total': latencies(conn, max(10, samples // 10), by_day),
+    }
+
+    conn.autocommit = True
+    vacuum_target = table if table == 'heap_orders' else f'part_orders_p{datetime.now():%Y%m}'
+    with conn.cursor() as cur:
+        started = time.perf_counter()
+        cur.execute(f'VACUUM ANALYZE {SCHEMA}.{vacuum_target}')
+        vacuum_ms = (time.perf_counter() - started) * 1000
+    conn.autocommit = False
+    result[f'VACUUM {vacuum_target}'] = {'p50': vacuum_ms, 'p99': vacuum_ms}
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20_000_000)
+    parser.add_argument('--months', type=int, default=36)
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--keep', action='store_true', help='не удалять схему с данными после замера')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with conn.cursor() as cur:
+            first = setup(cur, args.months)
+        conn.commit()
+        print(f'filling {args.rows:,} orders over {args.months} months into both tables')
+        fill(conn, args.rows, first)
+
+        for table in ('heap_orders', 'part_orders'):
+            print(f'\n== {table}')
+            for name, timing in measure(conn, table, args.rows, args.samples, first).items():
+                print(f'  {name:32} p50 {timing["p50"]:9.2f} ms   p99 {timing["p99"]:9.2f} ms')
+    finally:
+        if not args.keep:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute(f'DROP SCHEMA IF EXISTS {SCHEMA} CASCADE')
+            conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Калибровка стоимости scrypt: подбирает наибольшее N, при котором один хеш укладывается
+в заданный бюджет задержки на этой машине, и печатает значения для окружения функции auth.
+
+    python benchmarks/password_hash_calibration.py --target-ms 100
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend', 'auth'))
+
+from passwords import SCRYPT_P, SCRYPT_R, ScryptHasher  # noqa: E402
+
+def median_ms(hasher: ScryptHasher, samples: int) -> float:
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash('calibration-password')
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target-ms', type=float, default=100.0, help='бюджет на один хеш')
+    parser.add_argument('--r', type=int, default=SCRYPT_R)
+    parser.add_argument('--p', type=int, default=SCRYPT_P)
+    parser.add_argument('--samples', type=int, default=5)
+    parser.add_argument('--min-log-n', type=int, default=12)
+    parser.add_argument('--max-log-n', type=int, default=20)
+    args = parser.parse_args()
+
+    chosen = None
+    print(f"{'N':>9} {'memory MiB':>11} {'median ms':>10}")
+    for log_n in range(args.min_log_n, args.max_log_n + 1):
+        n = 2 ** log_n
+        ms = median_ms(ScryptHasher(n, args.r, args.p), args.samples)
+        print(f'{n:>9} {128 * n * args.r / 2 ** 20:>11.0f} {ms:>10.1f}')
+        if ms > args.target_ms:
+            break
+        chosen = n
+
+    if chosen is None:
+        print(f'Даже N=2^{args.min_log_n} не укладывается в {args.target_ms} мс')
+        return 1
+    print(f'PASSWORD_SCRYPT_N={chosen} PASSWORD_SCRYPT_R={args.r} PASSWORD_SCRYPT_P={args.p}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Бенчмарк QR-кодов билетов: кодирование PNG для групповых заказов в текущем процессе
+и в пуле процессов рассыльщика (mailer/qr_images), повторная отправка из кеша по хешу
+кода (только поиск, без кодирования) и проверка подписи кода на входе (orders/tickets).
+
+Запуск (нужен segno из requirements.txt рассыльщика; БД не нужна, кеш моделируется словарем):
+    python benchmarks/qr_tickets.py
+    python benchmarks/qr_tickets.py --tickets 10 100 500 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickets', type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--scans', type=int, default=100_000)
+    args = parser.parse_args()
+
+    # настройки читаются при импорте модулей
+    os.environ.setdefault('TICKET_SIGNING_KEYS', 'bench:secret')
+    os.environ['QR_POOL_WORKERS'] = str(args.workers)
+    os.environ['QR_POOL_MIN_BATCH'] = '1'
+    sys.path.insert(0, os.path.join(ROOT, 'backend', 'mailer'))
+    sys.path.insert(0, os.path.join(ROOT, 'backend', 'orders'))
+    import qr_images
+    import tickets
+
+    # прогрев: импорт segno и запуск процессов пула не входят в замер
+    qr_images.encode_many([tickets.sign('ORD-00000000000000-BENCH-0000', 0, n) for n in range(args.workers * 2)])
+
+    print(f'{"tickets":>8} {"inline ms":>10} {"pool ms":>9} {"speedup":>8} {"cached ms":>10} {"KB":>7}')
+    for count in args.tickets:
+        lines = [{'event_title': 'Бенчмарк', 'ticket_type': 'Группа', 'quantity': count}]
+        codes = [code['code'] for code in tickets.ticket_codes(f'ORD-{time.strftime("%Y%m%d%H%M%S")}-BENCH-{count:04d}', lines)]
+
+        started = time.perf_counter()
+        inline = [qr_images.encode_png(code) for code in codes]
+        inline_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        pooled = qr_images.encode_many(codes)
+        pool_ms = (time.perf_counter() - started) * 1000
+        assert pooled == inline
+
+        cache = {qr_images.digest(code): png for code, png in zip(codes, pooled)}
+        started = time.perf_counter()
+        resent = [cache[qr_images.digest(code)] for code in codes]
+        cached_ms = (time.perf_counter() - started) * 1000
+        assert resent == inline
+
+        size_kb = sum(len(png) for png in inline) / 1024
+        print(f'{count:>8} {inline_ms:10.1f} {pool_ms:9.1f} {inline_ms / pool_ms:7.1f}x {cached_ms:10.3f} {size_kb:7.0f}')
+
+    code = tickets.sign('ORD-20250101120000-BENCH-0001', 0, 0)
+    started = time.perf_counter()
+    for _ in range(args.scans):
+        tickets.verify(code)
+    print(f'\nverify signature: {(time.perf_counter() - started) / args.scans * 1e6:.1f} us per scan (before the DB lookup)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Бенчмарк проверки сессии: подписанный токен против поиска пользователя в БД на каждый запрос.
+
+Запуск:
+    SESSION_SIGNING_KEYS=bench:secret python benchmarks/session_tokens.py
+    DATABASE_URL=postgresql://localhost/eventhub SESSION_SIGNING_KEYS=bench:secret python benchmarks/session_tokens.py
+
+Без DATABASE_URL измеряется только проверка токена (список отзыва считается свежим).
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import load_function  # noqa: E402
+
+index = load_function('auth')
+
+import sessions  # noqa: E402
+
+REPEATS = 20000
+
+def per_call_us(fn, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1e6
+
+def main() -> None:
+    token, _ = sessions.issue_token({'id': 1, 'role': 'admin', 'email': 'admin@eventhub.ru'})
+    event = {'headers': {'Authorization': f'Bearer {token}'}}
+    if not os.environ.get('DATABASE_URL'):
+        sessions.revocations._loaded_at = float('inf')
+
+    print(f"token verify: {per_call_us(lambda: sessions.authenticate(event), REPEATS):.2f} us/call "
+          f"(revocation refreshes: {sessions.revocations.stats['refreshes']})")
+
+    if os.environ.get('DATABASE_URL'):
+        conn = index.get_db_connection()
+        cur = conn.cursor()
+
+        def lookup() -> None:
+            cur.execute(
+                """SELECT id, role FROM t_p613096_greeting_project_36.users WHERE id = %s""",
+                (1,)
+            )
+            cur.fetchone()
+
+        try:
+            print(f'user lookup:  {per_call_us(lookup, REPEATS // 10):.2f} us/call')
+        finally:
+            cur.close()
+            conn.rollback()
+            index.release_db_connection(conn)
+
+if __name__ == '__main__':
+    main()
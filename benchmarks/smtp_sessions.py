@@ -0,0 +1,127 @@
+"""
+Проверка SMTP-транспорта рассыльщика (mailer/smtp_transport) на локальной заглушке:
+пачка писем уходит в одной сессии, сессия меняется после max_messages_per_session,
+оборванное сервером соединение переоткрывается без потери письма, лимит писем в
+секунду общий для всех транспортов одного релея. В конце — время пачки в одной сессии
+против нового соединения на каждое письмо.
+
+Запуск (БД и внешний SMTP не нужны; при нарушении проверки код возврата 1):
+    python benchmarks/smtp_sessions.py
+    python benchmarks/smtp_sessions.py --messages 500 --rate 50
+"""
+import argparse
+import os
+import sys
+import time
+from email.mime.text import MIMEText
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import BACKEND, SmtpStandIn  # noqa: E402
+
+sys.path.insert(0, os.path.join(BACKEND, 'mailer'))
+
+from smtp_transport import SmtpTransport  # noqa: E402
+
+def message(n: int) -> MIMEText:
+    msg = MIMEText(f'Письмо {n}', 'plain', 'utf-8')
+    msg['From'] = 'bench@example.com'
+    msg['To'] = f'user-{n}@example.com'
+    msg['Subject'] = f'Проверка {n}'
+    return msg
+
+def transport(stand_in: SmtpStandIn, **kwargs: float) -> SmtpTransport:
+    return SmtpTransport('127.0.0.1', stand_in.port, use_tls=False, **kwargs)
+
+def check_one_session(count: int) -> str:
+    stand_in = SmtpStandIn()
+    smtp = transport(stand_in, max_messages_per_session=count)
+    results = smtp.send_many([message(n) for n in range(count)])
+    smtp.close()
+    stand_in.stop()
+    assert results == [None] * count, results
+    assert stand_in.messages == count, stand_in.messages
+    assert stand_in.sessions == 1 and smtp.stats['sessions'] == 1, (stand_in.sessions, smtp.stats)
+    return f'{count} писем, сессий: {stand_in.sessions}'
+
+def check_rotation(count: int, per_session: int) -> str:
+    stand_in = SmtpStandIn()
+    smtp = transport(stand_in, max_messages_per_session=per_session)
+    results = smtp.send_many([message(n) for n in range(count)])
+    smtp.close()
+    stand_in.stop()
+    expected = -(-count // per_session)
+    assert results == [None] * count, results
+    assert stand_in.sessions == expected == smtp.stats['sessions'], (stand_in.sessions, expected, smtp.stats)
+    return f'{count} писем по {per_session} на сессию, сессий: {stand_in.sessions}'
+
+def check_reconnect() -> str:
+    stand_in = SmtpStandIn()
+    smtp = transport(stand_in)
+    smtp.send(message(0))
+    stand_in.drop_connections()
+    time.sleep(0.05)
+    smtp.send(message(1))
+    smtp.close()
+    stand_in.stop()
+    assert stand_in.messages == 2, stand_in.messages
+    assert smtp.stats['reconnects'] == 1 and smtp.stats['errors'] == 0, smtp.stats
+    return f'после обрыва: переподключений {smtp.stats["reconnects"]}, писем {stand_in.messages}'
+
+def check_rate_limit(count: int, rate: float) -> str:
+    stand_in = SmtpStandIn()
+    # два транспорта к одному релею делят один лимитер
+    first, second = transport(stand_in, rate_limit=rate), transport(stand_in, rate_limit=rate)
+    assert first.limiter is second.limiter
+    started = time.perf_counter()
+    for n in range(count):
+        (first if n % 2 else second).send(message(n))
+    elapsed = time.perf_counter() - started
+    first.close()
+    second.close()
+    stand_in.stop()
+    minimum = (count - 1) / rate
+    assert elapsed >= minimum * 0.95, (elapsed, minimum)
+    return f'{count} писем при {rate:g}/с: {elapsed:.2f} с (не меньше {minimum:.2f} с)'
+
+def timed_send(count: int, per_session: int) -> Tuple[float, int]:
+    stand_in = SmtpStandIn()
+    smtp = transport(stand_in, max_messages_per_session=per_session)
+    messages = [message(n) for n in range(count)]
+    started = time.perf_counter()
+    smtp.send_many(messages)
+    elapsed = time.perf_counter() - started
+    smtp.close()
+    stand_in.stop()
+    return elapsed, stand_in.sessions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--per-session', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=40.0, help='писем в секунду для проверки лимита')
+    args = parser.parse_args()
+
+    checks: List[Tuple[str, Callable[[], str]]] = [
+        ('send_many в одной сессии', lambda: check_one_session(args.messages)),
+        ('смена сессии', lambda: check_rotation(args.messages, args.per_session)),
+        ('переподключение', check_reconnect),
+        ('лимит релея', lambda: check_rate_limit(20, args.rate)),
+    ]
+    failed = 0
+    for name, check in checks:
+        try:
+            print(f'OK   {name}: {check()}')
+        except AssertionError as e:
+            failed += 1
+            print(f'FAIL {name}: {e}')
+
+    print(f'\n{"mode":>16} {"sessions":>9} {"ms":>9} {"ms/email":>9}')
+    for mode, per_session in [('one session', args.messages), ('per message', 1)]:
+        elapsed, sessions = timed_send(args.messages, per_session)
+        print(f'{mode:>16} {sessions:>9} {elapsed * 1000:9.1f} {elapsed * 1000 / args.messages:9.3f}')
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Фикстура тестового окружения: событие и тип билета без строк остатка (неограниченный),
+на которые ссылаются заказы из tests.json функции orders. Миграциями в каталог не попадает:
+там такой билет мог бы купить кто угодно. Стенд benchmarks/load.py создает и удаляет ее
+сам; перед прогоном tests.json на тестовом окружении — этим скриптом.
+
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/test_fixtures.py setup
+    DATABASE_URL=postgresql://localhost/eventhub python benchmarks/test_fixtures.py teardown
+"""
+import argparse
+import os
+from typing import Any
+
+SCHEMA = 't_p613096_greeting_project_36'
+EVENT_ID = 'tests'
+TICKET_ID = 'tests-unlimited'
+
+def setup(cur: Any) -> None:
+    cur.execute(
+        f"""INSERT INTO {SCHEMA}.events (id, title, event_date, location, category)
+        VALUES (%s, 'Тестовое событие', 'без даты', 'нет', 'Тесты') ON CONFLICT (id) DO NOTHING""",
+        (EVENT_ID,)
+    )
+    cur.execute(
+        f"""INSERT INTO {SCHEMA}.ticket_types (id, event_id, name, price)
+        VALUES (%s, %s, 'Без ограничения остатка', 5000) ON CONFLICT (id) DO NOTHING""",
+        (TICKET_ID, EVENT_ID)
+    )
+    # без строк остатка тип билета не ограничен (V0009)
+    cur.execute(f'DELETE FROM {SCHEMA}.ticket_inventory_buckets WHERE ticket_type_id = %s', (TICKET_ID,))
+
+def teardown(cur: Any) -> None:
+    cur.execute(f'DELETE FROM {SCHEMA}.ticket_types WHERE id = %s', (TICKET_ID,))
+    cur.execute(f'DELETE FROM {SCHEMA}.events WHERE id = %s', (EVENT_ID,))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['setup', 'teardown'])
+    args = parser.parse_args()
+
+    import psycopg2
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with conn.cursor() as cur:
+            (setup if args.command == 'setup' else teardown)(cur)
+        conn.commit()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+CREATE INDEX IF NOT EXISTS idx_verification_codes_lookup 
+ON t_p613096_greeting_project_36.verification_codes(email, code_type, code, created_at DESC) 
+WHERE used = FALSE;
+
+CREATE INDEX IF NOT EXISTS idx_verification_codes_expires_at 
+ON t_p613096_greeting_project_36.verification_codes(expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_verification_codes_used 
+ON t_p613096_greeting_project_36.verification_codes(id) 
+WHERE used = TRUE;
+
+DROP INDEX IF EXISTS t_p613096_greeting_project_36.idx_verification_codes_email;
+DROP INDEX IF EXISTS t_p613096_greeting_project_36.idx_verification_codes_code;
@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.idempotency_keys (
+    idempotency_key VARCHAR(255) PRIMARY KEY,
+    request_hash VARCHAR(64) NOT NULL,
+    response_status INTEGER NOT NULL,
+    response_body TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at 
+ON t_p613096_greeting_project_36.idempotency_keys(expires_at);
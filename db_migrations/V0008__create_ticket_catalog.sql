@@ -0,0 +1,61 @@
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.events (
+    id VARCHAR(50) PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    event_date VARCHAR(100) NOT NULL,
+    location VARCHAR(255) NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.ticket_types (
+    id VARCHAR(50) PRIMARY KEY,
+    event_id VARCHAR(50) NOT NULL REFERENCES t_p613096_greeting_project_36.events(id),
+    name VARCHAR(100) NOT NULL,
+    price INTEGER NOT NULL CHECK (price >= 0),
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ticket_types_event_id ON t_p613096_greeting_project_36.ticket_types(event_id);
+
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.catalog_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version BIGINT NOT NULL
+);
+
+INSERT INTO t_p613096_greeting_project_36.catalog_version (id, version) VALUES (1, 1)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.bump_catalog_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE t_p613096_greeting_project_36.catalog_version SET version = version + 1 WHERE id = 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_events_catalog_version
+AFTER INSERT OR UPDATE OR DELETE ON t_p613096_greeting_project_36.events
+FOR EACH STATEMENT EXECUTE FUNCTION t_p613096_greeting_project_36.bump_catalog_version();
+
+CREATE TRIGGER trg_ticket_types_catalog_version
+AFTER INSERT OR UPDATE OR DELETE ON t_p613096_greeting_project_36.ticket_types
+FOR EACH STATEMENT EXECUTE FUNCTION t_p613096_greeting_project_36.bump_catalog_version();
+
+INSERT INTO t_p613096_greeting_project_36.events (id, title, event_date, location, category) VALUES
+('1', 'Концерт джазового оркестра', '15 января 2025', 'Концертный зал "Филармония"', 'Музыка'),
+('2', 'Театральная постановка "Гамлет"', '20 января 2025', 'Драматический театр', 'Театр'),
+('3', 'Выставка современного искусства', '25 января 2025', 'Музей искусств', 'Искусство')
+ON CONFLICT (id) DO NOTHING;
+
+INSERT INTO t_p613096_greeting_project_36.ticket_types (id, event_id, name, price) VALUES
+('t1', '1', 'VIP', 5000),
+('t2', '1', 'Партер', 3000),
+('t3', '1', 'Балкон', 1500),
+('t4', '2', 'Премиум', 4000),
+('t5', '2', 'Стандарт', 2000),
+('t6', '3', 'Входной билет', 800)
+ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE t_p613096_greeting_project_36.order_items 
+ADD COLUMN IF NOT EXISTS ticket_type_id VARCHAR(50);
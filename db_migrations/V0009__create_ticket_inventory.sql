@@ -0,0 +1,117 @@
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.ticket_inventory_buckets (
+    ticket_type_id VARCHAR(50) NOT NULL REFERENCES t_p613096_greeting_project_36.ticket_types(id),
+    bucket SMALLINT NOT NULL,
+    remaining INTEGER NOT NULL CHECK (remaining >= 0),
+    PRIMARY KEY (ticket_type_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.ticket_holds (
+    id BIGSERIAL PRIMARY KEY,
+    order_id INTEGER NOT NULL,
+    ticket_type_id VARCHAR(50) NOT NULL,
+    bucket SMALLINT NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    status VARCHAR(20) NOT NULL,
+    expires_at TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_ticket_holds_order_id ON t_p613096_greeting_project_36.ticket_holds(order_id);
+CREATE INDEX IF NOT EXISTS idx_ticket_holds_expiring
+ON t_p613096_greeting_project_36.ticket_holds(expires_at)
+WHERE status = 'held';
+
+-- Остаток билета делится на несколько строк-корзин, чтобы покупатели одного
+-- популярного события не выстраивались в очередь за блокировкой одной строки.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.set_ticket_capacity(
+    p_ticket_type_id VARCHAR, p_capacity INTEGER, p_buckets INTEGER
+) RETURNS VOID AS $$
+BEGIN
+    DELETE FROM t_p613096_greeting_project_36.ticket_inventory_buckets WHERE ticket_type_id = p_ticket_type_id;
+    INSERT INTO t_p613096_greeting_project_36.ticket_inventory_buckets (ticket_type_id, bucket, remaining)
+    SELECT p_ticket_type_id, b, p_capacity / p_buckets + CASE WHEN b < p_capacity % p_buckets THEN 1 ELSE 0 END
+    FROM generate_series(0, p_buckets - 1) AS b;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Резервирует билеты заказа. Сначала берутся свободные корзины (SKIP LOCKED) со
+-- случайной стартовой позиции, затем, если их не хватило, занятые — с ожиданием.
+-- Нехватка билетов прерывает транзакцию с кодом EH001, поэтому перепродажа невозможна.
+-- Типы билетов без строк остатка считаются неограниченными.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.reserve_tickets(
+    p_order_id INTEGER, p_items JSONB, p_status VARCHAR, p_expires_at TIMESTAMP
+) RETURNS INTEGER AS $$
+DECLARE
+    v_item RECORD;
+    v_bucket RECORD;
+    v_need INTEGER;
+    v_take INTEGER;
+    v_buckets INTEGER;
+    v_offset INTEGER;
+    v_reserved INTEGER := 0;
+BEGIN
+    FOR v_item IN
+        SELECT ticket_type_id, SUM(quantity)::INTEGER AS quantity
+        FROM jsonb_to_recordset(p_items) AS x(ticket_type_id VARCHAR(50), quantity INTEGER)
+        GROUP BY ticket_type_id
+        ORDER BY ticket_type_id
+    LOOP
+        SELECT COUNT(*) INTO v_buckets
+        FROM t_p613096_greeting_project_36.ticket_inventory_buckets
+        WHERE ticket_type_id = v_item.ticket_type_id;
+        CONTINUE WHEN v_buckets = 0;
+
+        v_need := v_item.quantity;
+        v_offset := floor(random() * v_buckets)::INTEGER;
+
+        FOR v_bucket IN
+            SELECT bucket, remaining FROM t_p613096_greeting_project_36.ticket_inventory_buckets
+            WHERE ticket_type_id = v_item.ticket_type_id AND remaining > 0
+            ORDER BY (bucket + v_offset) % v_buckets
+            FOR UPDATE SKIP LOCKED
+        LOOP
+            v_take := LEAST(v_need, v_bucket.remaining);
+            UPDATE t_p613096_greeting_project_36.ticket_inventory_buckets
+            SET remaining = remaining - v_take
+            WHERE ticket_type_id = v_item.ticket_type_id AND bucket = v_bucket.bucket;
+            INSERT INTO t_p613096_greeting_project_36.ticket_holds
+            (order_id, ticket_type_id, bucket, quantity, status, expires_at)
+            VALUES (p_order_id, v_item.ticket_type_id, v_bucket.bucket, v_take, p_status, p_expires_at);
+            v_need := v_need - v_take;
+            EXIT WHEN v_need = 0;
+        END LOOP;
+
+        IF v_need > 0 THEN
+            FOR v_bucket IN
+                SELECT bucket, remaining FROM t_p613096_greeting_project_36.ticket_inventory_buckets
+                WHERE ticket_type_id = v_item.ticket_type_id AND remaining > 0
+                ORDER BY bucket
+                FOR UPDATE
+            LOOP
+                v_take := LEAST(v_need, v_bucket.remaining);
+                UPDATE t_p613096_greeting_project_36.ticket_inventory_buckets
+                SET remaining = remaining - v_take
+                WHERE ticket_type_id = v_item.ticket_type_id AND bucket = v_bucket.bucket;
+                INSERT INTO t_p613096_greeting_project_36.ticket_holds
+                (order_id, ticket_type_id, bucket, quantity, status, expires_at)
+                VALUES (p_order_id, v_item.ticket_type_id, v_bucket.bucket, v_take, p_status, p_expires_at);
+                v_need := v_need - v_take;
+                EXIT WHEN v_need = 0;
+            END LOOP;
+        END IF;
+
+        IF v_need > 0 THEN
+            RAISE EXCEPTION 'sold_out:%', v_item.ticket_type_id USING ERRCODE = 'EH001';
+        END IF;
+        v_reserved := v_reserved + v_item.quantity;
+    END LOOP;
+    RETURN v_reserved;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT t_p613096_greeting_project_36.set_ticket_capacity('t1', 20, 4);
+SELECT t_p613096_greeting_project_36.set_ticket_capacity('t2', 50, 8);
+SELECT t_p613096_greeting_project_36.set_ticket_capacity('t3', 100, 8);
+SELECT t_p613096_greeting_project_36.set_ticket_capacity('t4', 30, 4);
+SELECT t_p613096_greeting_project_36.set_ticket_capacity('t5', 80, 8);
+SELECT t_p613096_greeting_project_36.set_ticket_capacity('t6', 200, 16);
@@ -0,0 +1,6 @@
+-- История заказов покупателя читается страницами по (created_at, id) от новых к старым;
+-- составной индекс покрывает и фильтр по email, и keyset-условие, и сортировку.
+CREATE INDEX IF NOT EXISTS idx_orders_email_created_at
+ON t_p613096_greeting_project_36.orders(email, created_at DESC, id DESC);
+
+DROP INDEX IF EXISTS t_p613096_greeting_project_36.idx_orders_email;
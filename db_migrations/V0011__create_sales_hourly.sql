@@ -0,0 +1,21 @@
+-- Почасовые итоги продаж по мероприятиям и типам билетов для отчетов администратора.
+-- Заполняются задачей обслуживания refresh_sales_aggregates порциями заказов после
+-- водяной отметки, поэтому отчет читает сотни строк независимо от числа заказов.
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.sales_hourly (
+    hour TIMESTAMP NOT NULL,
+    event_title VARCHAR(255) NOT NULL,
+    ticket_type VARCHAR(100) NOT NULL,
+    orders INTEGER NOT NULL DEFAULT 0,
+    tickets INTEGER NOT NULL DEFAULT 0,
+    revenue BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (hour, event_title, ticket_type)
+);
+
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.sales_watermark (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    last_order_id INTEGER NOT NULL DEFAULT 0,
+    refreshed_at TIMESTAMP
+);
+
+INSERT INTO t_p613096_greeting_project_36.sales_watermark (id) VALUES (1)
+ON CONFLICT (id) DO NOTHING;
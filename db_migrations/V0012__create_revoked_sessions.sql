@@ -0,0 +1,10 @@
+-- Токены сессий проверяются без обращения к БД; здесь хранятся только отозванные до
+-- истечения (выход из аккаунта). Строки с прошедшим expires_at удаляет обслуживание.
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.revoked_sessions (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at TIMESTAMP NOT NULL,
+    revoked_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_revoked_sessions_expires_at
+ON t_p613096_greeting_project_36.revoked_sessions(expires_at);
@@ -0,0 +1,12 @@
+-- Общие для всех экземпляров функции auth ведра ограничения частоты запросов.
+-- UNLOGGED: после сбоя сервера таблица очищается, что для лимитов допустимо и
+-- избавляет каждую проверку от записи в WAL.
+CREATE UNLOGGED TABLE IF NOT EXISTS t_p613096_greeting_project_36.rate_limit_buckets (
+    key VARCHAR(320) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    rate DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rate_limit_buckets_updated_at
+ON t_p613096_greeting_project_36.rate_limit_buckets(updated_at);
@@ -0,0 +1,3 @@
+-- Текстовая версия письма (text/plain), отправляется вместе с HTML как multipart/alternative
+ALTER TABLE t_p613096_greeting_project_36.email_outbox
+ADD COLUMN IF NOT EXISTS body_text TEXT;
@@ -0,0 +1,117 @@
+-- Заказы и их позиции разбиваются на помесячные секции по created_at заказа: индексы,
+-- VACUUM и выборки по email или дате работают с горячими месяцами, а холодные месяцы
+-- выгружаются в архив и отсоединяются целиком (задача обслуживания archive_order_partitions).
+-- Позиции получают created_at своего заказа, чтобы лежать в секции того же месяца.
+ALTER TABLE t_p613096_greeting_project_36.orders RENAME TO orders_unpartitioned;
+ALTER TABLE t_p613096_greeting_project_36.order_items RENAME TO order_items_unpartitioned;
+
+CREATE TABLE t_p613096_greeting_project_36.orders (
+    id INTEGER NOT NULL DEFAULT nextval('t_p613096_greeting_project_36.orders_id_seq'),
+    order_number VARCHAR(50) NOT NULL,
+    full_name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    phone VARCHAR(50) NOT NULL,
+    total_amount INTEGER NOT NULL,
+    status VARCHAR(50) NOT NULL DEFAULT 'confirmed',
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE t_p613096_greeting_project_36.order_items (
+    id INTEGER NOT NULL DEFAULT nextval('t_p613096_greeting_project_36.order_items_id_seq'),
+    order_id INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    event_title VARCHAR(255) NOT NULL,
+    ticket_type VARCHAR(100) NOT NULL,
+    price INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    ticket_type_id VARCHAR(50)
+) PARTITION BY RANGE (created_at);
+
+-- Секция по умолчанию страхует от ошибок вставки, если задача обслуживания давно не
+-- создавала секции впрок; в нормальной работе она пуста.
+CREATE TABLE t_p613096_greeting_project_36.orders_default
+PARTITION OF t_p613096_greeting_project_36.orders DEFAULT;
+CREATE TABLE t_p613096_greeting_project_36.order_items_default
+PARTITION OF t_p613096_greeting_project_36.order_items DEFAULT;
+
+-- Создает недостающие секции orders_pYYYYMM и order_items_pYYYYMM для месяцев
+-- с p_from по p_to включительно; возвращает число созданных месяцев.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.create_order_partitions(
+    p_from DATE, p_to DATE
+) RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from)::DATE;
+    v_suffix TEXT;
+    v_created INTEGER := 0;
+BEGIN
+    WHILE v_month <= p_to LOOP
+        v_suffix := to_char(v_month, 'YYYYMM');
+        IF to_regclass('t_p613096_greeting_project_36.orders_p' || v_suffix) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE t_p613096_greeting_project_36.%I PARTITION OF t_p613096_greeting_project_36.orders FOR VALUES FROM (%L) TO (%L)',
+                'orders_p' || v_suffix, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            EXECUTE format(
+                'CREATE TABLE t_p613096_greeting_project_36.%I PARTITION OF t_p613096_greeting_project_36.order_items FOR VALUES FROM (%L) TO (%L)',
+                'order_items_p' || v_suffix, v_month, (v_month + INTERVAL '1 month')::DATE
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := (v_month + INTERVAL '1 month')::DATE;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT t_p613096_greeting_project_36.create_order_partitions(
+    COALESCE((SELECT MIN(created_at) FROM t_p613096_greeting_project_36.orders_unpartitioned), NOW())::DATE,
+    (NOW() + INTERVAL '3 months')::DATE
+);
+
+INSERT INTO t_p613096_greeting_project_36.orders
+(id, order_number, full_name, email, phone, total_amount, status, created_at)
+SELECT id, order_number, full_name, email, phone, total_amount, status, created_at
+FROM t_p613096_greeting_project_36.orders_unpartitioned;
+
+INSERT INTO t_p613096_greeting_project_36.order_items
+(id, order_id, created_at, event_title, ticket_type, price, quantity, ticket_type_id)
+SELECT oi.id, oi.order_id, o.created_at, oi.event_title, oi.ticket_type, oi.price, oi.quantity, oi.ticket_type_id
+FROM t_p613096_greeting_project_36.order_items_unpartitioned oi
+JOIN t_p613096_greeting_project_36.orders_unpartitioned o ON o.id = oi.order_id;
+
+ALTER SEQUENCE t_p613096_greeting_project_36.orders_id_seq OWNED BY NONE;
+ALTER SEQUENCE t_p613096_greeting_project_36.order_items_id_seq OWNED BY NONE;
+DROP TABLE t_p613096_greeting_project_36.order_items_unpartitioned;
+DROP TABLE t_p613096_greeting_project_36.orders_unpartitioned;
+ALTER SEQUENCE t_p613096_greeting_project_36.orders_id_seq OWNED BY t_p613096_greeting_project_36.orders.id;
+ALTER SEQUENCE t_p613096_greeting_project_36.order_items_id_seq OWNED BY t_p613096_greeting_project_36.order_items.id;
+
+-- Уникальность на секционированной таблице возможна только вместе с ключом секционирования.
+-- Номер заказа содержит время создания и экземпляр функции, так что (order_number, created_at)
+-- на практике так же уникален, как и сам номер.
+ALTER TABLE t_p613096_greeting_project_36.orders ADD PRIMARY KEY (id, created_at);
+ALTER TABLE t_p613096_greeting_project_36.orders ADD UNIQUE (order_number, created_at);
+ALTER TABLE t_p613096_greeting_project_36.order_items ADD PRIMARY KEY (id, created_at);
+ALTER TABLE t_p613096_greeting_project_36.order_items ADD CONSTRAINT fk_order
+FOREIGN KEY (order_id, created_at) REFERENCES t_p613096_greeting_project_36.orders(id, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_orders_email_created_at
+ON t_p613096_greeting_project_36.orders(email, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_id
+ON t_p613096_greeting_project_36.order_items(order_id);
+
+-- Архив отсоединенных месяцев: CSV каждой секции, сжатый gzip и разбитый на чанки.
+-- Данные уже сжаты, поэтому TOAST хранит их без повторного сжатия.
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.orders_archive (
+    id BIGSERIAL PRIMARY KEY,
+    month DATE NOT NULL,
+    table_name VARCHAR(50) NOT NULL,
+    chunk INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    data BYTEA NOT NULL,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    UNIQUE (month, table_name, chunk)
+);
+
+ALTER TABLE t_p613096_greeting_project_36.orders_archive ALTER COLUMN data SET STORAGE EXTERNAL;
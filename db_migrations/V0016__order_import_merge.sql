@@ -0,0 +1,82 @@
+-- Перенос пакета заказов из временной таблицы import_orders (ее создает и заполняет
+-- через COPY действие import функции orders) в orders/order_items. Каждая строка —
+-- отдельная подтранзакция: занятый ключ идемпотентности или нехватка билетов (EH001)
+-- дают результат строки, а не откат всего пакета. Строки с одинаковым ключом внутри
+-- пакета ведут себя как повторы одиночного запроса.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.merge_imported_orders(
+    p_order_status VARCHAR, p_hold_status VARCHAR, p_expires_at TIMESTAMP, p_key_ttl_hours INTEGER
+) RETURNS TABLE (
+    row_no INTEGER, status INTEGER, order_number VARCHAR, replayed BOOLEAN, error TEXT, ticket_id VARCHAR
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_row RECORD;
+    v_stored RECORD;
+    v_order_id INTEGER;
+    v_claimed BOOLEAN;
+BEGIN
+    FOR v_row IN SELECT * FROM pg_temp.import_orders s ORDER BY s.row_no LOOP
+        row_no := v_row.row_no;
+        status := 200;
+        order_number := v_row.order_number;
+        replayed := FALSE;
+        error := NULL;
+        ticket_id := NULL;
+
+        BEGIN
+            v_claimed := TRUE;
+            IF v_row.idempotency_key IS NOT NULL THEN
+                INSERT INTO t_p613096_greeting_project_36.idempotency_keys
+                (idempotency_key, request_hash, response_status, response_body, expires_at)
+                VALUES (v_row.idempotency_key, v_row.request_hash, 200, v_row.response_body,
+                        NOW() + make_interval(hours => p_key_ttl_hours))
+                ON CONFLICT (idempotency_key) DO UPDATE SET
+                    request_hash = EXCLUDED.request_hash,
+                    response_status = EXCLUDED.response_status,
+                    response_body = EXCLUDED.response_body,
+                    created_at = NOW(),
+                    expires_at = EXCLUDED.expires_at
+                WHERE idempotency_keys.expires_at < NOW();
+                v_claimed := FOUND;
+            END IF;
+
+            IF v_claimed THEN
+                INSERT INTO t_p613096_greeting_project_36.orders
+                (order_number, full_name, email, phone, total_amount, status, created_at)
+                VALUES (v_row.order_number, v_row.full_name, v_row.email, v_row.phone,
+                        v_row.total_amount, p_order_status, v_row.created_at)
+                RETURNING id INTO v_order_id;
+
+                INSERT INTO t_p613096_greeting_project_36.order_items
+                (order_id, created_at, ticket_type_id, event_title, ticket_type, price, quantity)
+                SELECT v_order_id, v_row.created_at, i.ticket_type_id, i.event_title, i.ticket_type, i.price, i.quantity
+                FROM jsonb_to_recordset(v_row.items)
+                AS i(ticket_type_id VARCHAR(50), event_title VARCHAR(255), ticket_type VARCHAR(100),
+                     price INTEGER, quantity INTEGER);
+
+                PERFORM t_p613096_greeting_project_36.reserve_tickets(v_order_id, v_row.items, p_hold_status, p_expires_at);
+            ELSE
+                SELECT k.request_hash, k.response_status, k.response_body INTO v_stored
+                FROM t_p613096_greeting_project_36.idempotency_keys k
+                WHERE k.idempotency_key = v_row.idempotency_key;
+                IF v_stored.request_hash <> v_row.request_hash THEN
+                    status := 422;
+                    order_number := NULL;
+                    error := 'Ключ идемпотентности уже использован для другого запроса';
+                ELSE
+                    status := v_stored.response_status;
+                    order_number := v_stored.response_body::jsonb ->> 'order_number';
+                    replayed := TRUE;
+                END IF;
+            END IF;
+        EXCEPTION WHEN SQLSTATE 'EH001' THEN
+            status := 409;
+            order_number := NULL;
+            error := 'Билеты закончились';
+            ticket_id := split_part(SQLERRM, 'sold_out:', 2);
+        END;
+
+        RETURN NEXT;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
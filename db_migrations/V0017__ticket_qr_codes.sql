@@ -0,0 +1,24 @@
+-- Подписанные коды билетов письма: рассыльщик кодирует их в PNG и прикладывает к письму
+ALTER TABLE t_p613096_greeting_project_36.email_outbox
+ADD COLUMN IF NOT EXISTS qr_codes JSONB;
+
+-- Кеш PNG по SHA-256 кода: повторная отправка письма не кодирует картинки заново.
+-- Давно не использованные картинки удаляет обслуживание.
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.qr_images (
+    digest CHAR(64) PRIMARY KEY,
+    png BYTEA NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_qr_images_created_at
+ON t_p613096_greeting_project_36.qr_images(created_at);
+
+-- Проходы по билетам: line — порядковый номер позиции заказа, seq — номер билета в ней
+CREATE TABLE IF NOT EXISTS t_p613096_greeting_project_36.ticket_scans (
+    order_number VARCHAR(50) NOT NULL,
+    line SMALLINT NOT NULL,
+    seq SMALLINT NOT NULL,
+    scanned_by VARCHAR(255),
+    scanned_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (order_number, line, seq)
+);
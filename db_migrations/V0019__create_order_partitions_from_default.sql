@@ -0,0 +1,65 @@
+-- Если задача обслуживания долго не запускалась, заказы месяца без своей секции попадают
+-- в секцию по умолчанию, и CREATE TABLE ... PARTITION OF для этого месяца падает
+-- ("updated partition constraint for default partition would be violated"). Теперь строки
+-- такого месяца сначала выносятся из секций по умолчанию во временные таблицы, затем
+-- создается секция месяца, и строки вставляются обратно уже в нее. Все в одной транзакции:
+-- вставки заказов на это время ждут блокировку.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.create_order_partitions(
+    p_from DATE, p_to DATE
+) RETURNS INTEGER AS $$
+DECLARE
+    v_month DATE := date_trunc('month', p_from)::DATE;
+    v_next DATE;
+    v_suffix TEXT;
+    v_created INTEGER := 0;
+    v_in_default BOOLEAN;
+BEGIN
+    WHILE v_month <= p_to LOOP
+        v_suffix := to_char(v_month, 'YYYYMM');
+        v_next := (v_month + INTERVAL '1 month')::DATE;
+        IF to_regclass('t_p613096_greeting_project_36.orders_p' || v_suffix) IS NULL THEN
+            SELECT EXISTS (
+                SELECT 1 FROM t_p613096_greeting_project_36.orders_default
+                WHERE created_at >= v_month AND created_at < v_next
+            ) INTO v_in_default;
+
+            IF v_in_default THEN
+                -- новые заказы месяца не должны попасть в секцию по умолчанию, пока ее чистим
+                LOCK TABLE t_p613096_greeting_project_36.orders, t_p613096_greeting_project_36.order_items
+                IN EXCLUSIVE MODE;
+                CREATE TEMP TABLE moved_orders AS
+                SELECT * FROM t_p613096_greeting_project_36.orders_default
+                WHERE created_at >= v_month AND created_at < v_next;
+                CREATE TEMP TABLE moved_order_items AS
+                SELECT * FROM t_p613096_greeting_project_36.order_items_default
+                WHERE created_at >= v_month AND created_at < v_next;
+                -- позиции ссылаются на заказы, поэтому удаляются первыми
+                DELETE FROM t_p613096_greeting_project_36.order_items_default
+                WHERE created_at >= v_month AND created_at < v_next;
+                DELETE FROM t_p613096_greeting_project_36.orders_default
+                WHERE created_at >= v_month AND created_at < v_next;
+            END IF;
+
+            EXECUTE format(
+                'CREATE TABLE t_p613096_greeting_project_36.%I PARTITION OF t_p613096_greeting_project_36.orders FOR VALUES FROM (%L) TO (%L)',
+                'orders_p' || v_suffix, v_month, v_next
+            );
+            EXECUTE format(
+                'CREATE TABLE t_p613096_greeting_project_36.%I PARTITION OF t_p613096_greeting_project_36.order_items FOR VALUES FROM (%L) TO (%L)',
+                'order_items_p' || v_suffix, v_month, v_next
+            );
+
+            IF v_in_default THEN
+                INSERT INTO t_p613096_greeting_project_36.orders SELECT * FROM moved_orders;
+                INSERT INTO t_p613096_greeting_project_36.order_items SELECT * FROM moved_order_items;
+                DROP TABLE moved_order_items;
+                DROP TABLE moved_orders;
+            END IF;
+
+            v_created := v_created + 1;
+        END IF;
+        v_month := v_next;
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
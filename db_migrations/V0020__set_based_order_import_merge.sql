@@ -0,0 +1,187 @@
+-- Перенос пакета из import_orders без подтранзакции на каждую строку: тысячи
+-- BEGIN ... EXCEPTION в одной транзакции переполняют кеш подтранзакций процесса (64 записи)
+-- и замедляют снимки всех сессий. Теперь каждый шаг — один запрос по всему пакету:
+--   1. строки с ключом, уже встречавшимся выше в пакете, ждут результата первой такой строки;
+--   2. ключи идемпотентности занимаются одним INSERT ... ON CONFLICT, строки с живым чужим
+--      ключом получают сохраненный ответ или 422;
+--   3. остаток билетов блокируется и распределяется по строкам в порядке пакета: строка, на
+--      которой тип билета закончился, и следующие строки с этим типом получают 409,
+--      их ключи освобождаются;
+--   4. заказы, номера, позиции, брони и остатки вставляются и обновляются разом.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.merge_imported_orders(
+    p_order_status VARCHAR, p_hold_status VARCHAR, p_expires_at TIMESTAMP, p_key_ttl_hours INTEGER
+) RETURNS TABLE (
+    row_no INTEGER, status INTEGER, order_number VARCHAR, replayed BOOLEAN, error TEXT, ticket_id VARCHAR
+) AS $$
+#variable_conflict use_column
+BEGIN
+    DROP TABLE IF EXISTS pg_temp.import_rows, pg_temp.import_demand, pg_temp.import_supply;
+
+    CREATE TEMP TABLE import_rows ON COMMIT DROP AS
+    SELECT s.row_no, NULL::INTEGER AS status, s.order_number::VARCHAR AS order_number,
+           FALSE AS replayed, NULL::TEXT AS error, NULL::VARCHAR AS ticket_id,
+           FALSE AS claimed, NULL::INTEGER AS dup_of, NULL::INTEGER AS order_id
+    FROM pg_temp.import_orders s;
+    ALTER TABLE import_rows ADD PRIMARY KEY (row_no);
+
+    -- 1. повторы ключа внутри пакета
+    UPDATE import_rows r SET dup_of = f.first_row
+    FROM (
+        SELECT s.row_no, MIN(s.row_no) OVER (PARTITION BY s.idempotency_key) AS first_row
+        FROM pg_temp.import_orders s
+        WHERE s.idempotency_key IS NOT NULL
+    ) f
+    WHERE f.row_no = r.row_no AND f.first_row <> f.row_no;
+
+    -- 2. ключи идемпотентности
+    WITH claimed AS (
+        INSERT INTO t_p613096_greeting_project_36.idempotency_keys
+        (idempotency_key, request_hash, response_status, response_body, expires_at)
+        SELECT s.idempotency_key, s.request_hash, 200, s.response_body,
+               NOW() + make_interval(hours => p_key_ttl_hours)
+        FROM pg_temp.import_orders s
+        JOIN import_rows r ON r.row_no = s.row_no
+        WHERE s.idempotency_key IS NOT NULL AND r.dup_of IS NULL
+        ON CONFLICT (idempotency_key) DO UPDATE SET
+            request_hash = EXCLUDED.request_hash,
+            response_status = EXCLUDED.response_status,
+            response_body = EXCLUDED.response_body,
+            created_at = NOW(),
+            expires_at = EXCLUDED.expires_at
+        WHERE idempotency_keys.expires_at < NOW()
+        RETURNING idempotency_key
+    )
+    UPDATE import_rows r SET claimed = TRUE
+    FROM pg_temp.import_orders s, claimed c
+    WHERE s.row_no = r.row_no AND s.idempotency_key = c.idempotency_key AND r.dup_of IS NULL;
+
+    UPDATE import_rows r SET
+        status = CASE WHEN k.request_hash = s.request_hash THEN k.response_status ELSE 422 END,
+        order_number = CASE WHEN k.request_hash = s.request_hash THEN k.response_body::jsonb ->> 'order_number' END,
+        replayed = k.request_hash = s.request_hash,
+        error = CASE WHEN k.request_hash <> s.request_hash
+                     THEN 'Ключ идемпотентности уже использован для другого запроса' END
+    FROM pg_temp.import_orders s
+    JOIN t_p613096_greeting_project_36.idempotency_keys k ON k.idempotency_key = s.idempotency_key
+    WHERE s.row_no = r.row_no AND s.idempotency_key IS NOT NULL AND NOT r.claimed AND r.dup_of IS NULL;
+
+    -- 3. остатки: спрос строк по типам билета и заблокированные корзины этих типов
+    CREATE TEMP TABLE import_demand ON COMMIT DROP AS
+    SELECT r.row_no, d.ticket_type_id, SUM(d.quantity)::INTEGER AS quantity
+    FROM import_rows r
+    JOIN pg_temp.import_orders s ON s.row_no = r.row_no
+    CROSS JOIN LATERAL jsonb_to_recordset(s.items) AS d(ticket_type_id VARCHAR(50), quantity INTEGER)
+    WHERE r.status IS NULL AND r.dup_of IS NULL
+    GROUP BY r.row_no, d.ticket_type_id;
+
+    PERFORM 1 FROM t_p613096_greeting_project_36.ticket_inventory_buckets b
+    WHERE b.ticket_type_id IN (SELECT DISTINCT d.ticket_type_id FROM import_demand d)
+    ORDER BY b.ticket_type_id, b.bucket
+    FOR UPDATE;
+
+    -- типы без строк остатка не ограничены и сюда не попадают
+    CREATE TEMP TABLE import_supply ON COMMIT DROP AS
+    SELECT b.ticket_type_id, b.bucket, b.remaining,
+           SUM(b.remaining) OVER (PARTITION BY b.ticket_type_id ORDER BY b.bucket) AS supply_end
+    FROM t_p613096_greeting_project_36.ticket_inventory_buckets b
+    WHERE b.ticket_type_id IN (SELECT DISTINCT d.ticket_type_id FROM import_demand d)
+      AND b.remaining > 0;
+
+    -- отказ строки возвращает ее спрос по другим типам, поэтому до неподвижной точки;
+    -- на каждой итерации все переполнения находятся одним запросом
+    LOOP
+        UPDATE import_rows r SET status = 409, error = 'Билеты закончились', ticket_id = f.ticket_type_id
+        FROM (
+            SELECT DISTINCT ON (d.row_no) d.row_no, d.ticket_type_id
+            FROM (
+                SELECT d.row_no, d.ticket_type_id,
+                       SUM(d.quantity) OVER (PARTITION BY d.ticket_type_id ORDER BY d.row_no) AS demand_end
+                FROM import_demand d
+                JOIN import_rows pending ON pending.row_no = d.row_no AND pending.status IS NULL
+                WHERE d.ticket_type_id IN (
+                    SELECT b.ticket_type_id FROM t_p613096_greeting_project_36.ticket_inventory_buckets b
+                )
+            ) d
+            LEFT JOIN (
+                SELECT ticket_type_id, SUM(remaining) AS supply FROM import_supply GROUP BY ticket_type_id
+            ) s ON s.ticket_type_id = d.ticket_type_id
+            WHERE d.demand_end > COALESCE(s.supply, 0)
+            ORDER BY d.row_no, d.ticket_type_id
+        ) f
+        WHERE r.row_no = f.row_no;
+        EXIT WHEN NOT FOUND;
+    END LOOP;
+
+    DELETE FROM t_p613096_greeting_project_36.idempotency_keys k
+    USING import_rows r, pg_temp.import_orders s
+    WHERE r.status = 409 AND r.claimed AND s.row_no = r.row_no AND k.idempotency_key = s.idempotency_key;
+
+    -- 4. принятые строки
+    UPDATE import_rows r SET status = 200, order_id = nextval('t_p613096_greeting_project_36.orders_id_seq')
+    WHERE r.status IS NULL AND r.dup_of IS NULL;
+
+    INSERT INTO t_p613096_greeting_project_36.orders
+    (id, order_number, full_name, email, phone, total_amount, status, created_at)
+    SELECT r.order_id, s.order_number, s.full_name, s.email, s.phone, s.total_amount, p_order_status, s.created_at
+    FROM import_rows r JOIN pg_temp.import_orders s ON s.row_no = r.row_no
+    WHERE r.order_id IS NOT NULL
+    ORDER BY r.row_no;
+
+    INSERT INTO t_p613096_greeting_project_36.order_numbers (order_number, created_at)
+    SELECT s.order_number, s.created_at
+    FROM import_rows r JOIN pg_temp.import_orders s ON s.row_no = r.row_no
+    WHERE r.order_id IS NOT NULL;
+
+    -- позиции в порядке корзины: по нему QR-код билета находит свою позицию
+    INSERT INTO t_p613096_greeting_project_36.order_items
+    (order_id, created_at, ticket_type_id, event_title, ticket_type, price, quantity)
+    SELECT r.order_id, s.created_at, i.ticket_type_id, i.event_title, i.ticket_type, i.price, i.quantity
+    FROM import_rows r
+    JOIN pg_temp.import_orders s ON s.row_no = r.row_no
+    CROSS JOIN LATERAL jsonb_to_recordset(s.items) WITH ORDINALITY
+        AS i(ticket_type_id VARCHAR(50), event_title VARCHAR(255), ticket_type VARCHAR(100),
+             price INTEGER, quantity INTEGER, n BIGINT)
+    WHERE r.order_id IS NOT NULL
+    ORDER BY r.row_no, i.n;
+
+    -- брони: пересечение отрезков накопленного спроса строк и накопленного остатка корзин
+    WITH held AS (
+        INSERT INTO t_p613096_greeting_project_36.ticket_holds
+        (order_id, ticket_type_id, bucket, quantity, status, expires_at)
+        SELECT d.order_id, d.ticket_type_id, s.bucket,
+               LEAST(d.demand_end, s.supply_end) - GREATEST(d.demand_end - d.quantity, s.supply_end - s.remaining),
+               p_hold_status, p_expires_at
+        FROM (
+            SELECT r.order_id, d.ticket_type_id, d.quantity,
+                   SUM(d.quantity) OVER (PARTITION BY d.ticket_type_id ORDER BY d.row_no) AS demand_end
+            FROM import_demand d JOIN import_rows r ON r.row_no = d.row_no
+            WHERE r.order_id IS NOT NULL
+        ) d
+        JOIN import_supply s ON s.ticket_type_id = d.ticket_type_id
+        WHERE LEAST(d.demand_end, s.supply_end) > GREATEST(d.demand_end - d.quantity, s.supply_end - s.remaining)
+        RETURNING ticket_type_id, bucket, quantity
+    )
+    UPDATE t_p613096_greeting_project_36.ticket_inventory_buckets b
+    SET remaining = b.remaining - t.taken
+    FROM (SELECT ticket_type_id, bucket, SUM(quantity) AS taken FROM held GROUP BY ticket_type_id, bucket) t
+    WHERE b.ticket_type_id = t.ticket_type_id AND b.bucket = t.bucket;
+
+    -- повторы ключа внутри пакета получают результат первой строки
+    UPDATE import_rows r SET
+        status = CASE WHEN s.request_hash = fs.request_hash THEN f.status ELSE 422 END,
+        order_number = CASE WHEN s.request_hash = fs.request_hash THEN f.order_number END,
+        replayed = s.request_hash = fs.request_hash AND f.status = 200,
+        error = CASE WHEN s.request_hash = fs.request_hash THEN f.error
+                     ELSE 'Ключ идемпотентности уже использован для другого запроса' END,
+        ticket_id = CASE WHEN s.request_hash = fs.request_hash THEN f.ticket_id END
+    FROM import_rows f, pg_temp.import_orders s, pg_temp.import_orders fs
+    WHERE r.dup_of = f.row_no AND s.row_no = r.row_no AND fs.row_no = f.row_no;
+
+    RETURN QUERY
+    SELECT r.row_no, r.status,
+           (CASE WHEN r.status = 200 THEN r.order_number END)::VARCHAR,
+           r.replayed, r.error, r.ticket_id::VARCHAR
+    FROM import_rows r
+    ORDER BY r.row_no;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,7 @@
+-- Роли пользователей: basic — покупатель, staff — контролер на входе (проверка QR-кодов
+-- билетов), partner — касса или партнер (пакетный импорт заказов), admin — все действия.
+-- Назначает роль администратор действием set_role функции auth; новая роль попадает
+-- в токен при следующем входе. NOT VALID: ограничение действует для новых записей,
+-- не перепроверяя существующие строки под блокировкой.
+ALTER TABLE t_p613096_greeting_project_36.users
+ADD CONSTRAINT users_role_check CHECK (role IN ('basic', 'staff', 'partner', 'admin')) NOT VALID;
@@ -0,0 +1,87 @@
+-- Резерв без взаимоблокировок. Раньше первый проход (SKIP LOCKED со случайной корзины)
+-- держал захваченные строки, а второй ждал остальные по порядку номеров: у почти
+-- распроданного билета T1 с корзиной 0 и T2 с корзиной 1 ждали друг друга (40P01).
+-- Теперь первый проход идет в подтранзакции: если свободных корзин не хватило, она
+-- откатывается вместе со своими блокировками, и второй проход ждет корзины в едином
+-- порядке (тип билета, корзина), ничего не держа по этому типу. Любое ожидание тогда идет
+-- к ключу старше всех уже захваченных, и цикл ожидания невозможен. Подтранзакция одна на
+-- тип билета заказа, а пакетный импорт (V0020) эту функцию не вызывает.
+CREATE OR REPLACE FUNCTION t_p613096_greeting_project_36.reserve_tickets(
+    p_order_id INTEGER, p_items JSONB, p_status VARCHAR, p_expires_at TIMESTAMP
+) RETURNS INTEGER AS $$
+DECLARE
+    v_item RECORD;
+    v_bucket RECORD;
+    v_need INTEGER;
+    v_take INTEGER;
+    v_buckets INTEGER;
+    v_offset INTEGER;
+    v_reserved INTEGER := 0;
+BEGIN
+    FOR v_item IN
+        SELECT ticket_type_id, SUM(quantity)::INTEGER AS quantity
+        FROM jsonb_to_recordset(p_items) AS x(ticket_type_id VARCHAR(50), quantity INTEGER)
+        GROUP BY ticket_type_id
+        ORDER BY ticket_type_id
+    LOOP
+        SELECT COUNT(*) INTO v_buckets
+        FROM t_p613096_greeting_project_36.ticket_inventory_buckets
+        WHERE ticket_type_id = v_item.ticket_type_id;
+        CONTINUE WHEN v_buckets = 0;
+
+        v_need := v_item.quantity;
+        v_offset := floor(random() * v_buckets)::INTEGER;
+
+        BEGIN
+            FOR v_bucket IN
+                SELECT bucket, remaining FROM t_p613096_greeting_project_36.ticket_inventory_buckets
+                WHERE ticket_type_id = v_item.ticket_type_id AND remaining > 0
+                ORDER BY (bucket + v_offset) % v_buckets
+                FOR UPDATE SKIP LOCKED
+            LOOP
+                v_take := LEAST(v_need, v_bucket.remaining);
+                UPDATE t_p613096_greeting_project_36.ticket_inventory_buckets
+                SET remaining = remaining - v_take
+                WHERE ticket_type_id = v_item.ticket_type_id AND bucket = v_bucket.bucket;
+                INSERT INTO t_p613096_greeting_project_36.ticket_holds
+                (order_id, ticket_type_id, bucket, quantity, status, expires_at)
+                VALUES (p_order_id, v_item.ticket_type_id, v_bucket.bucket, v_take, p_status, p_expires_at);
+                v_need := v_need - v_take;
+                EXIT WHEN v_need = 0;
+            END LOOP;
+
+            IF v_need > 0 THEN
+                -- откатить частичный резерв и отпустить корзины, взятые не по порядку
+                RAISE EXCEPTION 'short:%', v_item.ticket_type_id USING ERRCODE = 'EH002';
+            END IF;
+        EXCEPTION WHEN SQLSTATE 'EH002' THEN
+            v_need := v_item.quantity;
+        END;
+
+        IF v_need > 0 THEN
+            FOR v_bucket IN
+                SELECT bucket, remaining FROM t_p613096_greeting_project_36.ticket_inventory_buckets
+                WHERE ticket_type_id = v_item.ticket_type_id AND remaining > 0
+                ORDER BY bucket
+                FOR UPDATE
+            LOOP
+                v_take := LEAST(v_need, v_bucket.remaining);
+                UPDATE t_p613096_greeting_project_36.ticket_inventory_buckets
+                SET remaining = remaining - v_take
+                WHERE ticket_type_id = v_item.ticket_type_id AND bucket = v_bucket.bucket;
+                INSERT INTO t_p613096_greeting_project_36.ticket_holds
+                (order_id, ticket_type_id, bucket, quantity, status, expires_at)
+                VALUES (p_order_id, v_item.ticket_type_id, v_bucket.bucket, v_take, p_status, p_expires_at);
+                v_need := v_need - v_take;
+                EXIT WHEN v_need = 0;
+            END LOOP;
+        END IF;
+
+        IF v_need > 0 THEN
+            RAISE EXCEPTION 'sold_out:%', v_item.ticket_type_id USING ERRCODE = 'EH001';
+        END IF;
+        v_reserved := v_reserved + v_item.quantity;
+    END LOOP;
+    RETURN v_reserved;
+END;
+$$ LANGUAGE plpgsql;
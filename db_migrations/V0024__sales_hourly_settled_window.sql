@@ -0,0 +1,10 @@
+-- Почасовые итоги продаж пересчитываются за скользящее окно вместо водяной отметки по id
+-- заказа. Отметка по id и created_at с задержкой 60 с теряла заказы из долгих транзакций
+-- (пакетный импорт, медленное оформление): id и created_at выдаются в начале транзакции,
+-- а видимым заказ становится при коммите, когда отметка уже могла уйти дальше.
+-- settled_until — граница, до которой часы окончательны; часы после нее задача
+-- refresh_sales_aggregates каждый раз пересчитывает заново из заказов. NULL — итоги еще ни
+-- разу не пересчитывались: задача перестроит их с первого заказа, заодно восстановив
+-- потерянные прежней отметкой заказы. last_order_id больше не используется.
+ALTER TABLE t_p613096_greeting_project_36.sales_watermark
+    ADD COLUMN IF NOT EXISTS settled_until TIMESTAMP;
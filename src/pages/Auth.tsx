@@ -54,6 +54,7 @@ const Auth = () => {
 
       if (response.ok && data.success) {
         localStorage.setItem('user', JSON.stringify(data.user));
+        localStorage.setItem('token', data.token);
         toast({
           title: 'Успешный вход',
           description: `Добро пожаловать, ${data.user.full_name}!`
@@ -119,7 +120,7 @@ const Auth = () => {
         setShowVerification(true);
         toast({
           title: 'Регистрация отправлена',
-          description: data.email_sent 
+          description: data.email_queued 
             ? 'Код подтверждения отправлен на email' 
             : 'Проверьте настройки SMTP для отправки email'
         });
@@ -208,7 +209,7 @@ const Auth = () => {
         setShowResetCode(true);
         toast({
           title: 'Код отправлен',
-          description: data.email_sent 
+          description: data.email_queued 
             ? 'Проверьте почту для получения кода' 
             : 'Проверьте настройки SMTP'
         });
@@ -144,6 +144,7 @@ const Index = () => {
 
   const handleLogout = () => {
     localStorage.removeItem('user');
+    localStorage.removeItem('token');
     setUser(null);
   };
 
@@ -262,7 +263,7 @@ const Index = () => {
       if (response.ok && data.success) {
         toast({
           title: 'Заказ оформлен!',
-          description: data.email_sent 
+          description: data.email_queued 
             ? `Билеты отправлены на ${checkoutEmail}` 
             : 'Заказ создан, проверьте настройки SMTP для отправки билетов'
         });